@@ -0,0 +1,30 @@
+// 此檔案由 scripts/build_precache.py 產生，請勿手動修改
+self.PRECACHE_VERSION = "8967575d4798";
+self.PRECACHE_MANIFEST = [
+  {"url": "./", "revision": "e41bb1f76fd3"},
+  {"url": "src/css/admin.css", "revision": "d023388a2cb8"},
+  {"url": "src/css/auth.css", "revision": "7e48a19352fc"},
+  {"url": "src/css/main.css", "revision": "4f110c798289"},
+  {"url": "src/css/user.css", "revision": "2e6d359ff00e"},
+  {"url": "src/js/admin.js", "revision": "342148922d32"},
+  {"url": "src/js/app.js", "revision": "2a4b7b6fd6dd"},
+  {"url": "src/js/auth.js", "revision": "b1e4720f2e71"},
+  {"url": "src/js/change-bus.js", "revision": "4d6b9399684a"},
+  {"url": "src/js/clock.js", "revision": "9a3e7b6d234a"},
+  {"url": "src/js/expiry-scheduler.js", "revision": "b284ebfa296a"},
+  {"url": "src/js/game.js", "revision": "63b7798f0c4a"},
+  {"url": "src/js/herd-view.js", "revision": "ec3577241092"},
+  {"url": "src/js/herd.js", "revision": "559aa98d37fa"},
+  {"url": "src/js/ledger.js", "revision": "f2f877566605"},
+  {"url": "src/js/record-lock.js", "revision": "295107d7105f"},
+  {"url": "src/js/storage-engine.js", "revision": "0c9302639b10"},
+  {"url": "src/js/tick-engine.js", "revision": "e585df846a89"},
+  {"url": "src/js/user-list-view.js", "revision": "c1ef510d75f5"},
+  {"url": "src/js/user-manager.js", "revision": "c9cc4c5f02a5"},
+  {"url": "src/js/user-picker.js", "revision": "3b661766fe3f"},
+  {"url": "src/js/user-query-client.js", "revision": "95333de83aaa"},
+  {"url": "src/js/user-query-worker.js", "revision": "a42f84ae55a3"},
+  {"url": "src/js/user-query.js", "revision": "a06d09ba0308"},
+  {"url": "src/js/user.js", "revision": "db3e44dad7e7"},
+  {"url": "src/js/write-queue.js", "revision": "e398c6ed7feb"},
+];
@@ -0,0 +1,88 @@
+"""
+產生 Service Worker 的預先快取清單（precache-manifest.js）
+
+清單包含 App Shell（index.html 與 src/ 下的 CSS、JavaScript），
+每個檔案以內容的 SHA-256 前綴作為版本。任何檔案內容改變時清單隨之改變，
+瀏覽器偵測到 Service Worker 匯入的清單不同，就會在背景安裝新版本的快取。
+
+用法：
+    python scripts/build_precache.py          # 重新產生清單
+    python scripts/build_precache.py --check  # 只檢查清單是否為最新（過期時回傳 1）
+"""
+
+import argparse
+import hashlib
+import json
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+MANIFEST_PATH = ROOT / "precache-manifest.js"
+# index.html 以 Service Worker 的範圍根目錄（./）快取，導覽請求都回傳這份
+SHELL_ENTRY = ("./", "index.html")
+SHELL_PATTERNS = ("src/css/*.css", "src/js/*.js")
+HASH_LENGTH = 12
+
+
+def file_revision(path: Path) -> str:
+    """以檔案內容計算版本"""
+    return hashlib.sha256(path.read_bytes()).hexdigest()[:HASH_LENGTH]
+
+
+def collect_entries(root: Path = ROOT) -> list[dict]:
+    """列出 App Shell 的所有檔案與版本（依路徑排序，確保輸出穩定）"""
+    url, filename = SHELL_ENTRY
+    entries = [{"url": url, "revision": file_revision(root / filename)}]
+    for pattern in SHELL_PATTERNS:
+        for path in sorted(root.glob(pattern)):
+            entries.append({
+                "url": path.relative_to(root).as_posix(),
+                "revision": file_revision(path),
+            })
+    return entries
+
+
+def manifest_version(entries: list[dict]) -> str:
+    """以所有檔案的版本計算整份清單的版本（用於快取名稱）"""
+    digest = hashlib.sha256()
+    for entry in entries:
+        digest.update(f"{entry['url']}:{entry['revision']}\n".encode())
+    return digest.hexdigest()[:HASH_LENGTH]
+
+
+def render_manifest(entries: list[dict]) -> str:
+    """產生 precache-manifest.js 的內容"""
+    lines = [
+        "// 此檔案由 scripts/build_precache.py 產生，請勿手動修改",
+        f"self.PRECACHE_VERSION = {json.dumps(manifest_version(entries))};",
+        "self.PRECACHE_MANIFEST = [",
+    ]
+    lines += [f"  {json.dumps(entry, ensure_ascii=False)}," for entry in entries]
+    lines.append("];")
+    return "\n".join(lines) + "\n"
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="產生 Service Worker 的預先快取清單")
+    parser.add_argument("--check", action="store_true", help="只檢查清單是否為最新")
+    args = parser.parse_args()
+
+    entries = collect_entries()
+    content = render_manifest(entries)
+    current = MANIFEST_PATH.read_text(encoding="utf-8") if MANIFEST_PATH.exists() else None
+
+    if args.check:
+        if current != content:
+            print("precache-manifest.js 已過期，請執行 python scripts/build_precache.py")
+            return 1
+        print("precache-manifest.js 為最新版本")
+        return 0
+
+    if current != content:
+        MANIFEST_PATH.write_text(content, encoding="utf-8")
+        print(f"已更新 precache-manifest.js（{manifest_version(entries)}）")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
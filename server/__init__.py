@@ -0,0 +1,15 @@
+"""
+本機後端：asyncio HTTP 伺服器與 SQLite 儲存
+
+提供 App Shell 的靜態檔案，以及讓瀏覽器端 RemoteEngine（?storage=remote）讀寫的 JSON API，
+多個瀏覽器與裝置可以共用同一份資料。
+
+用法：
+    python -m server 8000 --db cattle-farm.sqlite3
+    python -m server 8000 --bind 0.0.0.0    # 讓其他裝置連線
+"""
+
+from .app import Server
+from .database import Database
+
+__all__ = ["Database", "Server"]
@@ -0,0 +1,44 @@
+"""
+命令列：啟動本機後端
+"""
+
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+
+from .app import Server
+from .database import Database
+
+
+async def serve(args) -> None:
+    database = Database(args.db, pool_size=args.pool_size).open()
+    server = Server(args.directory, database)
+    try:
+        listener = await server.start(args.bind, args.port)
+        print(f"伺服器已啟動：http://localhost:{args.port}（資料庫 {database.path}）", flush=True)
+        async with listener:
+            await listener.serve_forever()
+    finally:
+        database.close()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="啟動靜態檔案與 JSON API 伺服器（SQLite 儲存）")
+    parser.add_argument("port", nargs="?", type=int, default=8000, help="連接埠（預設 8000）")
+    parser.add_argument("--bind", default="127.0.0.1",
+                        help="監聽的位址（預設 127.0.0.1，只接受本機連線；讓其他裝置連線時指定 0.0.0.0）")
+    parser.add_argument("--directory", type=Path, default=Path.cwd(), help="靜態檔案的根目錄（預設為目前目錄）")
+    parser.add_argument("--db", type=Path, default=Path("cattle-farm.sqlite3"), help="SQLite 資料庫檔案")
+    parser.add_argument("--pool-size", type=int, default=4, help="唯讀連線池大小")
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,239 @@
+"""
+asyncio HTTP 伺服器
+
+以 asyncio.start_server 處理 HTTP/1.1（支援 keep-alive），同時提供：
+- 靜態檔案：App Shell（index.html、src/、sw.js 等），取代 python -m http.server
+- POST /api/storage：批次執行儲存操作 {"ops": [[op, key, value?], ...]}，回傳 {"results": [...]}，
+  op 為 get、set、setIfVersion（[op, key, value, 版本號]，版本號相同時才寫入）、remove、
+  keys（key 欄位為前綴）、changes（[op, 前綴, cursor]，回傳 cursor 之後變更或刪除的 key 與新的 cursor，
+  供瀏覽器輪詢其他裝置的變更）；包含寫入的批次在單一交易中完成
+- GET /api/users：所有使用者（不含密碼）
+- GET /api/users/<id>：單一使用者（不含密碼）
+- GET /api/users/<id>/game：使用者的遊戲數據（儲存格式）
+"""
+
+import asyncio
+import json
+import mimetypes
+import sqlite3
+from http import HTTPStatus
+from pathlib import Path
+from urllib.parse import unquote, urlsplit
+
+from .database import Database, OperationError
+
+USER_KEY_PREFIX = "cattleFarmUser:"  # 與 UserManager.USER_KEY_PREFIX 一致
+GAME_DATA_KEY_PREFIX = "cattleFarmGameData:"  # 與 GameManager.GAME_DATA_KEY_PREFIX 一致
+MAX_HEADER_COUNT = 100
+MAX_BODY_BYTES = 8 * 1024 * 1024
+TEXT_TYPES = ("text/", "application/json")
+
+
+class HTTPError(Exception):
+    """回應錯誤狀態碼"""
+
+    def __init__(self, status: HTTPStatus, message: str | None = None):
+        super().__init__(message or status.phrase)
+        self.status = status
+        self.message = message or status.phrase
+
+
+class Request:
+    """解析後的 HTTP 請求"""
+
+    def __init__(self, method: str, target: str, version: str, headers: dict, body: bytes):
+        self.method = method
+        self.path = unquote(urlsplit(target).path)
+        self.version = version
+        self.headers = headers
+        self.body = body
+
+    @property
+    def keep_alive(self) -> bool:
+        connection = self.headers.get("connection", "").lower()
+        if self.version == "HTTP/1.0":
+            return connection == "keep-alive"
+        return connection != "close"
+
+    def json(self):
+        """解析 JSON 內容"""
+        try:
+            return json.loads(self.body or b"null")
+        except ValueError as error:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, f"JSON 格式錯誤：{error}") from error
+
+
+def public_user(user: dict) -> dict:
+    """移除密碼後的使用者資料"""
+    return {key: value for key, value in user.items() if key != "password"}
+
+
+class Server:
+    """靜態檔案與 JSON API 伺服器"""
+
+    def __init__(self, root, database: Database):
+        self.root = Path(root).resolve()
+        self.database = database
+        self.server = None
+
+    async def start(self, host=None, port: int = 8000) -> asyncio.Server:
+        """開始接受連線（host 為 None 時監聽所有介面）"""
+        self.server = await asyncio.start_server(self.handle_connection, host, port)
+        return self.server
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """處理單一連線上的所有請求（keep-alive）"""
+        try:
+            while True:
+                try:
+                    request = await self.read_request(reader)
+                except HTTPError as error:
+                    await self.send_json(writer, error.status, {"error": error.message}, keep_alive=False)
+                    break
+                if request is None:
+                    break
+
+                status, headers, body = await self.dispatch(request)
+                await self.send(writer, status, headers, body if request.method != "HEAD" else b"",
+                                keep_alive=request.keep_alive, content_length=len(body))
+                if not request.keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def read_line(self, reader: asyncio.StreamReader, status: HTTPStatus) -> bytes:
+        """讀取一行，超過 StreamReader 的長度上限時回應 status"""
+        try:
+            return await reader.readline()
+        except (asyncio.LimitOverrunError, ValueError) as error:
+            raise HTTPError(status) from error
+
+    async def read_request(self, reader: asyncio.StreamReader):
+        """讀取一個請求，連線關閉時回傳 None"""
+        line = await self.read_line(reader, HTTPStatus.REQUEST_URI_TOO_LONG)
+        if not line:
+            return None
+        try:
+            method, target, version = line.decode("latin-1").split()
+        except ValueError as error:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "請求行格式錯誤") from error
+
+        headers = {}
+        while True:
+            line = await self.read_line(reader, HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE)
+            if line in (b"\r\n", b"\n", b""):
+                break
+            if len(headers) >= MAX_HEADER_COUNT:
+                raise HTTPError(HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE)
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        try:
+            length = int(headers.get("content-length", 0) or 0)
+        except ValueError as error:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Content-Length 格式錯誤") from error
+        if length < 0:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Content-Length 格式錯誤")
+        if length > MAX_BODY_BYTES:
+            raise HTTPError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE)
+        body = await reader.readexactly(length) if length else b""
+        return Request(method, target, version, headers, body)
+
+    async def dispatch(self, request: Request) -> tuple:
+        """依路徑處理請求，回傳 (狀態碼, 標頭, 內容)"""
+        try:
+            if request.path.startswith("/api/"):
+                status, data = await self.handle_api(request)
+                return self.json_response(status, data)
+            return await self.serve_static(request)
+        except HTTPError as error:
+            return self.json_response(error.status, {"error": error.message})
+        except (OperationError, ValueError, TypeError) as error:
+            # 格式錯誤的操作或資料（OperationError 也是 ValueError）
+            return self.json_response(HTTPStatus.BAD_REQUEST, {"error": str(error)})
+        except sqlite3.Error as error:
+            return self.json_response(HTTPStatus.SERVICE_UNAVAILABLE, {"error": f"資料庫錯誤：{error}"})
+        except Exception as error:
+            # 仍回應錯誤，不直接中斷連線
+            return self.json_response(HTTPStatus.INTERNAL_SERVER_ERROR, {"error": str(error)})
+
+    async def handle_api(self, request: Request) -> tuple:
+        """JSON API"""
+        parts = request.path.strip("/").split("/")[1:]
+
+        if parts == ["storage"]:
+            if request.method != "POST":
+                raise HTTPError(HTTPStatus.METHOD_NOT_ALLOWED)
+            payload = request.json()
+            if not isinstance(payload, dict):
+                raise HTTPError(HTTPStatus.BAD_REQUEST, "內容必須是 {\"ops\": [...]}")
+            return HTTPStatus.OK, {"results": await self.database.run(payload.get("ops"))}
+
+        if request.method != "GET":
+            raise HTTPError(HTTPStatus.METHOD_NOT_ALLOWED)
+
+        if parts == ["health"]:
+            return HTTPStatus.OK, {"status": "ok"}
+        if parts == ["users"]:
+            users = await self.database.get_prefix(USER_KEY_PREFIX)
+            return HTTPStatus.OK, [public_user(user) for user in users.values()]
+        if len(parts) == 2 and parts[0] == "users":
+            user = await self.database.get(USER_KEY_PREFIX + parts[1])
+            if user is None:
+                raise HTTPError(HTTPStatus.NOT_FOUND, "找不到使用者")
+            return HTTPStatus.OK, public_user(user)
+        if len(parts) == 3 and parts[0] == "users" and parts[2] == "game":
+            game_data = await self.database.get(GAME_DATA_KEY_PREFIX + parts[1])
+            if game_data is None:
+                raise HTTPError(HTTPStatus.NOT_FOUND, "找不到遊戲資料")
+            return HTTPStatus.OK, game_data
+
+        raise HTTPError(HTTPStatus.NOT_FOUND)
+
+    async def serve_static(self, request: Request) -> tuple:
+        """提供專案目錄下的靜態檔案（目錄回應其中的 index.html）"""
+        if request.method not in ("GET", "HEAD"):
+            raise HTTPError(HTTPStatus.METHOD_NOT_ALLOWED)
+
+        path = (self.root / request.path.lstrip("/")).resolve()
+        if not path.is_relative_to(self.root) or self.is_private(path):
+            raise HTTPError(HTTPStatus.NOT_FOUND)
+        if path.is_dir():
+            path = path / "index.html"
+        if not path.is_file():
+            raise HTTPError(HTTPStatus.NOT_FOUND)
+
+        content_type = mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+        if content_type.startswith(TEXT_TYPES):
+            content_type += "; charset=utf-8"
+        body = await asyncio.to_thread(path.read_bytes)
+        return HTTPStatus.OK, {"Content-Type": content_type}, body
+
+    def is_private(self, path: Path) -> bool:
+        """不對外提供的檔案：隱藏檔（如 .git）與資料庫檔案（含 -wal、-shm）"""
+        if any(part.startswith(".") for part in path.relative_to(self.root).parts):
+            return True
+        database = self.database.path.resolve()
+        return path.parent == database.parent and path.name.startswith(database.name)
+
+    def json_response(self, status: HTTPStatus, data) -> tuple:
+        """JSON 回應（API 的資料不快取）"""
+        body = json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode()
+        return status, {"Content-Type": "application/json; charset=utf-8", "Cache-Control": "no-store"}, body
+
+    async def send_json(self, writer: asyncio.StreamWriter, status: HTTPStatus, data, keep_alive: bool) -> None:
+        """直接送出 JSON 回應"""
+        _, headers, body = self.json_response(status, data)
+        await self.send(writer, status, headers, body, keep_alive=keep_alive, content_length=len(body))
+
+    async def send(self, writer: asyncio.StreamWriter, status: HTTPStatus, headers: dict, body: bytes,
+                   keep_alive: bool, content_length: int) -> None:
+        """送出回應"""
+        lines = [f"HTTP/1.1 {status.value} {status.phrase}"]
+        lines += [f"{name}: {value}" for name, value in headers.items()]
+        lines.append(f"Content-Length: {content_length}")
+        lines.append(f"Connection: {'keep-alive' if keep_alive else 'close'}")
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body)
+        await writer.drain()
@@ -0,0 +1,220 @@
+"""
+SQLite 鍵值儲存
+
+與瀏覽器端的儲存引擎使用相同的資料模型：每個 key 對應一份 JSON 資料。
+
+- 使用 WAL 模式：寫入不會阻擋讀取，多個讀取可以同時進行
+- 讀取使用連線池中的唯讀連線，在執行緒中執行，不阻塞事件迴圈
+- 寫入只有一條連線，以 asyncio.Lock 依序執行；同一批操作在單一交易中完成
+- 刪除的 key 在 tombstones 資料表留下刪除時間，讓 changes 也能通知其他裝置刪除（key 再次寫入時移除）
+"""
+
+import asyncio
+import json
+import queue
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+READ_OPERATIONS = {"get", "keys", "changes"}
+WRITE_OPERATIONS = {"set", "setIfVersion", "remove"}
+BUSY_TIMEOUT_MS = 5_000
+KEY_UPPER_BOUND = "\U0010ffff"  # 前綴查詢的上界（大於任何字元）
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS kv (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    updated_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%fZ', 'now'))
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS tombstones (
+    key TEXT PRIMARY KEY,
+    deleted_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%fZ', 'now'))
+) WITHOUT ROWID;
+"""
+
+
+class OperationError(ValueError):
+    """操作格式錯誤"""
+
+
+def encode(value) -> str:
+    """以與 JSON.stringify 相同的格式序列化"""
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+
+def validate(operations) -> list:
+    """檢查批次操作的格式：[[op, key, value?], ...]"""
+    if not isinstance(operations, list):
+        raise OperationError("ops 必須是陣列")
+    for operation in operations:
+        if not isinstance(operation, list) or not operation:
+            raise OperationError("每個操作必須是 [op, key, value?]")
+        name = operation[0]
+        if name not in READ_OPERATIONS | WRITE_OPERATIONS:
+            raise OperationError(f"不支援的操作：{name}")
+        if len(operation) < 2 or not isinstance(operation[1], str):
+            raise OperationError(f"{name} 需要字串 key")
+        if name == "set" and len(operation) < 3:
+            raise OperationError("set 需要 value")
+        if name == "setIfVersion" and (len(operation) < 4 or not isinstance(operation[3], int)):
+            raise OperationError("setIfVersion 需要 value 與整數版本號")
+        if name == "changes" and (len(operation) < 3 or not isinstance(operation[2], (str, type(None)))):
+            raise OperationError("changes 需要上次的 cursor（第一次為 null）")
+    return operations
+
+
+def stored_version(value) -> int:
+    """儲存資料的版本號（不是物件或沒有版本號時為 0，與瀏覽器端引擎相同）"""
+    if isinstance(value, dict) and isinstance(value.get("version"), int):
+        return value["version"]
+    return 0
+
+
+def put(connection: sqlite3.Connection, key: str, value) -> None:
+    """寫入或取代資料"""
+    connection.execute(
+        "INSERT INTO kv (key, value) VALUES (?, ?) "
+        "ON CONFLICT (key) DO UPDATE SET value = excluded.value, "
+        "updated_at = strftime('%Y-%m-%dT%H:%M:%fZ', 'now')",
+        (key, encode(value)),
+    )
+    connection.execute("DELETE FROM tombstones WHERE key = ?", (key,))
+
+
+def delete(connection: sqlite3.Connection, key: str) -> None:
+    """刪除資料，並留下刪除時間供 changes 查詢"""
+    if connection.execute("DELETE FROM kv WHERE key = ?", (key,)).rowcount:
+        connection.execute(
+            "INSERT INTO tombstones (key) VALUES (?) "
+            "ON CONFLICT (key) DO UPDATE SET deleted_at = strftime('%Y-%m-%dT%H:%M:%fZ', 'now')",
+            (key,),
+        )
+
+
+def execute(connection: sqlite3.Connection, operations: list) -> list:
+    """依序執行操作，回傳每個操作的結果"""
+    results = []
+    for name, key, *rest in operations:
+        if name == "get":
+            row = connection.execute("SELECT value FROM kv WHERE key = ?", (key,)).fetchone()
+            results.append(json.loads(row[0]) if row else None)
+        elif name == "keys":
+            rows = connection.execute(
+                "SELECT key FROM kv WHERE key >= ? AND key < ? ORDER BY key",
+                (key, key + KEY_UPPER_BOUND),
+            )
+            results.append([row[0] for row in rows])
+        elif name == "changes":
+            # 自上次的 cursor（updated_at）之後變更或刪除的 key：[[key, updated_at], ...]
+            # 同一毫秒的寫入可能在回傳 cursor 之後才提交，因此包含 updated_at 等於 cursor 的 key，由呼叫端去除重複
+            since = rest[0]
+            cursor = connection.execute(
+                "SELECT max(time) FROM (SELECT max(updated_at) AS time FROM kv "
+                "UNION ALL SELECT max(deleted_at) FROM tombstones)"
+            ).fetchone()[0] or ""
+            changed = []
+            if since is not None:
+                changed = [list(row) for row in connection.execute(
+                    "SELECT key, updated_at FROM kv WHERE key >= ? AND key < ? AND updated_at >= ? "
+                    "UNION ALL SELECT key, deleted_at FROM tombstones WHERE key >= ? AND key < ? AND deleted_at >= ? "
+                    "ORDER BY key",
+                    (key, key + KEY_UPPER_BOUND, since) * 2,
+                )]
+            results.append({"cursor": cursor, "keys": changed})
+        elif name == "set":
+            put(connection, key, rest[0])
+            results.append(None)
+        elif name == "setIfVersion":
+            # 在同一個寫入交易中比對，其他連線無法在比對與寫入之間插入
+            value, expected_version = rest[:2]
+            row = connection.execute("SELECT value FROM kv WHERE key = ?", (key,)).fetchone()
+            saved = row is None or stored_version(json.loads(row[0])) == expected_version
+            if saved:
+                put(connection, key, value)
+            results.append(saved)
+        else:
+            delete(connection, key)
+            results.append(None)
+    return results
+
+
+class Database:
+    """SQLite 鍵值儲存（一條寫入連線加上唯讀連線池）"""
+
+    def __init__(self, path, pool_size: int = 4):
+        self.path = Path(path)
+        self.pool_size = pool_size
+        self.writer = None
+        self.readers = queue.Queue()
+        self.write_lock = asyncio.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=pool_size + 1, thread_name_prefix="sqlite")
+
+    def connect(self, read_only: bool = False) -> sqlite3.Connection:
+        """建立連線（可在其他執行緒使用，交易由呼叫端控制）"""
+        connection = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        connection.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+        if read_only:
+            connection.execute("PRAGMA query_only = ON")
+        return connection
+
+    def open(self) -> "Database":
+        """建立資料表並開啟連線池"""
+        self.writer = self.connect()
+        self.writer.execute("PRAGMA journal_mode = WAL")
+        self.writer.execute("PRAGMA synchronous = NORMAL")
+        self.writer.executescript(SCHEMA)
+        for _ in range(self.pool_size):
+            self.readers.put(self.connect(read_only=True))
+        return self
+
+    def close(self) -> None:
+        """關閉所有連線"""
+        self.executor.shutdown(wait=True)
+        while not self.readers.empty():
+            self.readers.get().close()
+        if self.writer:
+            self.writer.close()
+            self.writer = None
+
+    def read(self, operations: list) -> list:
+        """以連線池中的連線執行唯讀操作（同一批在同一個讀取交易中，看到一致的資料）"""
+        connection = self.readers.get()
+        try:
+            connection.execute("BEGIN")
+            try:
+                return execute(connection, operations)
+            finally:
+                connection.execute("COMMIT")
+        finally:
+            self.readers.put(connection)
+
+    def write(self, operations: list) -> list:
+        """在單一交易中執行包含寫入的操作，失敗時整批復原"""
+        self.writer.execute("BEGIN IMMEDIATE")
+        try:
+            results = execute(self.writer, operations)
+        except Exception:
+            self.writer.execute("ROLLBACK")
+            raise
+        self.writer.execute("COMMIT")
+        return results
+
+    async def run(self, operations: list) -> list:
+        """執行一批操作（在執行緒中執行，不阻塞事件迴圈）"""
+        validate(operations)
+        loop = asyncio.get_running_loop()
+        if any(operation[0] in WRITE_OPERATIONS for operation in operations):
+            async with self.write_lock:
+                return await loop.run_in_executor(self.executor, self.write, operations)
+        return await loop.run_in_executor(self.executor, self.read, operations)
+
+    async def get(self, key: str):
+        """取得單一 key 的資料"""
+        return (await self.run([["get", key]]))[0]
+
+    async def get_prefix(self, prefix: str) -> dict:
+        """取得符合前綴的所有資料"""
+        keys = (await self.run([["keys", prefix]]))[0]
+        values = await self.run([["get", key] for key in keys])
+        return {key: value for key, value in zip(keys, values) if value is not None}
@@ -0,0 +1,14 @@
+"""
+遊戲規則的批次模擬
+
+以 NumPy 向量運算模擬大量玩家依 GameManager 的規則購買牧草與餵養乳牛，
+估算每個 key 的儲存空間、每秒寫入次數與計時器到期次數。
+
+用法：
+    python -m simulation --players 1000000 --duration 300 --click-rate lognormal:1.5:0.8
+"""
+
+from .engine import Farm
+from .simulate import ClickRate, Config, Report, TraceEvent, format_report, replay, simulate
+
+__all__ = ["ClickRate", "Config", "Farm", "Report", "TraceEvent", "format_report", "replay", "simulate"]
@@ -0,0 +1,42 @@
+"""
+命令列：執行模擬並輸出報告
+"""
+
+import argparse
+import sys
+
+from . import rules
+from .simulate import ClickRate, Config, format_report, simulate
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="模擬大量玩家的儲存空間、寫入次數與計時器到期次數")
+    parser.add_argument("--players", type=int, default=Config.players, help="玩家數量")
+    parser.add_argument("--herd-size", type=int, default=rules.DEFAULT_HERD_SIZE, help="每位玩家的乳牛數量")
+    parser.add_argument("--duration", type=int, default=Config.duration_s, help="模擬秒數")
+    parser.add_argument("--click-rate", type=ClickRate.parse, default=ClickRate(),
+                        help="點擊速率分布 kind:mean[:shape]（constant、exponential、lognormal、pareto）")
+    parser.add_argument("--purchase-size", type=int, default=Config.purchase_size, help="一次購買的牧草數量")
+    parser.add_argument("--initial-points", type=int, default=Config.initial_points, help="每位玩家的初始點數")
+    parser.add_argument("--target", choices=("random", "hungry"), default=Config.target, help="餵食對象的選擇方式")
+    parser.add_argument("--batch-size", type=int, default=Config.batch_size, help="每批模擬的玩家數量")
+    parser.add_argument("--seed", type=int, default=Config.seed, help="亂數種子")
+    args = parser.parse_args()
+
+    config = Config(
+        players=args.players,
+        herd_size=args.herd_size,
+        duration_s=args.duration,
+        click_rate=args.click_rate,
+        purchase_size=args.purchase_size,
+        initial_points=args.initial_points,
+        target=args.target,
+        batch_size=args.batch_size,
+        seed=args.seed,
+    )
+    print(format_report(simulate(config)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
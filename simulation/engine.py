@@ -0,0 +1,115 @@
+"""
+向量化的遊戲狀態與操作
+
+Farm 以 NumPy 陣列保存多位玩家的狀態（每位玩家一列，同一批玩家的乳牛數量相同），
+buy_grass 與 feed 一次處理多位玩家，結果與 GameManager 逐次呼叫相同：
+
+- 購買牧草：數量需大於 0，點數足夠時扣除點數並增加牧草
+- 餵食：依序檢查牧草、乳牛是否存在、是否已吃飽；成功時牧草 -1、飽食度 +10（上限 100），
+  達到上限時設定 60 秒後到期
+- 到期採延遲處理：讀取時視為飽食度 0，每次儲存（saveGameData）時才整理寫回
+- 每次儲存遊戲數據版本號 +1；購買牧草另外寫入一次使用者資料
+
+同一次呼叫中每位玩家只能出現一次（同一位玩家的多次操作需依序分次呼叫）。
+"""
+
+import numpy as np
+
+from . import rules
+
+
+class Farm:
+    """多位玩家的遊戲狀態"""
+
+    def __init__(self, players: int, herd_size: int = rules.DEFAULT_HERD_SIZE, initial_points=0):
+        self.herd_size = herd_size
+        self.points = np.zeros(players, dtype=np.int64) + initial_points
+        self.grass = np.zeros(players, dtype=np.int64)
+        self.hunger = np.zeros((players, herd_size), dtype=np.uint8)
+        self.timer_end = np.zeros((players, herd_size), dtype=np.float64)  # 0 代表沒有計時器
+        self.game_version = np.zeros(players, dtype=np.int64)  # 遊戲數據儲存次數
+        self.user_version = np.zeros(players, dtype=np.int64)  # 使用者資料儲存次數
+        self.purchases = np.zeros(players, dtype=np.int64)  # 成功購買次數（purchase 交易）
+        self.feeds = np.zeros(players, dtype=np.int64)  # 成功餵食次數（feed 交易）
+
+    @property
+    def players(self) -> int:
+        return self.points.shape[0]
+
+    @property
+    def ledger_entries(self) -> np.ndarray:
+        """累計帳本交易數"""
+        return self.purchases + self.feeds
+
+    def expired(self, players, now) -> np.ndarray:
+        """乳牛的計時器是否已到期（players × 乳牛）"""
+        timer_end = self.timer_end[players]
+        now = np.asarray(now, dtype=np.float64)
+        if now.ndim:
+            now = now[:, None]
+        return (timer_end != 0) & (now >= timer_end)
+
+    def effective_hunger(self, players, now) -> np.ndarray:
+        """套用到期規則後的飽食度（players × 乳牛）"""
+        return np.where(self.expired(players, now), 0, self.hunger[players])
+
+    def save(self, players: np.ndarray, now) -> None:
+        """模擬 saveGameData：整理已到期的乳牛並遞增版本號"""
+        if players.size == 0:
+            return
+        expired = self.expired(players, now)
+        self.hunger[players] = np.where(expired, 0, self.hunger[players])
+        self.timer_end[players] = np.where(expired, 0, self.timer_end[players])
+        self.game_version[players] += 1
+
+    def buy_grass(self, players, amount, now) -> np.ndarray:
+        """購買牧草，回傳每位玩家是否成功（now 為毫秒時間，可以是每位玩家各自的時間）"""
+        players = np.asarray(players, dtype=np.int64)
+        now = np.broadcast_to(np.asarray(now, dtype=np.float64), players.shape)
+        amount = np.broadcast_to(np.asarray(amount, dtype=np.int64), players.shape)
+        cost = amount * rules.POINTS_PER_GRASS
+        success = (amount > 0) & (self.points[players] >= cost)
+
+        buyers = players[success]
+        self.points[buyers] -= cost[success]
+        self.user_version[buyers] += 1
+        self.grass[buyers] += amount[success]
+        self.save(buyers, now[success])
+        self.purchases[buyers] += 1
+        return success
+
+    def feed(self, players, cattle_ids, now) -> np.ndarray:
+        """餵養乳牛（cattle_ids 從 1 開始），回傳每位玩家的餵食結果（rules.FEED_*）"""
+        players = np.asarray(players, dtype=np.int64)
+        now = np.broadcast_to(np.asarray(now, dtype=np.float64), players.shape)
+        cattle_ids = np.asarray(cattle_ids, dtype=np.int64)
+        status = np.full(players.shape, rules.FEED_OK, dtype=np.int8)
+
+        status[self.grass[players] < 1] = rules.FEED_NO_GRASS
+        found = (cattle_ids >= 1) & (cattle_ids <= self.herd_size)
+        status[(status == rules.FEED_OK) & ~found] = rules.FEED_NOT_FOUND
+
+        index = np.clip(cattle_ids - 1, 0, self.herd_size - 1)
+        timer_end = self.timer_end[players, index]
+        expired = (timer_end != 0) & (now >= timer_end)
+        hunger = np.where(expired, 0, self.hunger[players, index]).astype(np.int64)
+        status[(status == rules.FEED_OK) & (hunger >= rules.MAX_HUNGER)] = rules.FEED_FULL
+
+        ok = status == rules.FEED_OK
+        fed, fed_index = players[ok], index[ok]
+        new_hunger = np.minimum(hunger[ok] + rules.HUNGER_PER_FEED, rules.MAX_HUNGER)
+        # 寫入飽食度前清除已到期的計時器，吃飽時重新設定
+        new_timer = np.where(expired[ok], 0, timer_end[ok])
+        new_timer = np.where(new_hunger >= rules.MAX_HUNGER, now[ok] + rules.TIMER_MS, new_timer)
+
+        self.grass[fed] -= 1
+        self.hunger[fed, fed_index] = new_hunger
+        self.timer_end[fed, fed_index] = new_timer
+        self.save(fed, now[ok])
+        self.feeds[fed] += 1
+        return status
+
+    def first_feedable(self, players, now) -> np.ndarray:
+        """每位玩家第一頭還沒吃飽的乳牛 id（都吃飽時回傳 1）"""
+        hungry = self.effective_hunger(players, now) < rules.MAX_HUNGER
+        return np.argmax(hungry, axis=1) + 1
@@ -0,0 +1,17 @@
+"""
+遊戲規則常數，需與 GameManager（src/js/game.js）、Herd（src/js/herd.js）
+與 Ledger（src/js/ledger.js）一致
+"""
+
+POINTS_PER_GRASS = 1  # 1 點數 = 1 牧草
+HUNGER_PER_FEED = 10  # 每次餵食增加的飽食度
+MAX_HUNGER = 100  # 飽食度上限
+TIMER_MS = 60_000  # 飽食度達到上限後，經過多久歸零（毫秒）
+DEFAULT_HERD_SIZE = 3  # 新玩家的乳牛數量
+SNAPSHOT_INTERVAL = 100  # 帳本累積多少筆交易後壓縮成快照
+
+# 餵食結果（對應 GameManager.feedCattle 的檢查順序）
+FEED_OK = 0
+FEED_NO_GRASS = 1  # 牧草不足
+FEED_NOT_FOUND = 2  # 找不到這頭乳牛
+FEED_FULL = 3  # 已經吃飽了
@@ -0,0 +1,350 @@
+"""
+大量玩家的批次模擬
+
+每位玩家依點擊速率分布抽出自己的速率（次/秒），每秒的點擊數為 Poisson 分布。
+每次點擊餵養一頭乳牛；牧草用完時先購買 purchase_size 個牧草。
+模擬以秒為步長，同一秒內所有玩家的第 k 次點擊一起以向量運算處理。
+
+寫入次數依各模組的寫入方式計算：
+- 遊戲數據經 WriteQueue 合併，每位玩家每秒最多寫入一次
+- 帳本交易每筆一個 key，與遊戲數據一起批次寫入
+- 購買牧草時直接寫入使用者資料與當前使用者資料
+- 帳本第一次有交易時寫入期初快照；每 SNAPSHOT_INTERVAL 筆交易壓縮一次
+  （寫入快照並刪除已併入的交易）
+"""
+
+import argparse
+import math
+from dataclasses import dataclass, field
+from typing import NamedTuple
+
+import numpy as np
+
+from . import rules, storage
+from .engine import Farm
+
+START_MS = 1_700_000_000_000  # 模擬開始的時間（毫秒）
+WRITE_FAMILIES = ("game", "user", "currentUser", "ledgerEntry", "ledgerSnapshot", "ledgerRemove")
+
+
+@dataclass
+class ClickRate:
+    """點擊速率分布（每位玩家平均每秒點擊次數）
+
+    kind：constant、exponential、lognormal（shape 為 sigma）、pareto（shape 為 alpha，需大於 1）
+    """
+
+    SHAPED_KINDS = ("lognormal", "pareto")  # 需要 shape 參數的分布
+    KINDS = ("constant", "exponential") + SHAPED_KINDS
+
+    kind: str = "lognormal"
+    mean: float = 1.0
+    shape: float = 1.0
+
+    def __post_init__(self):
+        if self.kind not in self.KINDS:
+            raise ValueError(f"不支援的點擊速率分布：{self.kind}（可用：{'、'.join(self.KINDS)}）")
+        if not (math.isfinite(self.mean) and self.mean > 0):
+            raise ValueError(f"平均點擊速率必須是大於 0 的數字：{self.mean}")
+        if not math.isfinite(self.shape):
+            raise ValueError(f"shape 必須是有限的數字：{self.shape}")
+        if self.kind == "lognormal" and self.shape <= 0:
+            raise ValueError("lognormal 的 shape 必須大於 0")
+        if self.kind == "pareto" and self.shape <= 1:
+            raise ValueError("pareto 的 shape 必須大於 1")
+
+    @classmethod
+    def parse(cls, spec: str) -> "ClickRate":
+        """由 "kind:mean[:shape]" 建立，例如 lognormal:1.5:0.8（作為 argparse 的 type，錯誤時丟出 ArgumentTypeError）"""
+        kind, *params = spec.split(":")
+        if kind not in cls.KINDS:
+            raise argparse.ArgumentTypeError(f"不支援的點擊速率分布：{kind}（可用：{'、'.join(cls.KINDS)}）")
+        usage = f"{kind}:mean[:shape]" if kind in cls.SHAPED_KINDS else f"{kind}:mean"
+        if not 1 <= len(params) <= (2 if kind in cls.SHAPED_KINDS else 1):
+            raise argparse.ArgumentTypeError(f"點擊速率格式錯誤：{spec}（應為 {usage}）")
+        try:
+            values = [float(param) for param in params]
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"點擊速率的參數必須是數字：{spec}（應為 {usage}）") from None
+        try:
+            return cls(kind, *values)
+        except ValueError as error:
+            raise argparse.ArgumentTypeError(str(error)) from error
+
+    def sample(self, rng: np.random.Generator, size: int) -> np.ndarray:
+        """抽出每位玩家的點擊速率"""
+        if self.kind == "constant":
+            return np.full(size, self.mean)
+        if self.kind == "exponential":
+            return rng.exponential(self.mean, size)
+        if self.kind == "lognormal":
+            mu = np.log(self.mean) - self.shape ** 2 / 2
+            return rng.lognormal(mu, self.shape, size)
+        if self.kind == "pareto":
+            scale = self.mean * (self.shape - 1) / self.shape
+            return scale * (1 + rng.pareto(self.shape, size))
+        raise ValueError(f"不支援的點擊速率分布：{self.kind}")
+
+
+@dataclass
+class Config:
+    """模擬參數"""
+
+    players: int = 100_000
+    herd_size: int = rules.DEFAULT_HERD_SIZE
+    duration_s: int = 60
+    click_rate: ClickRate = field(default_factory=ClickRate)
+    max_clicks_per_second: int = 20
+    purchase_size: int = 10  # 牧草用完時一次購買的數量
+    initial_points: int = 1_000
+    target: str = "random"  # random：隨機挑一頭乳牛；hungry：第一頭還沒吃飽的乳牛
+    username_length: int = 8
+    batch_size: int = 250_000
+    trace_players: int = 0  # 記錄前幾位玩家的操作（不超過 batch_size），供 replay 與 JS 交叉驗證
+    seed: int = 0
+
+
+class TraceEvent(NamedTuple):
+    """單一玩家的一次操作：buy 的 argument 為數量、result 為是否成功；feed 為乳牛 id 與 FEED_*"""
+
+    at: int
+    action: str
+    argument: int
+    result: int
+
+
+@dataclass
+class StorageStats:
+    """同一類 key 的儲存空間（key 與 value 合計，單位 bytes）"""
+
+    keys: int = 0
+    total_bytes: int = 0
+    max_bytes: int = 0
+
+    @property
+    def mean_bytes(self) -> float:
+        return self.total_bytes / self.keys if self.keys else 0.0
+
+    def add(self, count, size_bytes) -> None:
+        """加入 count 個大小為 size_bytes 的 key（兩者可為每位玩家的陣列）"""
+        count = np.broadcast_to(np.asarray(count, dtype=np.int64), np.shape(size_bytes))
+        size_bytes = np.asarray(size_bytes, dtype=np.int64)
+        self.keys += int(count.sum())
+        self.total_bytes += int((count * size_bytes).sum())
+        if count.any():
+            self.max_bytes = max(self.max_bytes, int(size_bytes[count > 0].max()))
+
+
+@dataclass
+class Report:
+    """模擬結果"""
+
+    config: Config
+    clicks: int = 0
+    purchases: int = 0
+    failed_purchases: int = 0
+    feeds: int = 0
+    feed_failures: dict = field(default_factory=dict)  # FEED_* → 次數
+    writes: dict = field(default_factory=dict)  # 寫入類別 → 每秒寫入次數
+    expiries: np.ndarray = None  # 每秒到期的計時器數
+    storage: dict = field(default_factory=dict)  # key 類別 → StorageStats
+    traces: dict = field(default_factory=dict)  # 玩家索引 → [TraceEvent]
+    final_states: dict = field(default_factory=dict)  # 玩家索引 → 模擬結束時的狀態
+
+    @property
+    def cattle(self) -> int:
+        return self.config.players * self.config.herd_size
+
+    @property
+    def total_bytes(self) -> int:
+        return sum(stats.total_bytes for stats in self.storage.values())
+
+
+def player_state(farm: Farm, player: int) -> dict:
+    """取得單一玩家的狀態（用於比對）"""
+    return {
+        "points": int(farm.points[player]),
+        "grass": int(farm.grass[player]),
+        "hunger": farm.hunger[player].tolist(),
+        "timerEndTime": farm.timer_end[player].tolist(),
+        "gameVersion": int(farm.game_version[player]),
+        "userVersion": int(farm.user_version[player]),
+    }
+
+
+def simulate(config: Config) -> Report:
+    """執行模擬並回傳報告"""
+    rng = np.random.default_rng(config.seed)
+    report = Report(
+        config=config,
+        feed_failures={status: 0 for status in (rules.FEED_NO_GRASS, rules.FEED_NOT_FOUND, rules.FEED_FULL)},
+        writes={family: np.zeros(config.duration_s, dtype=np.int64) for family in WRITE_FAMILIES},
+        expiries=np.zeros(config.duration_s, dtype=np.int64),
+    )
+
+    for offset in range(0, config.players, config.batch_size):
+        size = min(config.batch_size, config.players - offset)
+        # 只追蹤第一批的前 trace_players 位玩家
+        traced = min(config.trace_players, size) if offset == 0 else 0
+        farm = simulate_batch(config, rng, size, traced, report)
+        for player in range(traced):
+            report.final_states[player] = player_state(farm, player)
+        measure_storage(config, farm, report)
+
+    return report
+
+
+def simulate_batch(config: Config, rng: np.random.Generator, size: int, traced: int, report: Report) -> Farm:
+    """模擬一批玩家，寫入次數與到期數累加到 report"""
+    farm = Farm(size, config.herd_size, config.initial_points)
+    rates = config.click_rate.sample(rng, size)
+    traces = {player: [] for player in range(traced)}
+
+    for second in range(config.duration_s):
+        start = START_MS + second * 1000
+        clicks = np.minimum(rng.poisson(rates), config.max_clicks_per_second)
+        versions_before = farm.game_version.copy()
+        entries_before = farm.ledger_entries
+        purchases_before = farm.purchases.copy()
+        report.clicks += int(clicks.sum())
+
+        for round_index in range(int(clicks.max(initial=0))):
+            active = np.nonzero(clicks > round_index)[0]
+            # 同一秒內的點擊平均分布，時間取整數毫秒（與 Date.now() 相同）
+            now = start + (round_index + 1) * 1000 // (clicks[active] + 1)
+
+            need_grass = farm.grass[active] < 1
+            bought = farm.buy_grass(active[need_grass], config.purchase_size, now[need_grass])
+            report.purchases += int(bought.sum())
+            report.failed_purchases += int((~bought).sum())
+
+            if config.target == "hungry":
+                targets = farm.first_feedable(active, now)
+            else:
+                targets = rng.integers(1, config.herd_size + 1, size=active.size)
+            status = farm.feed(active, targets, now)
+            report.feeds += int((status == rules.FEED_OK).sum())
+            for failure in report.feed_failures:
+                report.feed_failures[failure] += int((status == failure).sum())
+
+            # 新設定的計時器：依到期時間計入對應的秒數
+            started = (status == rules.FEED_OK) & (farm.hunger[active, targets - 1] >= rules.MAX_HUNGER)
+            timers = farm.timer_end[active[started], targets[started] - 1]
+            expiry_seconds = ((timers - START_MS) // 1000).astype(np.int64)
+            expiry_seconds = expiry_seconds[expiry_seconds < config.duration_s]
+            report.expiries += np.bincount(expiry_seconds, minlength=config.duration_s)
+
+            record_traces(traces, config.purchase_size, active, need_grass, bought, targets, status, now)
+
+        entries_after = farm.ledger_entries
+        bought_this_second = farm.purchases - purchases_before
+        compactions = entries_after // rules.SNAPSHOT_INTERVAL - entries_before // rules.SNAPSHOT_INTERVAL
+        opened = (entries_before == 0) & (entries_after > 0)
+        report.writes["game"][second] += int((farm.game_version != versions_before).sum())
+        report.writes["user"][second] += int(bought_this_second.sum())
+        report.writes["currentUser"][second] += int(bought_this_second.sum())
+        report.writes["ledgerEntry"][second] += int((entries_after - entries_before).sum())
+        report.writes["ledgerSnapshot"][second] += int(opened.sum() + compactions.sum())
+        report.writes["ledgerRemove"][second] += int(compactions.sum()) * rules.SNAPSHOT_INTERVAL
+
+    report.traces.update(traces)
+    return farm
+
+
+def record_traces(traces: dict, purchase_size: int, active, need_grass, bought, targets, status, now) -> None:
+    """記錄受追蹤玩家在這一輪的操作"""
+    if not traces:
+        return
+    bought_by_player = dict(zip(active[need_grass].tolist(), bought.tolist()))
+    for index in np.nonzero(active < len(traces))[0]:
+        player, at = int(active[index]), int(now[index])
+        if player in bought_by_player:
+            traces[player].append(TraceEvent(at, "buy", purchase_size, int(bought_by_player[player])))
+        traces[player].append(TraceEvent(at, "feed", int(targets[index]), int(status[index])))
+
+
+def measure_storage(config: Config, farm: Farm, report: Report) -> None:
+    """計算模擬結束時每類 key 的大小，累加到 report"""
+    stats = {name: report.storage.setdefault(name, StorageStats())
+             for name in ("user", "currentUser", "game", "ledgerEntry", "ledgerSnapshot")}
+    # 註冊、登入、設定初始點數各寫入一次使用者資料；登入時建立遊戲數據
+    user_version = farm.user_version + 3
+    game_version = farm.game_version + 1
+
+    stats["user"].add(1, storage.to_bytes(
+        storage.key_chars(storage.USER_KEY_PREFIX)
+        + storage.user_record_chars(farm.points, user_version, config.username_length)
+    ))
+    # 每位玩家在自己的瀏覽器登入，各有一份當前使用者資料
+    stats["currentUser"].add(1, storage.to_bytes(
+        len(storage.CURRENT_USER_KEY) + storage.current_user_chars(farm.points, config.username_length)
+    ))
+    stats["game"].add(1, storage.to_bytes(
+        storage.key_chars(storage.GAME_DATA_KEY_PREFIX)
+        + storage.game_record_chars(game_version, farm.grass, config.herd_size)
+    ))
+
+    # 尚未壓縮的交易依購買與餵食的比例估計
+    entries = farm.ledger_entries
+    live = storage.ledger_live_entries(entries)
+    live_purchases = np.where(entries > 0, live * farm.purchases // np.maximum(entries, 1), 0)
+    entry_key = storage.key_chars(storage.LEDGER_KEY_PREFIX, suffix_length=storage.ENTRY_ID_LENGTH)
+    purchase_bytes = storage.to_bytes(entry_key + storage.ledger_entry_chars(
+        "purchase", -config.purchase_size, config.purchase_size))
+    feed_bytes = storage.to_bytes(entry_key + storage.ledger_entry_chars(
+        "feed", 0, -1, np.arange(1, config.herd_size + 1)))
+    stats["ledgerEntry"].add(live_purchases, np.full(farm.players, purchase_bytes))
+    stats["ledgerEntry"].add(live - live_purchases, np.full(farm.players, feed_bytes.max()))
+
+    # 快照的累計以全部交易估計（位數的上限）
+    folded = np.where(entries >= rules.SNAPSHOT_INTERVAL, rules.SNAPSHOT_INTERVAL, 0)
+    totals = {
+        "purchase": (farm.purchases, -config.purchase_size * farm.purchases, config.purchase_size * farm.purchases),
+        "feed": (farm.feeds, 0, -farm.feeds),
+    }
+    stats["ledgerSnapshot"].add(entries > 0, storage.to_bytes(
+        storage.key_chars(storage.SNAPSHOT_KEY_PREFIX)
+        + storage.snapshot_chars(farm.points, farm.grass, totals, folded)
+    ))
+
+
+def replay(events, herd_size: int = rules.DEFAULT_HERD_SIZE, initial_points: int = 0) -> tuple[Farm, list[int]]:
+    """逐一重播單一玩家的操作，回傳 (Farm, 每次操作的結果)"""
+    farm = Farm(1, herd_size, initial_points)
+    results = []
+    for event in events:
+        if event.action == "buy":
+            results.append(int(farm.buy_grass([0], event.argument, event.at)[0]))
+        else:
+            results.append(int(farm.feed([0], [event.argument], event.at)[0]))
+    return farm, results
+
+
+def format_report(report: Report) -> str:
+    """將報告整理為文字表格"""
+    config = report.config
+    duration = config.duration_s
+    lines = [
+        f"玩家 {config.players:,} 位、乳牛 {report.cattle:,} 頭、模擬 {duration} 秒"
+        f"（點擊速率 {config.click_rate.kind} 平均 {config.click_rate.mean}/秒）",
+        f"點擊 {report.clicks:,} 次：餵食成功 {report.feeds:,}、牧草不足 {report.feed_failures[rules.FEED_NO_GRASS]:,}、"
+        f"已吃飽 {report.feed_failures[rules.FEED_FULL]:,}；購買牧草 {report.purchases:,} 次"
+        f"（點數不足 {report.failed_purchases:,}）",
+        "",
+        "寫入次數（次/秒）        平均        尖峰",
+    ]
+    for family, per_second in report.writes.items():
+        lines.append(f"  {family:<20}{per_second.mean():>10.1f}{per_second.max(initial=0):>12,}")
+    total = sum(report.writes.values())
+    lines.append(f"  {'total':<20}{total.mean():>10.1f}{total.max(initial=0):>12,}")
+    lines += [
+        "",
+        f"計時器到期（次/秒）：平均 {report.expiries.mean():.1f}、尖峰 {report.expiries.max(initial=0):,}",
+        "",
+        "儲存空間（bytes）        keys        平均        最大          合計",
+    ]
+    for name, stats in report.storage.items():
+        lines.append(f"  {name:<18}{stats.keys:>10,}{stats.mean_bytes:>12.1f}{stats.max_bytes:>10,}"
+                     f"{stats.total_bytes:>14,}")
+    lines.append(f"  {'total':<18}{'':>32}{report.total_bytes:>14,}")
+    return "\n".join(lines)
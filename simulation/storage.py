@@ -0,0 +1,116 @@
+"""
+儲存空間模型
+
+依各模組寫入的 JSON 格式計算每個 key 的大小（與 JSON.stringify 的結果逐字元相同），
+所有函式都接受 NumPy 陣列，一次計算所有玩家。
+
+localStorage 以 UTF-16 計算容量，每個字元 2 bytes，key 本身也計入；
+帳號、id 與時間都是 ASCII，字元數即為 JSON 長度。
+"""
+
+import numpy as np
+
+from . import rules
+
+BYTES_PER_CHAR = 2  # UTF-16
+ID_LENGTH = 19  # UserManager.generateId：時間（8 字元）+ 亂數（約 11 字元）
+ENTRY_ID_LENGTH = 20  # Ledger.generateEntryId：時間（8）- 分頁（6）- 計數（4）
+ISO_DATE_LENGTH = 24  # new Date().toISOString()
+
+USER_KEY_PREFIX = "cattleFarmUser:"
+CURRENT_USER_KEY = "cattleFarmCurrentUser"
+GAME_DATA_KEY_PREFIX = "cattleFarmGameData:"
+LEDGER_KEY_PREFIX = "cattleFarmLedger:"
+SNAPSHOT_KEY_PREFIX = "cattleFarmLedgerSnapshot:"
+
+_POWERS_OF_TEN = 10 ** np.arange(1, 19, dtype=np.int64)
+
+
+def digits(values) -> np.ndarray:
+    """整數以十進位輸出的字元數（含負號）"""
+    values = np.asarray(values, dtype=np.int64)
+    return 1 + np.searchsorted(_POWERS_OF_TEN, np.abs(values), side="right") + (values < 0)
+
+
+def base64_length(byte_count) -> np.ndarray:
+    """base64 編碼後的字元數"""
+    return 4 * -(-np.asarray(byte_count, dtype=np.int64) // 3)
+
+
+def herd_chars(herd_size) -> np.ndarray:
+    """Herd.encode 的 JSON 長度：{"size":S,"hunger":"…","timerEndTime":"…"}"""
+    herd_size = np.asarray(herd_size, dtype=np.int64)
+    template = len('{"size":,"hunger":"","timerEndTime":""}')
+    return template + digits(herd_size) + base64_length(herd_size) + base64_length(8 * herd_size)
+
+
+def game_record_chars(version, grass, herd_size, id_length: int = ID_LENGTH) -> np.ndarray:
+    """GameManager.encodeGameData 的 JSON 長度"""
+    template = len('{"userId":"","version":,"grass":,"herd":}')
+    return template + id_length + digits(version) + digits(grass) + herd_chars(herd_size)
+
+
+def user_record_chars(points, version, username_length, logged_in: bool = True,
+                      password_length=8, id_length: int = ID_LENGTH) -> np.ndarray:
+    """使用者資料（cattleFarmUser:<id>）的 JSON 長度"""
+    template = len('{"id":"","username":"","password":"","role":"user","points":,'
+                   '"createdAt":"","lastLogin":,"version":}')
+    last_login = ISO_DATE_LENGTH + 2 if logged_in else len("null")
+    return (template + id_length + np.asarray(username_length) + np.asarray(password_length)
+            + digits(points) + ISO_DATE_LENGTH + last_login + digits(version))
+
+
+def current_user_chars(points, username_length, id_length: int = ID_LENGTH) -> np.ndarray:
+    """當前使用者（UserManager.toSafeUser）的 JSON 長度（登入中，lastLogin 為時間字串）"""
+    template = len('{"id":"","username":"","role":"user","points":,"createdAt":"","lastLogin":""}')
+    return template + id_length + np.asarray(username_length) + digits(points) + 2 * ISO_DATE_LENGTH
+
+
+def ledger_entry_chars(type_name: str, points, grass, cattle_id=None) -> np.ndarray:
+    """帳本交易（Ledger.createEntry）的 JSON 長度"""
+    template = len('{"type":"","points":,"grass":,"at":""}') + len(type_name) + ISO_DATE_LENGTH
+    chars = template + digits(points) + digits(grass)
+    if cattle_id is not None:
+        chars = chars + len(',"cattleId":') + digits(cattle_id)
+    return chars
+
+
+def totals_chars(counts, points, grass, type_name: str) -> np.ndarray:
+    """快照中單一類型的累計：\"type\":{"count":c,"points":p,"grass":g}"""
+    template = len('"":{"count":,"points":,"grass":}') + len(type_name)
+    return template + digits(counts) + digits(points) + digits(grass)
+
+
+def snapshot_chars(points, grass, totals, folded) -> np.ndarray:
+    """帳本快照的 JSON 長度
+
+    totals 為 {類型: (筆數, 點數合計, 牧草合計)}（筆數為 0 的類型不會出現在快照），
+    folded 為最近一次壓縮併入的交易數
+    """
+    folded = np.asarray(folded, dtype=np.int64)
+    template = len('{"points":,"grass":,"totals":{},"folded":[],"compactedAt":""}') + ISO_DATE_LENGTH
+    chars = template + digits(points) + digits(grass)
+
+    present = np.zeros(np.shape(folded), dtype=np.int64)
+    for type_name, (counts, type_points, type_grass) in totals.items():
+        counts = np.asarray(counts, dtype=np.int64)
+        chars = chars + np.where(counts > 0, totals_chars(counts, type_points, type_grass, type_name), 0)
+        present = present + (counts > 0)
+    # 各類型之間的逗號；每個交易 id 加上引號，id 之間以逗號分隔
+    chars = chars + np.maximum(present - 1, 0)
+    return chars + folded * (ENTRY_ID_LENGTH + 2) + np.maximum(folded - 1, 0)
+
+
+def key_chars(prefix: str, id_length: int = ID_LENGTH, suffix_length: int = 0) -> int:
+    """key 的字元數：前綴 + 使用者 id（+ ':' 與後綴）"""
+    return len(prefix) + id_length + (suffix_length + 1 if suffix_length else 0)
+
+
+def to_bytes(chars) -> np.ndarray:
+    """字元數換算為 localStorage 佔用的 bytes"""
+    return np.asarray(chars, dtype=np.int64) * BYTES_PER_CHAR
+
+
+def ledger_live_entries(total_entries) -> np.ndarray:
+    """單一分頁操作時，尚未壓縮的交易數（每 SNAPSHOT_INTERVAL 筆壓縮一次）"""
+    return np.asarray(total_entries, dtype=np.int64) % rules.SNAPSHOT_INTERVAL
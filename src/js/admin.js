@@ -2,16 +2,50 @@
  * 管理員後臺介面處理模組
  */
 
-const AdminPage = {
+import { ChangeBus } from './change-bus.js';
+import { UserManager } from './user-manager.js';
+import { GameManager } from './game.js';
+import { Auth } from './auth.js';
+import { UserQueryClient } from './user-query-client.js';
+import { UserListView } from './user-list-view.js';
+import { UserPicker } from './user-picker.js';
+
+export const AdminPage = {
+  USERS_LOAD_CHUNK: 500, // 使用者列表每批讀取並交給查詢引擎的使用者數
+  usersSummary: { total: 0, totalPoints: 0 }, // 使用者列表目前顯示的統計
+  usersLoadId: 0, // 最新一次載入使用者列表的編號（重新載入時停止較舊的載入）
+
   /**
    * 初始化管理員頁面
    */
   init() {
     this.adminPage = document.getElementById('admin-page');
-    this.usersListEl = document.getElementById('users-list');
-    this.targetUserSelect = document.getElementById('target-user');
     this.messageEl = document.getElementById('admin-message');
 
+    // 使用者列表只繪製可視範圍，篩選與排序交給查詢引擎（Web Worker）
+    UserQueryClient.init();
+    UserListView.init(document.getElementById('users-list'));
+    this.usersSummaryEl = document.getElementById('users-summary');
+    this.usersFilterInputs = ['users-filter', 'users-min-points', 'users-max-points', 'users-sort']
+      .map(id => document.getElementById(id));
+    this.usersFilterInputs.forEach(input => {
+      input.addEventListener('input', () => {
+        this.applyUsersQuery();
+      });
+    });
+
+    // 以帳號搜尋選擇使用者
+    this.targetUserPicker = UserPicker.create(
+      document.getElementById('target-user-picker'),
+      async (entry) => this.describeTargetUser(await UserManager.getUserById(entry.id))
+    );
+    this.herdUserPicker = UserPicker.create(document.getElementById('herd-user-picker'));
+
+    // 其他分頁變更點數時更新使用者列表
+    ChangeBus.subscribe('pointsChanged', ({ changes }) => {
+      this.handleRemotePointsChange(changes);
+    });
+
     // 綁定登出按鈕
     document.getElementById('admin-logout').addEventListener('click', () => {
       this.handleLogout();
@@ -22,13 +56,28 @@ const AdminPage = {
       e.preventDefault();
       this.handleAssignPoints();
     });
+
+    // 綁定批次指派點數表單
+    document.getElementById('bulkPointsForm').addEventListener('submit', (e) => {
+      e.preventDefault();
+      this.handleBulkPoints();
+    });
+    document.getElementById('bulk-points-file').addEventListener('change', (e) => {
+      this.handleBulkPointsFile(e.target.files[0]);
+    });
+
+    // 綁定乳牛數量表單
+    document.getElementById('herdSizeForm').addEventListener('submit', (e) => {
+      e.preventDefault();
+      this.handleSetHerdSize();
+    });
   },
 
   /**
    * 顯示管理員頁面
    */
-  show() {
-    const user = UserManager.getCurrentUser();
+  async show() {
+    const user = await UserManager.getCurrentUser();
     if (!user || user.role !== 'admin') {
       this.redirectToAuth();
       return;
@@ -41,8 +90,8 @@ const AdminPage = {
     document.getElementById('admin-username').textContent = user.username;
 
     // 載入使用者列表
-    this.loadUsersList();
-    this.loadUsersSelect();
+    await this.loadUsersList();
+    await this.loadUsersSelect();
   },
 
   /**
@@ -54,56 +103,124 @@ const AdminPage = {
 
   /**
    * 載入使用者列表
+   * 由帳號目錄取得 id 後分批讀取使用者交給查詢引擎，第一批讀取後就顯示列表，
+   * 之後每批只重新查詢可視範圍；批次之間讓出主執行緒，大量使用者時畫面仍可操作
    */
-  loadUsersList() {
-    const users = UserManager.getRegularUsers();
-    
-    if (users.length === 0) {
-      this.usersListEl.innerHTML = '<p class="no-users">目前沒有一般使用者</p>';
-      return;
+  async loadUsersList() {
+    const loadId = ++this.usersLoadId;
+    const ids = await UserManager.getUserIds('user');
+    await UserQueryClient.load([]);
+
+    let start = 0;
+    do {
+      const users = await UserManager.getUsersByIds(ids.slice(start, start + this.USERS_LOAD_CHUNK));
+      if (loadId !== this.usersLoadId) return;
+      await UserQueryClient.updateMany(users);
+      if (start === 0) {
+        await this.applyUsersQuery();
+      } else {
+        await UserListView.refresh();
+      }
+      start += this.USERS_LOAD_CHUNK;
+      await new Promise(resolve => setTimeout(resolve, 0));
+    } while (start < ids.length && loadId === this.usersLoadId);
+  },
+
+  /**
+   * 取得使用者列表的篩選與排序條件
+   */
+  getUsersQuery() {
+    const [filterInput, minInput, maxInput, sortSelect] = this.usersFilterInputs;
+    const [sortBy, order] = sortSelect.value.split(':');
+    const toNumber = value => (value === '' ? null : Number(value));
+    return {
+      username: filterInput.value.trim(),
+      minPoints: toNumber(minInput.value),
+      maxPoints: toNumber(maxInput.value),
+      sortBy,
+      order
+    };
+  },
+
+  /**
+   * 依目前的條件重新查詢使用者列表
+   */
+  async applyUsersQuery() {
+    const params = this.getUsersQuery();
+    const filtered = params.username !== '' || params.minPoints !== null || params.maxPoints !== null;
+
+    await UserListView.setSource(async (offset, limit) => {
+      const page = await UserQueryClient.query({ ...params, offset, limit });
+      this.renderUsersSummary(page.total, page.totalPoints);
+      return page;
+    }, filtered ? '沒有符合條件的使用者' : '目前沒有一般使用者');
+  },
+
+  /**
+   * 更新使用者列表的統計
+   */
+  renderUsersSummary(total, totalPoints) {
+    this.usersSummary = { total, totalPoints };
+    this.usersSummaryEl.textContent = `共 ${total} 位使用者，總點數 ${totalPoints}`;
+  },
+
+  /**
+   * 單一使用者點數變更後，只更新該使用者的表格列、選擇器項目與統計
+   * 目前依點數排序或篩選時，列的位置可能改變，改為重新查詢可視範圍
+   */
+  async applyPointsChange(user, delta) {
+    await UserQueryClient.update(user);
+
+    const params = this.getUsersQuery();
+    if (params.sortBy === 'points' || params.minPoints !== null || params.maxPoints !== null) {
+      await UserListView.refresh();
+    } else {
+      UserListView.updatePoints(user.id, user.points);
+      if (user.username.toLowerCase().includes(params.username.toLowerCase())) {
+        this.renderUsersSummary(this.usersSummary.total, this.usersSummary.totalPoints + delta);
+      }
     }
 
-    let html = '<table class="users-table">';
-    html += '<thead><tr><th>帳號</th><th>點數</th><th>註冊日期</th><th>上次登入</th></tr></thead>';
-    html += '<tbody>';
-
-    users.forEach(user => {
-      html += `
-        <tr>
-          <td>${this.escapeHtml(user.username)}</td>
-          <td class="points-cell">${user.points}</td>
-          <td>${UserManager.formatDateTime(user.createdAt)}</td>
-          <td>${UserManager.formatDateTime(user.lastLogin)}</td>
-        </tr>
-      `;
+    UserPicker.updateLabel(this.targetUserPicker, user.id, this.describeTargetUser(user));
+  },
+
+  /**
+   * 套用其他分頁的點數變更（UserManager 已先更新快取）
+   */
+  async handleRemotePointsChange(changes) {
+    if (!this.adminPage.classList.contains('active')) return;
+
+    const users = await Promise.all(changes.map(([userId]) => UserManager.getUserById(userId)));
+    const regularUsers = users.filter(user => user && user.role === 'user');
+    if (regularUsers.length === 0) return;
+
+    await UserQueryClient.updateMany(regularUsers);
+    await UserListView.refresh();
+    regularUsers.forEach(user => {
+      UserPicker.updateLabel(this.targetUserPicker, user.id, this.describeTargetUser(user));
     });
+  },
 
-    html += '</tbody></table>';
-    this.usersListEl.innerHTML = html;
+  /**
+   * 指派點數選擇器的項目文字
+   */
+  describeTargetUser(user) {
+    return `${user.username} (目前點數: ${user.points})`;
   },
 
   /**
-   * 載入使用者選單
+   * 重設使用者選擇器
    */
-  loadUsersSelect() {
-    const users = UserManager.getRegularUsers();
-    
-    // 清空選單
-    this.targetUserSelect.innerHTML = '<option value="">請選擇使用者</option>';
-
-    users.forEach(user => {
-      const option = document.createElement('option');
-      option.value = user.id;
-      option.textContent = `${user.username} (目前點數: ${user.points})`;
-      this.targetUserSelect.appendChild(option);
-    });
+  async loadUsersSelect() {
+    UserPicker.clear(this.targetUserPicker);
+    UserPicker.clear(this.herdUserPicker);
   },
 
   /**
    * 處理指派點數
    */
-  handleAssignPoints() {
-    const userId = this.targetUserSelect.value;
+  async handleAssignPoints() {
+    const userId = UserPicker.getValue(this.targetUserPicker);
     const pointsAmount = parseInt(document.getElementById('points-amount').value);
 
     if (!userId) {
@@ -116,22 +233,114 @@ const AdminPage = {
       return;
     }
 
-    const user = UserManager.getUserById(userId);
-    if (!user) {
-      this.showMessage('找不到使用者', 'error');
+    // 以最新點數累加，不會覆蓋其他分頁同時進行的變更
+    const result = await UserManager.addPoints(userId, pointsAmount);
+
+    if (result.success) {
+      const user = result.user;
+      this.showMessage(`成功為 ${user.username} 增加 ${pointsAmount} 點數`, 'success');
+      // 只更新這位使用者的畫面，保留選擇以便連續指派
+      await this.applyPointsChange(user, pointsAmount);
+      document.getElementById('points-amount').value = '';
+    } else {
+      this.showMessage(result.message, 'error');
+    }
+  },
+
+  /**
+   * 讀取 CSV 檔案內容到批次指派欄位
+   */
+  async handleBulkPointsFile(file) {
+    if (!file) return;
+    document.getElementById('bulk-points-input').value = await file.text();
+  },
+
+  /**
+   * 解析批次指派內容：每行「帳號,點數」（也接受 Tab 或分號分隔）
+   * 回傳 { credits: [{ userId, delta }], errors: [錯誤訊息] }
+   */
+  async parseBulkPoints(text) {
+    const directory = await UserManager.getDirectory();
+    const credits = [];
+    const errors = [];
+
+    text.split(/\r?\n/).forEach((line, index) => {
+      const lineNumber = index + 1;
+      if (!line.trim()) return;
+
+      const [username = '', amountText = ''] = line.split(/[,\t;]/).map(part => part.trim());
+      const amount = Number(amountText);
+      if (!Number.isInteger(amount) || amount < 1) {
+        // 第一行可能是標題列
+        if (lineNumber !== 1) {
+          errors.push(`第 ${lineNumber} 行：點數格式錯誤`);
+        }
+        return;
+      }
+
+      const entry = directory.get(username);
+      if (!entry || entry.role !== 'user') {
+        errors.push(`第 ${lineNumber} 行：找不到使用者 ${username}`);
+        return;
+      }
+      credits.push({ userId: entry.id, delta: amount });
+    });
+
+    return { credits, errors };
+  },
+
+  /**
+   * 處理批次指派點數（所有點數在一次寫入中完成）
+   */
+  async handleBulkPoints() {
+    const { credits, errors } = await this.parseBulkPoints(
+      document.getElementById('bulk-points-input').value
+    );
+
+    if (credits.length === 0 && errors.length === 0) {
+      this.showMessage('請輸入要指派的點數', 'error');
       return;
     }
 
-    const newPoints = user.points + pointsAmount;
-    const result = UserManager.updatePoints(userId, newPoints);
+    const result = await UserManager.applyPointCredits(credits);
+    const failedCount = errors.length + result.failed.length;
+    let message = `成功為 ${result.updated.length} 位使用者指派點數`;
+    if (failedCount > 0) {
+      message += `，${failedCount} 筆失敗（${errors.concat(result.failed.map(f => f.message)).slice(0, 3).join('；')}）`;
+    }
+
+    if (result.updated.length > 0) {
+      await UserQueryClient.updateMany(result.updated);
+      await UserListView.refresh();
+      this.showMessage(message, 'success');
+      document.getElementById('bulkPointsForm').reset();
+    } else {
+      this.showMessage(message, 'error');
+    }
+  },
+
+  /**
+   * 處理設定乳牛數量
+   */
+  async handleSetHerdSize() {
+    const userId = UserPicker.getValue(this.herdUserPicker);
+    const herdSize = parseInt(document.getElementById('herd-size').value);
 
+    if (!userId) {
+      this.showMessage('請選擇使用者', 'error');
+      return;
+    }
+
+    if (isNaN(herdSize)) {
+      this.showMessage('請輸入有效的乳牛數量', 'error');
+      return;
+    }
+
+    const result = await GameManager.setHerdSize(userId, herdSize);
     if (result.success) {
-      this.showMessage(`成功為 ${user.username} 增加 ${pointsAmount} 點數`, 'success');
-      // 重新載入使用者列表和選單
-      this.loadUsersList();
-      this.loadUsersSelect();
-      // 清除表單
-      document.getElementById('assignPointsForm').reset();
+      this.showMessage(result.message, 'success');
+      document.getElementById('herdSizeForm').reset();
+      UserPicker.clear(this.herdUserPicker);
     } else {
       this.showMessage(result.message, 'error');
     }
@@ -140,8 +349,8 @@ const AdminPage = {
   /**
    * 處理登出
    */
-  handleLogout() {
-    UserManager.logout();
+  async handleLogout() {
+    await UserManager.logout();
     this.hide();
     
     // 確保隱藏使用者頁面
@@ -181,19 +390,5 @@ const AdminPage = {
     const authPage = document.getElementById('auth-page');
     authPage.classList.add('active');
     Auth.showLoginForm();
-  },
-
-  /**
-   * HTML 轉義（防止 XSS）
-   */
-  escapeHtml(text) {
-    const map = {
-      '&': '&amp;',
-      '<': '&lt;',
-      '>': '&gt;',
-      '"': '&quot;',
-      "'": '&#039;'
-    };
-    return text.replace(/[&<>"']/g, m => map[m]);
   }
 };
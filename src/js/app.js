@@ -1,26 +1,100 @@
 /**
  * 應用程式主程式
+ * 啟動時只載入資料層與登入介面，管理員或使用者頁面在登入後才依角色載入
  */
 
-const App = {
+import { StorageEngine } from './storage-engine.js';
+import { ChangeBus } from './change-bus.js';
+import { RecordLock } from './record-lock.js';
+import { WriteQueue } from './write-queue.js';
+import { UserQuery } from './user-query.js';
+import { Ledger } from './ledger.js';
+import { UserManager } from './user-manager.js';
+import { Clock } from './clock.js';
+import { ExpiryScheduler } from './expiry-scheduler.js';
+import { Herd } from './herd.js';
+import { GameManager } from './game.js';
+import { Auth } from './auth.js';
+
+export const App = {
+  ready: null, // 初始化完成的 Promise（供測試與其他模組等待）
+  PAGE_MODULES: {
+    admin: { path: './admin.js', name: 'AdminPage' },
+    user: { path: './user.js', name: 'UserPage' }
+  },
+  pages: new Map(), // 角色 → Promise<頁面物件>（每個頁面只載入並初始化一次）
+
   /**
    * 初始化應用程式
    */
-  init() {
-    // 初始化各個模組
+  async init() {
+    // 選擇儲存引擎並初始化資料層
+    await StorageEngine.select();
+    ChangeBus.init();
+    WriteQueue.init();
+    await UserManager.init();
+    await GameManager.init();
+
+    // 初始化登入介面（頁面模組在需要時才載入）
     Auth.init();
-    AdminPage.init();
-    UserPage.init();
 
     // 檢查登入狀態並重導向
-    this.checkLoginStatus();
+    await this.checkLoginStatus();
+
+    this.registerServiceWorker();
+  },
+
+  /**
+   * 註冊 Service Worker，預先快取 App Shell 以支援離線使用
+   * 失敗時只影響離線功能，不影響遊戲
+   */
+  registerServiceWorker() {
+    if (!('serviceWorker' in navigator)) return;
+
+    navigator.serviceWorker.register('sw.js').catch((error) => {
+      console.warn('無法註冊 Service Worker：', error);
+    });
+  },
+
+  /**
+   * 載入並初始化角色對應的頁面模組
+   */
+  loadPage(role) {
+    const key = role === 'admin' ? 'admin' : 'user';
+    if (!this.pages.has(key)) {
+      const { path, name } = this.PAGE_MODULES[key];
+      this.pages.set(key, import(path).then((module) => {
+        const page = module[name];
+        page.init();
+        this.exposeGlobals({ [name]: page });
+        return page;
+      }));
+    }
+    return this.pages.get(key);
+  },
+
+  /**
+   * 顯示使用者角色對應的頁面
+   */
+  async showPage(user) {
+    const page = await this.loadPage(user.role);
+    await page.show();
+  },
+
+  /**
+   * 將模組掛到 window 上，供測試與開發者工具直接存取
+   */
+  exposeGlobals(modules) {
+    Object.assign(window, modules);
   },
 
   /**
    * 檢查登入狀態
    */
-  checkLoginStatus() {
-    const user = UserManager.getCurrentUser();
+  async checkLoginStatus() {
+    const user = await UserManager.getCurrentUser();
+    // 提早開始載入頁面模組
+    if (user) this.loadPage(user.role);
 
     // 先隱藏所有頁面
     document.getElementById('auth-page').classList.remove('active');
@@ -29,11 +103,7 @@ const App = {
 
     if (user) {
       // 已登入，根據角色顯示對應頁面
-      if (user.role === 'admin') {
-        AdminPage.show();
-      } else {
-        UserPage.show();
-      }
+      await this.showPage(user);
     } else {
       // 未登入，顯示登入頁面
       document.getElementById('auth-page').classList.add('active');
@@ -42,7 +112,12 @@ const App = {
   }
 };
 
+App.exposeGlobals({
+  StorageEngine, ChangeBus, RecordLock, WriteQueue, UserQuery, Ledger,
+  UserManager, Clock, ExpiryScheduler, Herd, GameManager, Auth, App
+});
+
 // 等待 DOM 載入完成後初始化應用程式
 document.addEventListener('DOMContentLoaded', () => {
-  App.init();
+  App.ready = App.init();
 });
@@ -2,7 +2,10 @@
  * 登入/註冊介面處理模組
  */
 
-const Auth = {
+import { UserManager } from './user-manager.js';
+import { App } from './app.js';
+
+export const Auth = {
   /**
    * 初始化登入/註冊介面
    */
@@ -60,7 +63,7 @@ const Auth = {
   /**
    * 處理登入
    */
-  handleLogin() {
+  async handleLogin() {
     const username = document.getElementById('login-username').value.trim();
     const password = document.getElementById('login-password').value;
 
@@ -69,10 +72,12 @@ const Auth = {
       return;
     }
 
-    const result = UserManager.login(username, password);
+    const result = await UserManager.login(username, password);
     
     if (result.success) {
       this.showMessage(result.message, 'success');
+      // 顯示成功訊息期間先載入頁面模組
+      App.loadPage(result.user.role);
       // 延遲跳轉，讓使用者看到成功訊息
       setTimeout(() => {
         this.redirectToUserPage();
@@ -85,7 +90,7 @@ const Auth = {
   /**
    * 處理註冊
    */
-  handleRegister() {
+  async handleRegister() {
     const username = document.getElementById('register-username').value.trim();
     const password = document.getElementById('register-password').value;
     const passwordConfirm = document.getElementById('register-password-confirm').value;
@@ -101,7 +106,7 @@ const Auth = {
       return;
     }
 
-    const result = UserManager.register(username, password);
+    const result = await UserManager.register(username, password);
     
     if (result.success) {
       this.showMessage(result.message + '，即將跳轉到登入頁面', 'success');
@@ -145,8 +150,8 @@ const Auth = {
   /**
    * 重導向到使用者頁面
    */
-  redirectToUserPage() {
-    const user = UserManager.getCurrentUser();
+  async redirectToUserPage() {
+    const user = await UserManager.getCurrentUser();
     if (!user) return;
 
     // 確保隱藏登入頁面
@@ -156,11 +161,7 @@ const Auth = {
     document.getElementById('user-page').classList.remove('active');
     document.getElementById('admin-page').classList.remove('active');
 
-    // 根據角色顯示對應頁面
-    if (user.role === 'admin') {
-      AdminPage.show();
-    } else {
-      UserPage.show();
-    }
+    // 根據角色載入並顯示對應頁面
+    await App.showPage(user);
   }
 };
@@ -0,0 +1,103 @@
+/**
+ * 跨分頁變更通知模組
+ * 以 BroadcastChannel 傳送細部的資料變更，其他分頁直接套用到記憶體快取，不需要重新讀取儲存引擎
+ *
+ * 訊息格式：{ type, detail }
+ * - pointsChanged：{ changes: [[userId, points, version, pointsOnly], ...] }
+ *   pointsOnly 為 false 代表該版本還變更了點數以外的欄位
+ * - herdChanged：{ userId, version, grass, cattle: [[cattleId, hunger, timerEndTime], ...] }
+ *   或整個牛群改變時 { userId, version, grass, herd: 編碼後的牛群 }
+ * - watchExpirations / unwatchExpirations / cattleExpired / leaderChanged：乳牛到期追蹤（見 GameManager）
+ *
+ * 同時以 Web Locks 選出一個主分頁（leader），只有主分頁負責排程乳牛到期。
+ * 瀏覽器不支援 BroadcastChannel 或 Web Locks 時，每個分頁都是自己的主分頁。
+ * 發送訊息的分頁不會收到自己的訊息。
+ */
+
+export const ChangeBus = {
+  CHANNEL_NAME: 'cattleFarm',
+  LEADER_LOCK: 'cattleFarmLeader',
+  channel: null,
+  handlers: new Map(), // type → [handler]
+  leaderHandlers: [],
+  isLeader: false,
+
+  /**
+   * 開啟頻道並參與主分頁選舉
+   */
+  init() {
+    if (typeof BroadcastChannel === 'function') {
+      this.channel = new BroadcastChannel(this.CHANNEL_NAME);
+      this.channel.onmessage = (e) => {
+        this.dispatch(e.data.type, e.data.detail);
+      };
+    }
+    this.electLeader();
+  },
+
+  /**
+   * 是否能與其他分頁溝通
+   */
+  isActive() {
+    return this.channel !== null;
+  },
+
+  /**
+   * 發送變更給其他分頁
+   */
+  publish(type, detail) {
+    if (this.channel) {
+      this.channel.postMessage({ type, detail });
+    }
+  },
+
+  /**
+   * 訂閱其他分頁發送的變更
+   */
+  subscribe(type, handler) {
+    if (!this.handlers.has(type)) {
+      this.handlers.set(type, []);
+    }
+    this.handlers.get(type).push(handler);
+  },
+
+  /**
+   * 呼叫訂閱的處理函式
+   */
+  dispatch(type, detail) {
+    (this.handlers.get(type) || []).forEach(handler => handler(detail));
+  },
+
+  /**
+   * 成為主分頁時呼叫 handler（已經是主分頁時立即呼叫）
+   */
+  onLeader(handler) {
+    this.leaderHandlers.push(handler);
+    if (this.isLeader) handler();
+  },
+
+  /**
+   * 以 Web Locks 選出主分頁：取得鎖的分頁持有到關閉為止，之後由下一個等待的分頁接手
+   */
+  electLeader() {
+    if (!this.channel || typeof navigator === 'undefined' || !navigator.locks) {
+      // 無法與其他分頁協調，自己負責
+      this.becomeLeader();
+      return;
+    }
+
+    navigator.locks.request(this.LEADER_LOCK, () => {
+      this.becomeLeader();
+      return new Promise(() => {});
+    });
+  },
+
+  /**
+   * 成為主分頁
+   */
+  becomeLeader() {
+    this.isLeader = true;
+    this.publish('leaderChanged', {});
+    this.leaderHandlers.forEach(handler => handler());
+  }
+};
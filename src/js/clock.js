@@ -0,0 +1,131 @@
+/**
+ * 時鐘模組
+ * 遊戲規則與畫面計時器透過 Clock 取得目前時間、設定計時器，不直接使用 Date.now 與 setTimeout
+ *
+ * 預設使用系統時間。useVirtual() 切換為虛擬時鐘後，時間只在呼叫 advance 時前進，
+ * 前進途中到期的計時器依到期時間順序執行；測試可在幾毫秒內走完數小時的到期情境。
+ * 切換時鐘時，尚未執行的計時器保留剩餘的延遲。
+ * 虛擬時鐘只影響本分頁（其他分頁與儲存的資料仍使用各自的時間）。
+ */
+
+export const Clock = {
+  virtualNow: null, // 虛擬時鐘的目前時間（null 代表使用系統時間）
+  timers: new Map(), // 計時器 id → { deadline, callback, handle }
+  nextId: 1,
+
+  /**
+   * 目前時間（毫秒）
+   */
+  now() {
+    return this.virtualNow === null ? Date.now() : this.virtualNow;
+  },
+
+  /**
+   * 是否使用虛擬時鐘
+   */
+  isVirtual() {
+    return this.virtualNow !== null;
+  },
+
+  /**
+   * 在 delay 毫秒後呼叫 callback，回傳計時器 id
+   */
+  setTimeout(callback, delay = 0) {
+    const id = this.nextId++;
+    this.timers.set(id, { deadline: this.now() + Math.max(0, delay), callback, handle: null });
+    this.arm(id);
+    return id;
+  },
+
+  /**
+   * 取消計時器
+   */
+  clearTimeout(id) {
+    const timer = this.timers.get(id);
+    if (!timer) return;
+    if (timer.handle !== null) {
+      clearTimeout(timer.handle);
+    }
+    this.timers.delete(id);
+  },
+
+  /**
+   * 使用系統時間時以 setTimeout 排程；虛擬時鐘的計時器由 advance 執行
+   */
+  arm(id) {
+    if (this.isVirtual()) return;
+    const timer = this.timers.get(id);
+    timer.handle = setTimeout(() => this.run(id), timer.deadline - Date.now());
+  },
+
+  /**
+   * 執行並移除計時器
+   */
+  run(id) {
+    const timer = this.timers.get(id);
+    if (!timer) return;
+    this.timers.delete(id);
+    timer.callback();
+  },
+
+  /**
+   * 切換為虛擬時鐘，從 startTime 開始（預設為目前時間）
+   */
+  useVirtual(startTime = this.now()) {
+    this.switchTo(startTime);
+  },
+
+  /**
+   * 切換回系統時間
+   */
+  useReal() {
+    this.switchTo(null);
+  },
+
+  /**
+   * 切換時鐘，尚未執行的計時器以剩餘的延遲重新排程
+   */
+  switchTo(virtualNow) {
+    const before = this.now();
+    this.timers.forEach(timer => {
+      if (timer.handle !== null) {
+        clearTimeout(timer.handle);
+        timer.handle = null;
+      }
+    });
+
+    this.virtualNow = virtualNow;
+    const offset = this.now() - before;
+    this.timers.forEach((timer, id) => {
+      timer.deadline += offset;
+      this.arm(id);
+    });
+  },
+
+  /**
+   * 虛擬時鐘前進 ms 毫秒，依到期時間順序執行途中到期的計時器（包含執行時新設定的），回傳新的時間
+   */
+  advance(ms) {
+    if (!this.isVirtual()) {
+      throw new Error('只有虛擬時鐘可以前進');
+    }
+
+    const target = this.virtualNow + Math.max(0, ms);
+    while (true) {
+      let nextId = null;
+      let nextDeadline = Infinity;
+      this.timers.forEach((timer, id) => {
+        if (timer.deadline < nextDeadline) {
+          nextId = id;
+          nextDeadline = timer.deadline;
+        }
+      });
+      if (nextId === null || nextDeadline > target) break;
+
+      this.virtualNow = Math.max(this.virtualNow, nextDeadline);
+      this.run(nextId);
+    }
+    this.virtualNow = target;
+    return target;
+  }
+};
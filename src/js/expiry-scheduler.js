@@ -0,0 +1,199 @@
+/**
+ * 到期排程模組
+ * 以最小堆積（min-heap）保存待到期的項目，只設定一個計時器對應最早的到期時間
+ *
+ * 每次到期只處理真正到期的項目，成本為 O(到期數量 × log 項目數量)，
+ * 不需要每秒掃描所有乳牛。
+ * 重新排程或取消時不從堆積中移除舊項目，而是在彈出時比對到期時間後略過（lazy deletion）；
+ * 失效的項目多於有效的項目時重建堆積，經常重新排程（例如頻繁餵養）時堆積不會持續變大。
+ */
+
+import { Clock } from './clock.js';
+
+const MinHeap = {
+  /**
+   * 加入項目（依 deadline 排序）
+   */
+  push(heap, item) {
+    heap.push(item);
+    let index = heap.length - 1;
+    while (index > 0) {
+      const parent = (index - 1) >> 1;
+      if (heap[parent].deadline <= item.deadline) break;
+      heap[index] = heap[parent];
+      index = parent;
+    }
+    heap[index] = item;
+  },
+
+  /**
+   * 取出 deadline 最小的項目
+   */
+  pop(heap) {
+    const top = heap[0];
+    const last = heap.pop();
+    if (heap.length > 0) {
+      let index = 0;
+      const length = heap.length;
+      while (true) {
+        const left = index * 2 + 1;
+        const right = left + 1;
+        let smallest = index;
+        let smallestDeadline = last.deadline;
+        if (left < length && heap[left].deadline < smallestDeadline) {
+          smallest = left;
+          smallestDeadline = heap[left].deadline;
+        }
+        if (right < length && heap[right].deadline < smallestDeadline) {
+          smallest = right;
+        }
+        if (smallest === index) break;
+        heap[index] = heap[smallest];
+        index = smallest;
+      }
+      heap[index] = last;
+    }
+    return top;
+  },
+
+  /**
+   * 以任意順序的項目建立堆積（依 deadline 排序的陣列即為最小堆積）
+   */
+  build(items) {
+    return items.sort((a, b) => a.deadline - b.deadline);
+  }
+};
+
+export const ExpiryScheduler = {
+  MAX_TIMEOUT: 2147483647, // setTimeout 可接受的最大延遲（毫秒）
+  heap: [], // [{ key, deadline, payload }]
+  deadlines: new Map(), // key → 目前有效的到期時間
+  timeoutId: null,
+  armedDeadline: null, // 目前計時器對應的到期時間
+  onExpire: null, // 到期時呼叫 onExpire(payloads)
+
+  /**
+   * 設定到期時的處理函式
+   */
+  setHandler(callback) {
+    this.onExpire = callback;
+  },
+
+  /**
+   * 排程或重新排程項目
+   */
+  schedule(key, deadline, payload) {
+    this.deadlines.set(key, deadline);
+    MinHeap.push(this.heap, { key, deadline, payload });
+    this.compactIfStale();
+    if (this.armedDeadline === null || deadline < this.armedDeadline) {
+      this.arm();
+    }
+  },
+
+  /**
+   * 取消項目
+   */
+  cancel(key) {
+    this.deadlines.delete(key);
+    this.compactIfStale();
+  },
+
+  /**
+   * 取消 key 以 prefix 開頭的所有項目
+   */
+  cancelPrefix(prefix) {
+    this.deadlines.forEach((deadline, key) => {
+      if (key.startsWith(prefix)) this.deadlines.delete(key);
+    });
+    this.compactIfStale();
+  },
+
+  /**
+   * 失效的項目多於有效的項目時，只保留有效的項目重建堆積
+   * 重建的成本由之前累積的失效項目分攤，每次排程的平均成本仍為 O(log 項目數量)
+   */
+  compactIfStale() {
+    if (this.heap.length - this.deadlines.size <= this.deadlines.size) return;
+
+    const live = [];
+    const seen = new Set();
+    this.heap.forEach((item) => {
+      // 重新排程到相同的到期時間時，只保留一個項目
+      if (this.deadlines.get(item.key) === item.deadline && !seen.has(item.key)) {
+        seen.add(item.key);
+        live.push(item);
+      }
+    });
+    this.heap = MinHeap.build(live);
+  },
+
+  /**
+   * 取消所有項目並停止計時
+   */
+  clear() {
+    this.heap = [];
+    this.deadlines.clear();
+    this.disarm();
+  },
+
+  /**
+   * 停止目前的計時器
+   */
+  disarm() {
+    if (this.timeoutId !== null) {
+      Clock.clearTimeout(this.timeoutId);
+      this.timeoutId = null;
+    }
+    this.armedDeadline = null;
+  },
+
+  /**
+   * 移除堆積頂端已失效的項目
+   */
+  dropStale() {
+    while (this.heap.length > 0) {
+      const top = this.heap[0];
+      if (this.deadlines.get(top.key) === top.deadline) return;
+      MinHeap.pop(this.heap);
+    }
+  },
+
+  /**
+   * 依最早的到期時間設定計時器
+   */
+  arm() {
+    this.disarm();
+    this.dropStale();
+    if (this.heap.length === 0) return;
+
+    const deadline = this.heap[0].deadline;
+    const delay = Math.min(Math.max(0, deadline - Clock.now()), this.MAX_TIMEOUT);
+    this.armedDeadline = deadline;
+    this.timeoutId = Clock.setTimeout(() => this.fire(), delay);
+  },
+
+  /**
+   * 處理所有已到期的項目，再設定下一次的計時器
+   */
+  fire() {
+    this.timeoutId = null;
+    this.armedDeadline = null;
+
+    const now = Clock.now();
+    const expired = [];
+    while (this.heap.length > 0 && this.heap[0].deadline <= now) {
+      const item = MinHeap.pop(this.heap);
+      if (this.deadlines.get(item.key) === item.deadline) {
+        this.deadlines.delete(item.key);
+        expired.push(item.payload);
+      }
+    }
+
+    this.arm();
+
+    if (expired.length > 0 && this.onExpire) {
+      this.onExpire(expired);
+    }
+  }
+};
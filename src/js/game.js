@@ -1,116 +1,439 @@
 /**
  * 遊戲管理模組
  * 負責處理養牛遊戲的邏輯
+ * 所有存取儲存引擎的方法都回傳 Promise
  */
 
-const GameManager = {
-  GAME_DATA_KEY: 'cattleFarmGameData',
-  hungerTimers: {}, // 儲存每頭牛的計時器
+import { StorageEngine } from './storage-engine.js';
+import { ChangeBus } from './change-bus.js';
+import { RecordLock } from './record-lock.js';
+import { WriteQueue } from './write-queue.js';
+import { UserManager } from './user-manager.js';
+import { ExpiryScheduler } from './expiry-scheduler.js';
+import { Herd } from './herd.js';
+import { Ledger } from './ledger.js';
+import { Clock } from './clock.js';
+
+export const GameManager = {
+  GAME_DATA_KEY: 'cattleFarmGameData', // 舊版：所有使用者共用單一 key
+  GAME_DATA_KEY_PREFIX: 'cattleFarmGameData:', // 每位使用者獨立一個 key
+  DEFAULT_HERD_SIZE: 3, // 新玩家的乳牛數量
+  MAX_HERD_SIZE: 10000, // 每位玩家的乳牛數量上限
+  FEED_HUNGER: 10, // 每次餵食增加的飽食度
+  FULL_DURATION: 60000, // 吃飽後到飽食度清空的時間（60秒 = 60000毫秒）
+  RETRY_DELAY: 50, // 資料由多個瀏覽器共用時，版本衝突後重試前的最長隨機等待（毫秒）
+  WATCH_RENEW_INTERVAL: 30000, // 遊玩中的分頁每隔多久請主分頁繼續追蹤到期（毫秒，實際時間）
+  WATCH_TTL: 90000, // 主分頁超過這段時間沒有收到續約，就停止追蹤該使用者（分頁可能已關閉）
+  watchedUserId: null, // 本分頁正在遊玩、需要到期通知的使用者
+  onExpire: null, // 本分頁的到期通知函式
+  renewIntervalId: null,
+  expiryUsers: new Map(), // 主分頁：已排程到期時間的使用者 → 最後續約時間
+  sweepIntervalId: null,
+  gameCache: new Map(), // userId → 遊戲數據（變更先套用在記憶體，再由 WriteQueue 批次寫入）
+
+  /**
+   * 初始化遊戲模組，遷移舊版遊戲數據
+   */
+  async init() {
+    this.watchStorage();
+    this.watchChanges();
+    await this.migrateLegacyGameData();
+  },
+
+  /**
+   * 監聽其他分頁的儲存變更，讓對應的快取失效
+   * 能接收 herdChanged 訊息時，遊戲數據由訊息更新，不需要重新讀取；
+   * 但資料由多個瀏覽器共用時，其他裝置的變更不會有訊息，仍讓快取失效
+   */
+  watchStorage() {
+    StorageEngine.onExternalChange((key) => {
+      if (key === null) {
+        this.gameCache.clear();
+      } else if (
+        key.startsWith(this.GAME_DATA_KEY_PREFIX) && !WriteQueue.has(key) &&
+        (!ChangeBus.isActive() || StorageEngine.isShared())
+      ) {
+        // 本分頁尚未寫入的變更較新，保留快取
+        this.gameCache.delete(key.substring(this.GAME_DATA_KEY_PREFIX.length));
+      }
+    }, [this.GAME_DATA_KEY_PREFIX]);
+  },
+
+  /**
+   * 訂閱其他分頁的遊戲數據變更與到期通知
+   */
+  watchChanges() {
+    ChangeBus.subscribe('herdChanged', detail => this.applyHerdChange(detail));
+    ChangeBus.subscribe('cattleExpired', ({ userId, cattleIds }) => this.notifyExpired(userId, cattleIds));
+    ChangeBus.subscribe('watchExpirations', ({ userId }) => {
+      if (ChangeBus.isLeader) this.trackExpirations(userId);
+    });
+    // 其他分頁停止遊玩：本分頁仍在遊玩同一位使用者時重新續約，否則主分頁停止追蹤
+    ChangeBus.subscribe('unwatchExpirations', ({ userId }) => {
+      if (userId === this.watchedUserId) {
+        this.renewWatch();
+      } else if (ChangeBus.isLeader) {
+        this.untrackExpirations(userId);
+      }
+    });
+    // 主分頁改變時，請新的主分頁繼續追蹤本分頁的使用者
+    ChangeBus.subscribe('leaderChanged', () => {
+      if (this.watchedUserId) {
+        ChangeBus.publish('watchExpirations', { userId: this.watchedUserId });
+      }
+    });
+
+    ExpiryScheduler.setHandler(payloads => this.handleExpired(payloads));
+    ChangeBus.onLeader(() => {
+      if (this.watchedUserId) this.trackExpirations(this.watchedUserId);
+      // 定期停止追蹤沒有分頁續約的使用者
+      if (this.sweepIntervalId === null) {
+        this.sweepIntervalId = setInterval(() => this.dropStaleWatches(), this.WATCH_RENEW_INTERVAL);
+      }
+    });
+  },
+
+  /**
+   * 套用其他分頁發送的遊戲數據變更（只更新已快取的資料）
+   * 整個牛群的變更在版本較新時套用；部分變更只在版本剛好是下一版時套用，
+   * 中間漏掉訊息時讓快取失效，改由儲存引擎重新讀取
+   */
+  applyHerdChange({ userId, version, grass, cattle, herd }) {
+    const gameData = this.gameCache.get(userId);
+    const cachedVersion = gameData ? (gameData.version || 0) : 0;
+    if (herd) {
+      if (gameData && version <= cachedVersion) return;
+      const decoded = Herd.decode(herd);
+      if (gameData) {
+        gameData.version = version;
+        gameData.grass = grass;
+        gameData.herd = decoded;
+      } else {
+        this.gameCache.set(userId, { userId, version, grass, herd: decoded });
+      }
+      if (this.expiryUsers.has(userId)) {
+        this.scheduleHerd(userId, decoded);
+      }
+      return;
+    }
+
+    if (!gameData || version <= cachedVersion) return;
+    if (version !== cachedVersion + 1) {
+      // 本分頁尚未寫入的變更較新，保留快取
+      if (!WriteQueue.has(this.getGameDataKey(userId))) {
+        this.gameCache.delete(userId);
+      }
+      return;
+    }
+
+    gameData.version = version;
+    gameData.grass = grass;
+    cattle.forEach(([cattleId, hunger, timerEndTime]) => {
+      gameData.herd.hunger[cattleId - 1] = hunger;
+      gameData.herd.timerEndTime[cattleId - 1] = timerEndTime;
+      if (timerEndTime > Clock.now()) {
+        this.scheduleCattleExpiry(userId, cattleId, timerEndTime);
+      }
+    });
+  },
+
+  /**
+   * 通知其他分頁遊戲數據已變更
+   * cattleIds 為變更的乳牛（null 代表整個牛群都可能改變）
+   */
+  publishHerdChange(gameData, cattleIds) {
+    const { userId, version, grass, herd } = gameData;
+    if (cattleIds === null) {
+      ChangeBus.publish('herdChanged', { userId, version, grass, herd: Herd.encode(herd) });
+    } else {
+      ChangeBus.publish('herdChanged', {
+        userId,
+        version,
+        grass,
+        cattle: cattleIds.map(id => [id, herd.hunger[id - 1], herd.timerEndTime[id - 1]])
+      });
+    }
+  },
 
   /**
    * 初始化遊戲數據
    */
-  initGameData(userId) {
-    const gameData = this.getGameData(userId);
+  async initGameData(userId) {
+    const gameData = await this.getGameData(userId);
     if (!gameData) {
       const newGameData = {
         userId: userId,
         grass: 0,
-        cattle: [
-          {
-            id: 1,
-            name: '乳牛 #1',
-            hunger: 0,
-            maxHunger: 100,
-            timerEndTime: null
-          },
-          {
-            id: 2,
-            name: '乳牛 #2',
-            hunger: 0,
-            maxHunger: 100,
-            timerEndTime: null
-          },
-          {
-            id: 3,
-            name: '乳牛 #3',
-            hunger: 0,
-            maxHunger: 100,
-            timerEndTime: null
-          }
-        ]
+        herd: Herd.create(this.DEFAULT_HERD_SIZE)
       };
-      this.saveGameData(newGameData);
+      this.saveGameData(newGameData, null);
       return newGameData;
     }
     return gameData;
   },
 
+  /**
+   * 設定使用者的乳牛數量
+   */
+  async setHerdSize(userId, size) {
+    if (!Number.isInteger(size) || size < 1 || size > this.MAX_HERD_SIZE) {
+      return { success: false, message: `乳牛數量必須介於 1 到 ${this.MAX_HERD_SIZE}` };
+    }
+
+    await this.mutateGameData(userId, async () => {
+      const gameData = await this.initGameData(userId);
+      gameData.herd = Herd.resize(gameData.herd, size);
+      this.saveGameData(gameData, null);
+    });
+
+    return { success: true, message: `乳牛數量已設定為 ${size} 頭` };
+  },
+
+  /**
+   * 將舊版單一 key 的遊戲數據拆分為每位使用者一個 key（只執行一次）
+   */
+  async migrateLegacyGameData() {
+    const gameDataMap = await StorageEngine.get(this.GAME_DATA_KEY);
+    if (!gameDataMap) return;
+
+    for (const userId of Object.keys(gameDataMap)) {
+      const key = this.getGameDataKey(userId);
+      // 已存在的新格式資料較新，不覆蓋
+      if ((await StorageEngine.get(key)) === null) {
+        await StorageEngine.set(key, gameDataMap[userId]);
+      }
+    }
+    await StorageEngine.remove(this.GAME_DATA_KEY);
+  },
+
+  /**
+   * 取得使用者遊戲數據的儲存 key
+   */
+  getGameDataKey(userId) {
+    return this.GAME_DATA_KEY_PREFIX + userId;
+  },
+
   /**
    * 取得遊戲數據
    */
-  getGameData(userId) {
-    const allGameData = localStorage.getItem(this.GAME_DATA_KEY);
-    if (!allGameData) return null;
-    
-    const gameDataMap = JSON.parse(allGameData);
-    return gameDataMap[userId] || null;
+  async getGameData(userId) {
+    if (!this.gameCache.has(userId)) {
+      const storedData = await StorageEngine.get(this.getGameDataKey(userId));
+      if (!storedData) return null;
+      const gameData = this.decodeGameData(storedData);
+      // 讀取期間可能已有其他呼叫寫入快取，以快取為準
+      if (!this.gameCache.has(userId)) {
+        this.gameCache.set(userId, gameData);
+      }
+    }
+    return this.gameCache.get(userId);
   },
 
   /**
-   * 儲存遊戲數據
+   * 從儲存引擎讀取遊戲數據，版本比快取新時更新快取（本分頁有尚未寫入的變更時以快取為準）
    */
-  saveGameData(gameData) {
-    const allGameData = localStorage.getItem(this.GAME_DATA_KEY);
-    const gameDataMap = allGameData ? JSON.parse(allGameData) : {};
-    
-    gameDataMap[gameData.userId] = gameData;
-    localStorage.setItem(this.GAME_DATA_KEY, JSON.stringify(gameDataMap));
+  async loadLatestGameData(userId) {
+    const key = this.getGameDataKey(userId);
+    if (WriteQueue.has(key)) return;
+
+    const storedData = await StorageEngine.get(key);
+    const gameData = this.gameCache.get(userId);
+    if (!storedData || WriteQueue.has(key)) return;
+    if (gameData && (storedData.version || 0) <= (gameData.version || 0)) return;
+
+    this.replaceGameData(userId, this.decodeGameData(storedData));
   },
 
   /**
-   * 購買牧草
+   * 以讀取到的遊戲數據取代快取
    */
-  buyGrass(userId, amount) {
-    const user = UserManager.getUserById(userId);
-    if (!user) {
-      return { success: false, message: '找不到使用者' };
+  replaceGameData(userId, latest) {
+    const gameData = this.gameCache.get(userId);
+    if (gameData) {
+      // 保留物件參考，讓持有遊戲數據的畫面看到最新資料
+      Object.assign(gameData, latest);
+    } else {
+      this.gameCache.set(userId, latest);
+    }
+    if (this.expiryUsers.has(userId)) {
+      this.scheduleHerd(userId, latest.herd);
     }
+  },
 
-    if (amount <= 0) {
-      return { success: false, message: '購買數量必須大於 0' };
+  /**
+   * 以最新版本的遊戲數據執行變更
+   * 持有該使用者遊戲數據的 RecordLock 直到變更寫入儲存引擎，
+   * 其他分頁取得鎖後會先重新讀取，不會覆蓋彼此的變更
+   * 資料由多個瀏覽器共用時改由 mutateSharedGameData 比對版本寫入
+   */
+  async mutateGameData(userId, mutate) {
+    const key = this.getGameDataKey(userId);
+    const mayBeStale = await RecordLock.acquire(key);
+    try {
+      if (StorageEngine.isShared()) {
+        return await this.mutateSharedGameData(userId, mutate);
+      }
+      if (mayBeStale) {
+        await this.loadLatestGameData(userId);
+      }
+      await Ledger.ensureOpened(userId);
+      return await mutate();
+    } finally {
+      RecordLock.release(key);
     }
+  },
 
-    // 檢查點數是否足夠（1 點數 = 1 牧草）
-    if (user.points < amount) {
-      return { success: false, message: '點數不足，無法購買牧草' };
+  /**
+   * 資料由多個瀏覽器共用時，鎖無法涵蓋其他裝置：變更前讀取最新的遊戲數據，變更後立即比對版本寫入
+   * 被其他裝置搶先寫入時放棄本次的變更（包含帳本交易），隨機等待後重新讀取再執行
+   * （每次失敗都代表其他裝置已成功寫入，因此一定會完成；呼叫端持有該使用者遊戲數據的 RecordLock）
+   */
+  async mutateSharedGameData(userId, mutate) {
+    const key = this.getGameDataKey(userId);
+    const ledgerPrefix = Ledger.getEntryKey(userId, '');
+    if (WriteQueue.has(key)) {
+      await WriteQueue.flush();
     }
 
-    // 扣除點數
-    const newPoints = user.points - amount;
-    const updateResult = UserManager.updatePoints(userId, newPoints);
+    let conflicted = false;
+    while (true) {
+      const storedData = await StorageEngine.get(key);
+      const gameData = this.gameCache.get(userId);
+      if (storedData && (conflicted || !gameData || (storedData.version || 0) !== gameData.version)) {
+        this.replaceGameData(userId, this.decodeGameData(storedData));
+      }
+      await Ledger.ensureOpened(userId);
+
+      const result = await mutate();
+      const written = WriteQueue.take(pendingKey => pendingKey === key || pendingKey.startsWith(ledgerPrefix));
+      const change = written.find(([pendingKey]) => pendingKey === key);
+      let saved = true;
+      if (change) {
+        const [, { value, retained }] = change;
+        try {
+          saved = await StorageEngine.setIfVersion(key, this.encodeGameData(value), storedData ? (storedData.version || 0) : 0);
+        } finally {
+          if (retained) RecordLock.release(key);
+        }
+      }
+      if (saved) {
+        // 遊戲數據寫入後，帳本交易照常延遲寫入
+        written.forEach(([pendingKey, { value }]) => {
+          if (pendingKey !== key) WriteQueue.enqueue(pendingKey, value);
+        });
+        return result;
+      }
+
+      conflicted = true;
+      await new Promise(resolve => setTimeout(resolve, Math.random() * this.RETRY_DELAY));
+    }
+  },
+
+  /**
+   * 儲存遊戲數據（立即更新記憶體，延遲合併寫入儲存引擎）
+   * 只在資料真正變更時呼叫，順便將已到期的乳牛整理寫回，並遞增版本號
+   * cattleIds 為本次變更的乳牛，用於通知其他分頁（null 代表整個牛群）
+   */
+  saveGameData(gameData, cattleIds = null) {
+    Herd.normalize(gameData.herd);
+    gameData.version = (gameData.version || 0) + 1;
+    this.gameCache.set(gameData.userId, gameData);
+    WriteQueue.enqueue(this.getGameDataKey(gameData.userId), gameData, data => this.encodeGameData(data));
+    this.publishHerdChange(gameData, cattleIds);
+  },
+
+  /**
+   * 將遊戲數據編碼為儲存格式
+   */
+  encodeGameData(gameData) {
+    return {
+      userId: gameData.userId,
+      version: gameData.version,
+      grass: gameData.grass,
+      herd: Herd.encode(gameData.herd)
+    };
+  },
+
+  /**
+   * 將儲存格式解碼為遊戲數據（舊版以 cattle 陣列儲存乳牛）
+   */
+  decodeGameData(storedData) {
+    return {
+      userId: storedData.userId,
+      version: storedData.version || 0,
+      grass: storedData.grass,
+      herd: Herd.decode(storedData.herd || storedData.cattle)
+    };
+  },
+
+  /**
+   * 購買牧草
+   * 點數以 mutateUser 立即寫入，牧草與購買交易之後由 WriteQueue 寫入（pagehide 時也會寫入）；
+   * 兩次寫入之間頁面異常終止時，點數已扣除但牧草與購買交易不會保存
+   */
+  async buyGrass(userId, amount) {
+    if (amount <= 0) {
+      return { success: false, message: '購買數量必須大於 0' };
+    }
+
+    // 以最新點數扣除（1 點數 = 1 牧草），點數不足時不扣除
+    const updateResult = await UserManager.addPoints(userId, -amount, {
+      insufficientMessage: '點數不足，無法購買牧草',
+      ledgerType: null // 點數與牧草的變動記為同一筆購買交易
+    });
     if (!updateResult.success) {
       return updateResult;
     }
 
     // 增加牧草
-    const gameData = this.initGameData(userId);
-    gameData.grass += amount;
-    this.saveGameData(gameData);
+    const grass = await this.mutateGameData(userId, async () => {
+      const gameData = await this.initGameData(userId);
+      gameData.grass += amount;
+      this.saveGameData(gameData, []);
+      Ledger.append(userId, 'purchase', { points: -amount, grass: amount });
+      return gameData.grass;
+    });
 
     return { 
       success: true, 
       message: `成功購買 ${amount} 個牧草`,
-      grass: gameData.grass,
-      points: newPoints
+      grass,
+      points: updateResult.user.points
     };
   },
 
   /**
-   * 餵養乳牛
+   * 餵養乳牛 count 次（預設 1 次）
+   * 所有餵食在同一次變更中完成：只檢查一次牧草、只寫入一次遊戲數據
+   * 實際次數受牧草數量與乳牛剩餘的飽食度限制
+   */
+  feedCattle(userId, cattleId, count = 1) {
+    return this.mutateGameData(userId, () => this.applyFeed(userId, cattleId, count));
+  },
+
+  /**
+   * 將乳牛餵到飽食度全滿（牧草不足時餵到牧草用完）
+   */
+  feedToFull(userId, cattleId) {
+    return this.feedCattle(userId, cattleId, Infinity);
+  },
+
+  /**
+   * 將所有乳牛餵到飽食度全滿（依 id 順序，牧草不足時餵到牧草用完）
+   */
+  feedAll(userId) {
+    return this.mutateGameData(userId, () => this.applyFeedAll(userId));
+  },
+
+  /**
+   * 以最新的遊戲數據餵養乳牛（由 feedCattle 在持有鎖時呼叫）
    */
-  feedCattle(userId, cattleId) {
-    const gameData = this.getGameData(userId);
+  async applyFeed(userId, cattleId, count = 1) {
+    if (!(count >= 1)) {
+      return { success: false, message: '餵食次數必須大於 0' };
+    }
+
+    const gameData = await this.getGameData(userId);
     if (!gameData) {
       return { success: false, message: '找不到遊戲資料' };
     }
@@ -121,7 +444,7 @@ const GameManager = {
     }
 
     // 找到對應的乳牛
-    const cattle = gameData.cattle.find(c => c.id === cattleId);
+    const cattle = Herd.get(gameData.herd, cattleId);
     if (!cattle) {
       return { success: false, message: '找不到這頭乳牛' };
     }
@@ -131,53 +454,208 @@ const GameManager = {
       return { success: false, message: '這頭乳牛已經吃飽了！' };
     }
 
-    // 扣除牧草
-    gameData.grass -= 1;
+    const feeds = this.feedOne(userId, gameData, cattle, Math.floor(count), Clock.now());
+    this.saveGameData(gameData, [cattleId]);
+    Ledger.append(userId, 'feed', { grass: -feeds, cattleId });
 
-    // 增加飽食度（每次餵食增加 10）
-    cattle.hunger = Math.min(cattle.hunger + 10, cattle.maxHunger);
+    return {
+      success: true,
+      message: feeds === 1
+        ? `成功餵養乳牛！飽食度：${cattle.hunger}/${cattle.maxHunger}`
+        : `成功餵養乳牛 ${feeds} 次！飽食度：${cattle.hunger}/${cattle.maxHunger}`,
+      grass: gameData.grass,
+      hunger: cattle.hunger,
+      timerEndTime: cattle.timerEndTime,
+      feeds
+    };
+  },
 
-    // 如果飽食度達到最大值，設定計時器結束時間（60秒後）
-    if (cattle.hunger >= cattle.maxHunger) {
-      cattle.timerEndTime = Date.now() + 60000; // 60秒 = 60000毫秒
+  /**
+   * 以最新的遊戲數據餵飽所有乳牛（由 feedAll 在持有鎖時呼叫）
+   * 整批只寫入一次遊戲數據、記錄一筆帳本交易
+   */
+  async applyFeedAll(userId) {
+    const gameData = await this.getGameData(userId);
+    if (!gameData) {
+      return { success: false, message: '找不到遊戲資料' };
     }
 
-    this.saveGameData(gameData);
+    if (gameData.grass < 1) {
+      return { success: false, message: '牧草不足，請先購買牧草' };
+    }
+
+    const now = Clock.now();
+    const cattleIds = [];
+    let feeds = 0;
+    for (let id = 1; id <= gameData.herd.size && gameData.grass > 0; id++) {
+      const cattle = Herd.get(gameData.herd, id);
+      if (cattle.hunger < cattle.maxHunger) {
+        feeds += this.feedOne(userId, gameData, cattle, Infinity, now);
+        cattleIds.push(id);
+      }
+    }
+
+    if (cattleIds.length === 0) {
+      return { success: false, message: '所有乳牛都已經吃飽了！' };
+    }
+
+    this.saveGameData(gameData, cattleIds);
+    Ledger.append(userId, 'feed', { grass: -feeds });
 
     return {
       success: true,
-      message: `成功餵養乳牛！飽食度：${cattle.hunger}/${cattle.maxHunger}`,
+      message: `成功餵養 ${cattleIds.length} 頭乳牛，消耗 ${feeds} 個牧草`,
       grass: gameData.grass,
-      hunger: cattle.hunger,
-      timerEndTime: cattle.timerEndTime
+      cattleIds,
+      feeds
     };
   },
 
   /**
-   * 更新乳牛倒數計時
+   * 餵養一頭乳牛最多 count 次，扣除牧草並在吃飽時設定計時器，回傳實際餵食次數
+   * 呼叫端已確認牧草至少 1 個、乳牛尚未吃飽
    */
-  updateCattleTimers(userId) {
-    const gameData = this.getGameData(userId);
-    if (!gameData) return;
+  feedOne(userId, gameData, cattle, count, now) {
+    const needed = Math.ceil((cattle.maxHunger - cattle.hunger) / this.FEED_HUNGER);
+    const feeds = Math.min(count, needed, gameData.grass);
 
-    let hasChanges = false;
-    gameData.cattle.forEach(cattle => {
-      if (cattle.timerEndTime && cattle.hunger > 0) {
-        const now = Date.now();
-        if (now >= cattle.timerEndTime) {
-          // 時間到，清空飽食度
-          cattle.hunger = 0;
-          cattle.timerEndTime = null;
-          hasChanges = true;
-        }
-      }
+    // 扣除牧草，增加飽食度（每次餵食增加 10）
+    gameData.grass -= feeds;
+    cattle.hunger = Math.min(cattle.hunger + feeds * this.FEED_HUNGER, cattle.maxHunger);
+
+    // 如果飽食度達到最大值，設定計時器結束時間（60秒後）
+    if (cattle.hunger >= cattle.maxHunger) {
+      cattle.timerEndTime = now + this.FULL_DURATION;
+      this.scheduleCattleExpiry(userId, cattle.id, cattle.timerEndTime);
+    }
+    return feeds;
+  },
+
+  /**
+   * 在使用者的乳牛到期時呼叫 onExpire(cattleIds)
+   * 到期只用於通知畫面更新，飽食度由讀取時推導，不寫入儲存引擎
+   * 只有主分頁實際排程，其他分頁請主分頁代為追蹤，並由 cattleExpired 訊息得知到期
+   */
+  async watchExpirations(userId, onExpire) {
+    this.stopWatchingExpirations();
+    this.watchedUserId = userId;
+    this.onExpire = onExpire;
+
+    // 主分頁在一段時間沒有收到續約時停止追蹤，關閉的分頁不會一直佔用排程
+    this.renewIntervalId = setInterval(() => this.renewWatch(), this.WATCH_RENEW_INTERVAL);
+    await this.renewWatch();
+  },
+
+  /**
+   * 請主分頁開始或繼續追蹤本分頁的使用者
+   */
+  async renewWatch() {
+    if (!this.watchedUserId) return;
+    if (ChangeBus.isLeader) {
+      await this.trackExpirations(this.watchedUserId);
+    } else {
+      ChangeBus.publish('watchExpirations', { userId: this.watchedUserId });
+    }
+  },
+
+  /**
+   * 停止本分頁的到期通知，並請主分頁停止追蹤
+   * （同一位使用者仍在其他分頁遊玩時，那些分頁收到通知後會重新續約）
+   */
+  stopWatchingExpirations() {
+    if (this.renewIntervalId !== null) {
+      clearInterval(this.renewIntervalId);
+      this.renewIntervalId = null;
+    }
+    const userId = this.watchedUserId;
+    this.watchedUserId = null;
+    this.onExpire = null;
+    if (!userId) return;
+
+    ChangeBus.publish('unwatchExpirations', { userId });
+    if (ChangeBus.isLeader) {
+      this.untrackExpirations(userId);
+    }
+  },
+
+  /**
+   * 主分頁：開始排程使用者的乳牛到期時間（只在開始時掃描一次牛群），已在追蹤時只更新續約時間
+   */
+  async trackExpirations(userId) {
+    const tracked = this.expiryUsers.has(userId);
+    this.expiryUsers.set(userId, Date.now());
+    if (tracked) return;
+
+    const gameData = await this.getGameData(userId);
+    if (gameData && this.expiryUsers.has(userId)) {
+      this.scheduleHerd(userId, gameData.herd);
+    }
+  },
+
+  /**
+   * 主分頁：停止追蹤使用者，取消已排程的到期
+   */
+  untrackExpirations(userId) {
+    if (!this.expiryUsers.delete(userId)) return;
+    ExpiryScheduler.cancelPrefix(`${userId}:`);
+  },
+
+  /**
+   * 主分頁：停止追蹤超過 WATCH_TTL 沒有續約的使用者
+   */
+  dropStaleWatches() {
+    const expired = Date.now() - this.WATCH_TTL;
+    this.expiryUsers.forEach((renewedAt, userId) => {
+      if (renewedAt < expired) this.untrackExpirations(userId);
     });
+  },
 
-    if (hasChanges) {
-      this.saveGameData(gameData);
+  /**
+   * 主分頁：排程牛群中所有尚未到期的乳牛
+   */
+  scheduleHerd(userId, herd) {
+    const now = Clock.now();
+    for (let i = 0; i < herd.size; i++) {
+      // 已到期的乳牛讀取時即為飽食度 0，不需要排程
+      if (herd.timerEndTime[i] > now && herd.hunger[i] > 0) {
+        this.scheduleCattleExpiry(userId, i + 1, herd.timerEndTime[i]);
+      }
     }
+  },
 
-    return gameData;
+  /**
+   * 排程乳牛的到期時間（只有主分頁、且只追蹤有分頁在遊玩的使用者）
+   */
+  scheduleCattleExpiry(userId, cattleId, timerEndTime) {
+    if (!ChangeBus.isLeader || !this.expiryUsers.has(userId)) return;
+    ExpiryScheduler.schedule(`${userId}:${cattleId}`, timerEndTime, { userId, cattleId });
+  },
+
+  /**
+   * 主分頁：乳牛到期時通知本分頁與其他分頁
+   */
+  handleExpired(payloads) {
+    const expiredByUser = new Map();
+    payloads.forEach(({ userId, cattleId }) => {
+      if (!expiredByUser.has(userId)) {
+        expiredByUser.set(userId, []);
+      }
+      expiredByUser.get(userId).push(cattleId);
+    });
+
+    expiredByUser.forEach((cattleIds, userId) => {
+      ChangeBus.publish('cattleExpired', { userId, cattleIds });
+      this.notifyExpired(userId, cattleIds);
+    });
+  },
+
+  /**
+   * 本分頁正在遊玩該使用者時呼叫到期通知
+   */
+  notifyExpired(userId, cattleIds) {
+    if (userId === this.watchedUserId && this.onExpire) {
+      this.onExpire(cattleIds);
+    }
   },
 
   /**
@@ -188,18 +666,17 @@ const GameManager = {
       return null;
     }
 
-    const remaining = Math.max(0, Math.ceil((cattle.timerEndTime - Date.now()) / 1000));
+    const remaining = Math.max(0, Math.ceil((cattle.timerEndTime - Clock.now()) / 1000));
     return remaining;
   },
 
   /**
    * 取得乳牛狀態
    */
-  getCattleStatus(userId, cattleId) {
-    const gameData = this.getGameData(userId);
+  async getCattleStatus(userId, cattleId) {
+    const gameData = await this.getGameData(userId);
     if (!gameData) return null;
 
-    const cattle = gameData.cattle.find(c => c.id === cattleId);
-    return cattle;
+    return Herd.get(gameData.herd, cattleId);
   }
 };
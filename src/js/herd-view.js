@@ -0,0 +1,228 @@
+/**
+ * 牛群虛擬清單模組
+ * 依據遊戲數據繪製乳牛，只為可視範圍內的乳牛建立 DOM 節點
+ *
+ * 容器（#cattle-container）作為捲動視窗，內部的 spacer 撐出完整高度，
+ * 可視範圍的乳牛放在 window 中並以 translateY 對齊所在的列。
+ * 捲動時重複使用既有節點，只改變節點對應的乳牛 id。
+ * 每個節點記住上次繪製的數值，只在數值改變時才寫入 DOM；
+ * 版面（高度、欄數、位移）也只在改變時才更新，穩定狀態的更新不會造成版面或樣式失效。
+ * 點擊事件仍由 UserPage 委派在容器上處理。
+ */
+
+import { Herd } from './herd.js';
+import { GameManager } from './game.js';
+
+export const HerdView = {
+  ROW_HEIGHT: 226, // 每列高度（乳牛卡片 210px + 間距 16px，需與 user.css 一致）
+  GAP: 16, // 卡片間距（px）
+  MIN_CARD_WIDTH: 200, // 卡片最小寬度（px）
+  OVERSCAN_ROWS: 2, // 可視範圍上下額外繪製的列數
+  FALLBACK_VIEWPORT_HEIGHT: 700, // 容器尚未顯示時假設的可視高度（px）
+  herd: null,
+  nodes: [], // 可重複使用的乳牛節點
+  layout: { height: null, columns: null, firstRow: null }, // 上次套用的版面
+  renderScheduled: false,
+
+  /**
+   * 初始化虛擬清單
+   */
+  init(container) {
+    this.container = container;
+    this.container.innerHTML = '';
+
+    this.spacer = document.createElement('div');
+    this.spacer.className = 'cattle-spacer';
+    this.window = document.createElement('div');
+    this.window.className = 'cattle-window';
+    this.spacer.appendChild(this.window);
+    this.container.appendChild(this.spacer);
+
+    this.container.addEventListener('scroll', () => {
+      this.scheduleRender();
+    }, { passive: true });
+
+    if (typeof ResizeObserver === 'function') {
+      new ResizeObserver(() => this.scheduleRender()).observe(this.container);
+    }
+  },
+
+  /**
+   * 設定要顯示的牛群並立即繪製
+   * 同一個牛群只更新既有節點的數值，不重新計算可視範圍
+   */
+  setHerd(herd) {
+    if (herd === this.herd) {
+      this.refresh();
+      return;
+    }
+    this.herd = herd;
+    this.render();
+  },
+
+  /**
+   * 更新目前已繪製節點的數值
+   */
+  refresh() {
+    if (!this.herd) return;
+    this.nodes.forEach(node => {
+      this.updateNode(node, Herd.get(this.herd, node.cattleId));
+    });
+  },
+
+  /**
+   * 在下一個畫面更新時重新繪製（合併多次捲動事件）
+   */
+  scheduleRender() {
+    if (this.renderScheduled) return;
+    this.renderScheduled = true;
+    requestAnimationFrame(() => {
+      this.renderScheduled = false;
+      this.render();
+    });
+  },
+
+  /**
+   * 依容器寬度計算每列乳牛數量
+   */
+  getColumnCount() {
+    const width = this.container.clientWidth;
+    return Math.max(1, Math.floor((width + this.GAP) / (this.MIN_CARD_WIDTH + this.GAP)));
+  },
+
+  /**
+   * 計算目前可視範圍內的乳牛 id 區間
+   */
+  getVisibleRange(columns) {
+    const totalRows = Math.ceil(this.herd.size / columns);
+    const viewportHeight = this.container.clientHeight || this.FALLBACK_VIEWPORT_HEIGHT;
+    const scrollTop = this.container.scrollTop;
+
+    const firstRow = Math.max(0, Math.floor(scrollTop / this.ROW_HEIGHT) - this.OVERSCAN_ROWS);
+    const lastRow = Math.min(
+      totalRows,
+      Math.ceil((scrollTop + viewportHeight) / this.ROW_HEIGHT) + this.OVERSCAN_ROWS
+    );
+
+    return {
+      firstRow,
+      totalRows,
+      firstId: firstRow * columns + 1,
+      lastId: Math.min(this.herd.size, lastRow * columns)
+    };
+  },
+
+  /**
+   * 繪製可視範圍內的乳牛
+   */
+  render() {
+    if (!this.herd) return;
+
+    const columns = this.getColumnCount();
+    const range = this.getVisibleRange(columns);
+    const visibleCount = Math.max(0, range.lastId - range.firstId + 1);
+
+    this.applyLayout(Math.max(0, range.totalRows * this.ROW_HEIGHT - this.GAP), columns, range.firstRow);
+
+    // 補足或移除節點，使節點數量等於可視乳牛數量
+    while (this.nodes.length < visibleCount) {
+      const node = this.createNode();
+      this.nodes.push(node);
+      this.window.appendChild(node.element);
+    }
+    while (this.nodes.length > visibleCount) {
+      this.nodes.pop().element.remove();
+    }
+
+    this.nodes.forEach((node, offset) => {
+      const cattle = Herd.get(this.herd, range.firstId + offset);
+      if (node.cattleId !== cattle.id) {
+        this.bindNode(node, cattle);
+      }
+      this.updateNode(node, cattle);
+    });
+  },
+
+  /**
+   * 套用版面樣式，只寫入有變化的屬性
+   */
+  applyLayout(height, columns, firstRow) {
+    const layout = this.layout;
+    if (layout.height !== height) {
+      layout.height = height;
+      this.spacer.style.height = `${height}px`;
+    }
+    if (layout.columns !== columns) {
+      layout.columns = columns;
+      this.window.style.gridTemplateColumns = `repeat(${columns}, minmax(0, 1fr))`;
+    }
+    if (layout.firstRow !== firstRow) {
+      layout.firstRow = firstRow;
+      this.window.style.transform = `translateY(${firstRow * this.ROW_HEIGHT}px)`;
+    }
+  },
+
+  /**
+   * 建立一個乳牛節點
+   */
+  createNode() {
+    const element = document.createElement('div');
+    element.className = 'cattle-item';
+    element.innerHTML = `
+      <div class="cattle-emoji">🐄</div>
+      <div class="cattle-info">
+        <div class="cattle-name"></div>
+        <div class="cattle-status">
+          <span class="status-label">飽食度：</span>
+          <span class="status-value"></span>
+          <span class="status-unit">/${Herd.MAX_HUNGER}</span>
+        </div>
+        <div class="cattle-timer">
+          <span class="timer-label">剩餘時間：</span>
+          <span class="timer-value"></span>
+          <span class="timer-unit">秒</span>
+        </div>
+      </div>
+    `;
+
+    return {
+      element,
+      cattleId: null,
+      hunger: null, // 上次繪製的飽食度
+      timer: null, // 上次繪製的剩餘時間
+      nameEl: element.querySelector('.cattle-name'),
+      hungerEl: element.querySelector('.status-value'),
+      timerEl: element.querySelector('.timer-value')
+    };
+  },
+
+  /**
+   * 將節點綁定到指定的乳牛
+   */
+  bindNode(node, cattle) {
+    node.cattleId = cattle.id;
+    node.element.id = `cattle-${cattle.id}`;
+    node.element.dataset.cattleId = cattle.id;
+    node.nameEl.textContent = cattle.name;
+    node.hungerEl.id = `cattle-${cattle.id}-hunger`;
+    node.timerEl.id = `cattle-${cattle.id}-timer`;
+  },
+
+  /**
+   * 更新節點的飽食度與剩餘時間
+   */
+  updateNode(node, cattle) {
+    const hunger = cattle.hunger;
+    if (node.hunger !== hunger) {
+      node.hunger = hunger;
+      node.hungerEl.textContent = hunger;
+    }
+
+    const remainingTime = GameManager.getCattleRemainingTime(cattle);
+    const timer = remainingTime !== null && hunger > 0 ? remainingTime : '--';
+    if (node.timer !== timer) {
+      node.timer = timer;
+      node.timerEl.textContent = timer;
+    }
+  }
+};
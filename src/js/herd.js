@@ -0,0 +1,179 @@
+/**
+ * 牛群資料模組
+ * 以欄式（columnar）陣列儲存牛群，避免每頭牛重複儲存相同的欄位名稱
+ *
+ * 記憶體中的牛群：
+ *   { size, hunger: Uint8Array, timerEndTime: Float64Array }
+ * 乳牛 id 為 1..size，對應陣列索引 id - 1；名稱由 id 推導；
+ * timerEndTime 為 0 代表沒有計時器。
+ *
+ * 計時器到期不會立即寫回資料：讀取時依目前時間推導實際飽食度，
+ * 到期的乳牛視為飽食度 0；下次真正變更牛群時再以 normalize 一次整理。
+ *
+ * 儲存格式（encode 的結果）：
+ *   { size, hunger: base64, timerEndTime: base64 }
+ */
+
+import { Clock } from './clock.js';
+
+export const Herd = {
+  MAX_HUNGER: 100,
+
+  /**
+   * 建立指定數量的牛群（飽食度皆為 0、沒有計時器）
+   */
+  create(size) {
+    return {
+      size: size,
+      hunger: new Uint8Array(size),
+      timerEndTime: new Float64Array(size)
+    };
+  },
+
+  /**
+   * 調整牛群數量，保留既有乳牛的狀態
+   */
+  resize(herd, size) {
+    const resized = this.create(size);
+    const keep = Math.min(herd.size, size);
+    resized.hunger.set(herd.hunger.subarray(0, keep));
+    resized.timerEndTime.set(herd.timerEndTime.subarray(0, keep));
+    return resized;
+  },
+
+  /**
+   * 由乳牛 id 推導名稱
+   */
+  getName(cattleId) {
+    return `乳牛 #${cattleId}`;
+  },
+
+  /**
+   * 檢查乳牛的計時器是否已到期
+   */
+  isExpired(herd, index, now = Clock.now()) {
+    const endTime = herd.timerEndTime[index];
+    return endTime !== 0 && now >= endTime;
+  },
+
+  /**
+   * 將所有已到期的乳牛寫回為飽食度 0、沒有計時器，回傳整理的數量
+   */
+  normalize(herd, now = Clock.now()) {
+    let count = 0;
+    for (let i = 0; i < herd.size; i++) {
+      if (this.isExpired(herd, i, now)) {
+        herd.hunger[i] = 0;
+        herd.timerEndTime[i] = 0;
+        count++;
+      }
+    }
+    return count;
+  },
+
+  /**
+   * 取得乳牛的存取介面，讀寫會直接反映到欄式陣列
+   * 讀取時已套用到期規則；找不到時回傳 null
+   */
+  get(herd, cattleId) {
+    const index = cattleId - 1;
+    if (!Number.isInteger(index) || index < 0 || index >= herd.size) {
+      return null;
+    }
+
+    const isExpired = () => this.isExpired(herd, index);
+    return {
+      id: cattleId,
+      name: this.getName(cattleId),
+      maxHunger: this.MAX_HUNGER,
+      get hunger() {
+        return isExpired() ? 0 : herd.hunger[index];
+      },
+      set hunger(value) {
+        // 寫入前先清除已到期的計時器
+        if (isExpired()) {
+          herd.timerEndTime[index] = 0;
+        }
+        herd.hunger[index] = value;
+      },
+      get timerEndTime() {
+        return herd.timerEndTime[index] === 0 || isExpired() ? null : herd.timerEndTime[index];
+      },
+      set timerEndTime(value) {
+        herd.timerEndTime[index] = value || 0;
+      }
+    };
+  },
+
+  /**
+   * 依序走訪每頭乳牛
+   */
+  forEach(herd, callback) {
+    for (let id = 1; id <= herd.size; id++) {
+      callback(this.get(herd, id));
+    }
+  },
+
+  /**
+   * 將牛群編碼為可儲存的格式
+   */
+  encode(herd) {
+    return {
+      size: herd.size,
+      hunger: this.bytesToBase64(herd.hunger),
+      timerEndTime: this.bytesToBase64(new Uint8Array(herd.timerEndTime.buffer))
+    };
+  },
+
+  /**
+   * 將儲存格式解碼為牛群（也接受舊版的乳牛物件陣列）
+   */
+  decode(data) {
+    if (Array.isArray(data)) {
+      return this.fromLegacyCattle(data);
+    }
+
+    const herd = this.create(data.size);
+    herd.hunger.set(this.base64ToBytes(data.hunger));
+    new Uint8Array(herd.timerEndTime.buffer).set(this.base64ToBytes(data.timerEndTime));
+    return herd;
+  },
+
+  /**
+   * 將舊版的乳牛物件陣列轉換為牛群
+   */
+  fromLegacyCattle(cattleList) {
+    const size = cattleList.reduce((max, cattle) => Math.max(max, cattle.id), 0);
+    const herd = this.create(size);
+    cattleList.forEach(cattle => {
+      herd.hunger[cattle.id - 1] = cattle.hunger;
+      herd.timerEndTime[cattle.id - 1] = cattle.timerEndTime || 0;
+    });
+    return herd;
+  },
+
+  /**
+   * 位元組陣列轉為 base64 字串
+   */
+  bytesToBase64(bytes) {
+    let binary = '';
+    // 分段轉換，避免大型牛群超過函式參數數量上限
+    const chunkSize = 0x8000;
+    for (let i = 0; i < bytes.length; i += chunkSize) {
+      binary += String.fromCharCode.apply(null, bytes.subarray(i, i + chunkSize));
+    }
+    return btoa(binary);
+  },
+
+  /**
+   * base64 字串轉為位元組陣列
+   */
+  base64ToBytes(base64) {
+    const binary = atob(base64);
+    const bytes = new Uint8Array(binary.length);
+    for (let i = 0; i < binary.length; i++) {
+      bytes[i] = binary.charCodeAt(i);
+    }
+    return bytes;
+  }
+};
@@ -0,0 +1,232 @@
+/**
+ * 點數與牧草帳本模組
+ * 以只能附加的交易紀錄保存每一次點數與牧草的變動，可由快照加上之後的紀錄重建餘額
+ *
+ * - 每筆交易獨立一個 key（cattleFarmLedger:<userId>:<交易 id>），附加時只寫入這一筆，
+ *   不讀取也不改寫既有資料；交易 id 以時間開頭，依字串排序即為發生順序。
+ * - 交易透過 WriteQueue 與其他變更一起批次寫入。
+ * - 每位使用者累積 SNAPSHOT_INTERVAL 筆交易後壓縮一次：將交易併入快照
+ *   （cattleFarmLedgerSnapshot:<userId>）並刪除已併入的交易，快照保留各類交易的累計。
+ * - 使用者第一次有交易時，以當下的點數與牧草建立期初快照（帳本建立前的餘額）；
+ *   批次指派點數時，期初快照與交易在同一次寫入中完成。
+ * - 購買牧草時點數立即寫入，購買交易與牧草之後才延遲寫入：頁面在兩者之間異常終止
+ *   （未觸發 pagehide）時，點數已扣除但購買交易與牧草不會保存。
+ *
+ * 交易格式：{ type, points, grass, cattleId?, at }
+ * - credit：管理員指派點數；adjust：管理員直接設定點數（記錄差額）
+ * - purchase：以點數購買牧草；feed：以牧草餵養乳牛（一次餵多口時合併為一筆，
+ *   餵養單一乳牛時記錄 cattleId，一次餵飽所有乳牛時不記錄）
+ */
+
+import { StorageEngine } from './storage-engine.js';
+import { RecordLock } from './record-lock.js';
+import { WriteQueue } from './write-queue.js';
+import { UserManager } from './user-manager.js';
+import { GameManager } from './game.js';
+
+export const Ledger = {
+  ENTRY_KEY_PREFIX: 'cattleFarmLedger:',
+  SNAPSHOT_KEY_PREFIX: 'cattleFarmLedgerSnapshot:',
+  SNAPSHOT_INTERVAL: 100, // 累積多少筆交易後壓縮成快照
+  OPEN_LOCK: 'cattleFarmLedgerOpen', // 建立期初快照：單一使用者以共享模式持有，批次以獨占模式持有
+  sessionId: Math.random().toString(36).substring(2, 8), // 避免多個分頁同一毫秒產生相同的交易 id
+  nextCounter: 0,
+  openedUsers: new Set(), // 本分頁已確認有快照的使用者
+  appendCounts: new Map(), // userId → 本分頁上次壓縮後附加的交易數
+
+  /**
+   * 取得交易的儲存 key
+   */
+  getEntryKey(userId, entryId) {
+    return `${this.ENTRY_KEY_PREFIX}${userId}:${entryId}`;
+  },
+
+  /**
+   * 取得快照的儲存 key
+   */
+  getSnapshotKey(userId) {
+    return this.SNAPSHOT_KEY_PREFIX + userId;
+  },
+
+  /**
+   * 產生依時間排序的交易 id
+   */
+  generateEntryId() {
+    const counter = (this.nextCounter++).toString(36).padStart(4, '0');
+    return `${Date.now().toString(36)}-${this.sessionId}-${counter}`;
+  },
+
+  /**
+   * 建立空白快照
+   */
+  createSnapshot(points = 0, grass = 0) {
+    return { points, grass, totals: {}, folded: [], compactedAt: new Date().toISOString() };
+  },
+
+  /**
+   * 確認使用者已有快照，沒有時以目前的點數與牧草建立期初快照
+   * 必須在套用交易前呼叫（呼叫端持有該使用者的資料鎖）
+   */
+  async ensureOpened(userId) {
+    if (this.openedUsers.has(userId)) return;
+
+    await RecordLock.run(this.OPEN_LOCK, () => RecordLock.run(this.getSnapshotKey(userId), async () => {
+      const key = this.getSnapshotKey(userId);
+      if ((await StorageEngine.get(key)) === null) {
+        const user = await UserManager.getUserById(userId);
+        const gameData = await GameManager.getGameData(userId);
+        await StorageEngine.set(key, this.createSnapshot(
+          user ? user.points : 0,
+          gameData ? gameData.grass : 0
+        ));
+      }
+    }), 'shared');
+    this.openedUsers.add(userId);
+  },
+
+  /**
+   * 為還沒有快照的使用者建立期初快照，回傳 [key, 快照] 供呼叫端與交易一起寫入
+   * users 為套用交易前的使用者資料；呼叫端以獨占模式持有 OPEN_LOCK 直到寫入完成，寫入後呼叫 markOpened
+   */
+  async createOpeningEntries(users) {
+    const pending = users.filter(user => !this.openedUsers.has(user.id));
+    const snapshots = await Promise.all(pending.map(user => StorageEngine.get(this.getSnapshotKey(user.id))));
+    const missing = pending.filter((user, index) => snapshots[index] === null);
+    this.markOpened(pending.filter((user, index) => snapshots[index] !== null).map(user => user.id));
+
+    const games = await Promise.all(missing.map(user => GameManager.getGameData(user.id)));
+    return missing.map((user, index) => [
+      this.getSnapshotKey(user.id),
+      this.createSnapshot(user.points, games[index] ? games[index].grass : 0)
+    ]);
+  },
+
+  /**
+   * 記錄使用者已有快照
+   */
+  markOpened(userIds) {
+    userIds.forEach(userId => this.openedUsers.add(userId));
+  },
+
+  /**
+   * 建立交易，回傳 [key, 交易]（供需要與其他資料一起寫入的呼叫端使用）
+   */
+  createEntry(userId, type, { points = 0, grass = 0, cattleId } = {}) {
+    const entry = { type, points, grass, at: new Date().toISOString() };
+    if (cattleId !== undefined) {
+      entry.cattleId = cattleId;
+    }
+    this.countAppend(userId);
+    return [this.getEntryKey(userId, this.generateEntryId()), entry];
+  },
+
+  /**
+   * 附加一筆交易（延遲批次寫入）
+   */
+  append(userId, type, change) {
+    const [key, entry] = this.createEntry(userId, type, change);
+    WriteQueue.enqueue(key, entry);
+  },
+
+  /**
+   * 記錄附加的交易數，達到間隔時在寫入後壓縮
+   */
+  countAppend(userId) {
+    const count = (this.appendCounts.get(userId) || 0) + 1;
+    if (count < this.SNAPSHOT_INTERVAL) {
+      this.appendCounts.set(userId, count);
+      return;
+    }
+
+    this.appendCounts.set(userId, 0);
+    // 等本次的交易寫入後再壓縮
+    setTimeout(() => {
+      WriteQueue.flush().then(() => this.compact(userId));
+    }, 0);
+  },
+
+  /**
+   * 讀取快照與尚未併入快照的交易（依發生順序）
+   */
+  async load(userId) {
+    const snapshot = (await StorageEngine.get(this.getSnapshotKey(userId))) || this.createSnapshot();
+    const folded = new Set(snapshot.folded);
+    const prefix = this.getEntryKey(userId, '');
+    const keys = (await StorageEngine.keys(prefix)).sort();
+
+    const entries = [];
+    const stale = []; // 已併入快照但尚未刪除的交易
+    for (const key of keys) {
+      const id = key.substring(prefix.length);
+      if (folded.has(id)) {
+        stale.push(key);
+        continue;
+      }
+      const entry = await StorageEngine.get(key);
+      if (entry) {
+        entries.push({ id, ...entry });
+      }
+    }
+    return { snapshot, entries, stale };
+  },
+
+  /**
+   * 將交易套用到快照（回傳新的快照，不修改傳入的物件）
+   */
+  fold(snapshot, entries) {
+    const result = { ...snapshot, totals: { ...snapshot.totals } };
+    entries.forEach(({ type, points, grass }) => {
+      result.points += points;
+      result.grass += grass;
+      const total = result.totals[type] || { count: 0, points: 0, grass: 0 };
+      result.totals[type] = {
+        count: total.count + 1,
+        points: total.points + points,
+        grass: total.grass + grass
+      };
+    });
+    return result;
+  },
+
+  /**
+   * 讀取快照與交易（與壓縮互斥，不會讀到壓縮到一半的資料）
+   */
+  read(userId) {
+    return RecordLock.run(this.getSnapshotKey(userId), () => this.load(userId), 'shared');
+  },
+
+  /**
+   * 由快照加上之後的交易重建餘額
+   */
+  async getBalance(userId) {
+    const { snapshot, entries } = await this.read(userId);
+    const { points, grass } = this.fold(snapshot, entries);
+    return { points, grass };
+  },
+
+  /**
+   * 取得尚未壓縮的交易紀錄（依發生順序）與快照中的累計
+   */
+  async getHistory(userId) {
+    const { snapshot, entries } = await this.read(userId);
+    return { totals: snapshot.totals, entries };
+  },
+
+  /**
+   * 將交易併入快照並刪除已併入的交易
+   * 快照記錄本次併入的交易 id，刪除前中斷時下次壓縮會略過這些交易，不會重複計算
+   */
+  compact(userId) {
+    return RecordLock.run(this.getSnapshotKey(userId), async () => {
+      const { snapshot, entries, stale } = await this.load(userId);
+      await Promise.all(stale.map(key => StorageEngine.remove(key)));
+      if (entries.length === 0) return;
+
+      const compacted = this.fold(snapshot, entries);
+      compacted.folded = entries.map(({ id }) => id);
+      compacted.compactedAt = new Date().toISOString();
+      await StorageEngine.set(this.getSnapshotKey(userId), compacted);
+      await Promise.all(entries.map(({ id }) => StorageEngine.remove(this.getEntryKey(userId, id))));
+    });
+  }
+};
@@ -0,0 +1,87 @@
+/**
+ * 跨分頁資料鎖模組
+ * 以 Web Locks API 序列化多個分頁對同一筆資料的讀取-修改-寫入
+ *
+ * - run(name, fn)：持有鎖執行 fn，fn 結束後釋放（適用於直接寫入的使用者資料）
+ * - acquire(name) / retain(name) / release(name)：以參考計數持有鎖，
+ *   用於延遲寫入的遊戲數據：變更進行中或 WriteQueue 還有尚未寫入的資料時都保留鎖，
+ *   全部寫入後才釋放，其他分頁取得鎖時儲存引擎中已經是最新資料。
+ *
+ * 瀏覽器不支援 Web Locks 時，run 只在本分頁內依序執行，
+ * 跨分頁的衝突由呼叫端在寫入前比對版本號（compare-and-retry）。
+ */
+
+export const RecordLock = {
+  leases: new Map(), // 鎖名稱 → { acquired: Promise<釋放函式>, refs }（本分頁持有中的鎖）
+  queues: new Map(), // 鎖名稱 → 最後一個排隊中的 Promise（不支援 Web Locks 時使用）
+
+  /**
+   * 檢查瀏覽器是否支援 Web Locks
+   */
+  isSupported() {
+    return typeof navigator !== 'undefined' && !!navigator.locks;
+  },
+
+  /**
+   * 持有鎖執行 fn（mode 為 'exclusive' 或 'shared'）
+   */
+  run(name, fn, mode = 'exclusive') {
+    if (this.isSupported()) {
+      return navigator.locks.request(name, { mode }, fn);
+    }
+
+    // 本分頁內依序執行（不區分共享與獨占）
+    const previous = this.queues.get(name) || Promise.resolve();
+    const result = previous.then(() => fn());
+    const tail = result.catch(() => {});
+    this.queues.set(name, tail);
+    tail.then(() => {
+      if (this.queues.get(name) === tail) this.queues.delete(name);
+    });
+    return result;
+  },
+
+  /**
+   * 取得鎖並增加參考計數
+   * 回傳 true 代表鎖是新取得的（或不支援 Web Locks），本分頁的快取可能已過期
+   */
+  async acquire(name) {
+    if (!this.isSupported()) return true;
+
+    const lease = this.leases.get(name);
+    if (lease) {
+      lease.refs++;
+      await lease.acquired;
+      return false;
+    }
+
+    const acquired = new Promise(resolve => {
+      navigator.locks.request(name, () => new Promise(release => resolve(release)));
+    });
+    this.leases.set(name, { acquired, refs: 1 });
+    await acquired;
+    return true;
+  },
+
+  /**
+   * 本分頁已持有鎖時增加參考計數，回傳是否有增加
+   */
+  retain(name) {
+    const lease = this.leases.get(name);
+    if (!lease) return false;
+    lease.refs++;
+    return true;
+  },
+
+  /**
+   * 減少參考計數，歸零時釋放鎖
+   */
+  release(name) {
+    const lease = this.leases.get(name);
+    if (!lease) return;
+    lease.refs--;
+    if (lease.refs > 0) return;
+    this.leases.delete(name);
+    lease.acquired.then(release => release());
+  }
+};
@@ -0,0 +1,579 @@
+/**
+ * 儲存引擎模組
+ * 提供統一的非同步儲存介面，可選擇 localStorage、IndexedDB 或本機後端（python -m server）
+ *
+ * 每個引擎都實作相同的方法：
+ * - open()：開啟引擎（回傳 Promise）
+ * - get(key)：取得資料，不存在時回傳 null
+ * - set(key, value)：寫入資料（value 為可序列化的物件）
+ * - setMany(entries)：一次寫入多筆 [key, value]（IndexedDB 在同一個交易中完成）
+ * - setIfVersion(key, value, expectedVersion)：儲存的資料不存在或版本號相同時才寫入，回傳是否寫入
+ * - remove(key)：刪除資料
+ * - keys(prefix)：列出符合前綴的所有 key
+ * - onExternalChange(callback, prefixes)：其他分頁（或裝置）變更資料時呼叫 callback(key)，
+ *   prefixes 為需要通知的 key 前綴（只有 remote 引擎用來縮小輪詢範圍，其他引擎由 callback 自行過濾）
+ *
+ * remote 引擎將同一時間的呼叫合併成一個 HTTP 請求，由後端在單一 SQLite 交易中依序執行；
+ * 後端不推送變更，改為定期輪詢其他裝置變更的 key。
+ */
+
+const LocalStorageEngine = {
+  name: 'localStorage',
+
+  /**
+   * 開啟引擎（localStorage 不需要額外準備）
+   */
+  async open() {
+    return this;
+  },
+
+  /**
+   * 取得資料
+   */
+  async get(key) {
+    const json = localStorage.getItem(key);
+    return json === null ? null : JSON.parse(json);
+  },
+
+  /**
+   * 寫入資料
+   */
+  async set(key, value) {
+    localStorage.setItem(key, JSON.stringify(value));
+  },
+
+  /**
+   * 一次寫入多筆資料（同步完成，中間不會讓出執行緒）
+   */
+  async setMany(entries) {
+    entries.forEach(([key, value]) => {
+      localStorage.setItem(key, JSON.stringify(value));
+    });
+  },
+
+  /**
+   * 版本號相同時才寫入（讀取與寫入之間不會讓出執行緒）
+   */
+  async setIfVersion(key, value, expectedVersion) {
+    const json = localStorage.getItem(key);
+    if (json !== null && (JSON.parse(json).version || 0) !== expectedVersion) {
+      return false;
+    }
+    localStorage.setItem(key, JSON.stringify(value));
+    return true;
+  },
+
+  /**
+   * 刪除資料
+   */
+  async remove(key) {
+    localStorage.removeItem(key);
+  },
+
+  /**
+   * 列出符合前綴的所有 key
+   */
+  async keys(prefix = '') {
+    const result = [];
+    for (let i = 0; i < localStorage.length; i++) {
+      const key = localStorage.key(i);
+      if (key.startsWith(prefix)) {
+        result.push(key);
+      }
+    }
+    return result;
+  },
+
+  /**
+   * 監聽其他分頁的變更（key 為 null 代表全部清除）
+   */
+  onExternalChange(callback) {
+    window.addEventListener('storage', (e) => {
+      callback(e.key);
+    });
+  }
+};
+
+const IndexedDBEngine = {
+  name: 'indexedDB',
+  DB_NAME: 'cattleFarm',
+  STORE_NAME: 'keyValue',
+  CHANNEL_NAME: 'cattleFarmStorage', // 通知其他分頁寫入了哪些 key（IndexedDB 沒有 storage 事件）
+  db: null,
+  channel: null,
+
+  /**
+   * 檢查瀏覽器是否支援 IndexedDB
+   */
+  isSupported() {
+    return typeof indexedDB !== 'undefined';
+  },
+
+  /**
+   * 開啟資料庫
+   */
+  open() {
+    if (this.db) return Promise.resolve(this);
+
+    return new Promise((resolve, reject) => {
+      const request = indexedDB.open(this.DB_NAME, 1);
+      request.onupgradeneeded = () => {
+        request.result.createObjectStore(this.STORE_NAME);
+      };
+      request.onsuccess = () => {
+        this.db = request.result;
+        resolve(this);
+      };
+      request.onerror = () => reject(request.error);
+    });
+  },
+
+  /**
+   * 取得跨分頁通知用的 BroadcastChannel（不支援時為 null）
+   */
+  getChannel() {
+    if (!this.channel && typeof BroadcastChannel !== 'undefined') {
+      this.channel = new BroadcastChannel(this.CHANNEL_NAME);
+    }
+    return this.channel;
+  },
+
+  /**
+   * 通知其他分頁這些 key 已變更（與 localStorage 的 storage 事件相同，本分頁不會收到）
+   */
+  notify(keys) {
+    const channel = this.getChannel();
+    if (channel && keys.length > 0) {
+      channel.postMessage({ keys });
+    }
+  },
+
+  /**
+   * 在單一交易中執行請求
+   */
+  request(mode, operation) {
+    return new Promise((resolve, reject) => {
+      const transaction = this.db.transaction(this.STORE_NAME, mode);
+      const request = operation(transaction.objectStore(this.STORE_NAME));
+      transaction.oncomplete = () => resolve(request ? request.result : undefined);
+      transaction.onerror = () => reject(transaction.error);
+      transaction.onabort = () => reject(transaction.error);
+    });
+  },
+
+  /**
+   * 取得資料
+   */
+  async get(key) {
+    const value = await this.request('readonly', store => store.get(key));
+    return value === undefined ? null : value;
+  },
+
+  /**
+   * 寫入資料
+   */
+  async set(key, value) {
+    await this.request('readwrite', store => store.put(value, key));
+    this.notify([key]);
+  },
+
+  /**
+   * 在單一交易中寫入多筆資料
+   */
+  async setMany(entries) {
+    await this.request('readwrite', store => {
+      entries.forEach(([key, value]) => store.put(value, key));
+      return null;
+    });
+    this.notify(entries.map(([key]) => key));
+  },
+
+  /**
+   * 在單一交易中比對版本號，相同時才寫入
+   */
+  async setIfVersion(key, value, expectedVersion) {
+    let saved = false;
+    await this.request('readwrite', (store) => {
+      const request = store.get(key);
+      request.onsuccess = () => {
+        const stored = request.result;
+        if (stored === undefined || (stored.version || 0) === expectedVersion) {
+          store.put(value, key);
+          saved = true;
+        }
+      };
+      return null;
+    });
+    if (saved) this.notify([key]);
+    return saved;
+  },
+
+  /**
+   * 刪除資料
+   */
+  async remove(key) {
+    await this.request('readwrite', store => store.delete(key));
+    this.notify([key]);
+  },
+
+  /**
+   * 列出符合前綴的所有 key
+   */
+  async keys(prefix = '') {
+    const allKeys = await this.request('readonly', store => store.getAllKeys());
+    return allKeys.filter(key => key.startsWith(prefix));
+  },
+
+  /**
+   * 監聽其他分頁的變更（由其他分頁寫入後發送的 BroadcastChannel 訊息得知）
+   */
+  onExternalChange(callback) {
+    const channel = this.getChannel();
+    if (!channel) return;
+    channel.addEventListener('message', ({ data }) => {
+      data.keys.forEach(key => callback(key));
+    });
+  }
+};
+
+const RemoteEngine = {
+  name: 'remote',
+  shared: true, // 資料由多個瀏覽器共用，Web Locks 無法涵蓋其他裝置
+  LOCAL_KEYS: new Set(['cattleFarmCurrentUser']), // 每個瀏覽器各自的資料（登入狀態），仍存放在 localStorage
+  MAX_BATCH_SIZE: 500, // 單一請求最多包含的操作數
+  KEEPALIVE_LIMIT: 60000, // 請求內容不超過此大小（位元組）時使用 keepalive，頁面關閉時仍會送出（瀏覽器上限 64 KiB）
+  POLL_INTERVAL: 3000, // 輪詢其他裝置變更的間隔（毫秒，分頁隱藏時暫停）
+  queue: [], // 等待送出的呼叫：[{ ops, resolve, reject }]
+  watchers: [], // 變更通知：[{ callback, prefixes }]
+  cursor: null, // 上次輪詢時後端最後的變更時間（null 代表尚未輪詢）
+  cursorKeys: new Set(), // 變更時間等於 cursor、已經通知過的 key
+  pollTimeoutId: null,
+  scheduled: false,
+  inFlight: false,
+  opened: false,
+
+  /**
+   * 取得 API 網址（相對於頁面所在目錄）
+   */
+  getUrl(path) {
+    return new URL(`api/${path}`, document.baseURI).href;
+  },
+
+  /**
+   * 確認後端可以連線
+   */
+  async open() {
+    if (this.opened) return this;
+
+    const response = await fetch(this.getUrl('health'), { cache: 'no-store' });
+    if (!response.ok) {
+      throw new Error(`後端無法使用（HTTP ${response.status}）`);
+    }
+    this.opened = true;
+    return this;
+  },
+
+  /**
+   * 加入一組操作，與同一時間的其他呼叫合併成一個請求
+   * 同一組操作一定在同一個請求（同一個資料庫交易）中執行，回傳各操作的結果
+   */
+  call(ops) {
+    return new Promise((resolve, reject) => {
+      this.queue.push({ ops, resolve, reject });
+      this.schedule();
+    });
+  },
+
+  /**
+   * 排程送出：目前的工作結束後送出；上一個請求還沒完成時，等它完成後再一起送出
+   */
+  schedule() {
+    if (this.scheduled || this.inFlight) return;
+    this.scheduled = true;
+    queueMicrotask(() => {
+      this.scheduled = false;
+      this.send();
+    });
+  },
+
+  /**
+   * 將排隊中的呼叫合併成一個請求送出（依呼叫順序執行）
+   */
+  async send() {
+    const batch = [];
+    let size = 0;
+    while (this.queue.length > 0 && (batch.length === 0 || size + this.queue[0].ops.length <= this.MAX_BATCH_SIZE)) {
+      const call = this.queue.shift();
+      batch.push(call);
+      size += call.ops.length;
+    }
+    if (batch.length === 0) return;
+
+    this.inFlight = true;
+    try {
+      const results = await this.post(batch.flatMap(call => call.ops));
+      let offset = 0;
+      batch.forEach((call) => {
+        call.resolve(results.slice(offset, offset + call.ops.length));
+        offset += call.ops.length;
+      });
+    } catch (error) {
+      batch.forEach(call => call.reject(error));
+    } finally {
+      this.inFlight = false;
+      if (this.queue.length > 0) this.schedule();
+    }
+  },
+
+  /**
+   * 送出批次操作
+   * 內容夠小時以 keepalive 送出，pagehide 時寫入的資料在頁面關閉後仍會送達
+   * （同一時間只有一個請求，不會超過瀏覽器對 keepalive 請求的總量限制）
+   */
+  async post(ops) {
+    const body = JSON.stringify({ ops });
+    const response = await fetch(this.getUrl('storage'), {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body,
+      keepalive: new Blob([body]).size <= this.KEEPALIVE_LIMIT
+    });
+    const data = await response.json();
+    if (!response.ok) {
+      throw new Error(data.error || `HTTP ${response.status}`);
+    }
+    return data.results;
+  },
+
+  /**
+   * 取得資料
+   */
+  async get(key) {
+    if (this.LOCAL_KEYS.has(key)) return LocalStorageEngine.get(key);
+    const [value] = await this.call([['get', key]]);
+    return value;
+  },
+
+  /**
+   * 寫入資料
+   */
+  async set(key, value) {
+    if (this.LOCAL_KEYS.has(key)) return LocalStorageEngine.set(key, value);
+    await this.call([['set', key, value]]);
+  },
+
+  /**
+   * 在同一個請求（資料庫交易）中寫入多筆資料
+   */
+  async setMany(entries) {
+    const remote = entries.filter(([key]) => !this.LOCAL_KEYS.has(key));
+    await LocalStorageEngine.setMany(entries.filter(([key]) => this.LOCAL_KEYS.has(key)));
+    if (remote.length === 0) return;
+    await this.call(remote.map(([key, value]) => ['set', key, value]));
+  },
+
+  /**
+   * 由後端在同一個交易中比對版本號，相同時才寫入（其他裝置同時寫入也不會遺失更新）
+   */
+  async setIfVersion(key, value, expectedVersion) {
+    if (this.LOCAL_KEYS.has(key)) return LocalStorageEngine.setIfVersion(key, value, expectedVersion);
+    const [saved] = await this.call([['setIfVersion', key, value, expectedVersion]]);
+    return saved;
+  },
+
+  /**
+   * 刪除資料
+   */
+  async remove(key) {
+    if (this.LOCAL_KEYS.has(key)) return LocalStorageEngine.remove(key);
+    await this.call([['remove', key]]);
+  },
+
+  /**
+   * 列出符合前綴的所有 key
+   */
+  async keys(prefix = '') {
+    const [keys] = await this.call([['keys', prefix]]);
+    const localKeys = [...this.LOCAL_KEYS].filter(key => key.startsWith(prefix) && localStorage.getItem(key) !== null);
+    return keys.concat(localKeys);
+  },
+
+  /**
+   * 監聽其他分頁與其他裝置的變更
+   * 存放在 localStorage 的 key 由 storage 事件通知；後端的 key 定期輪詢（包含本分頁自己的寫入）
+   */
+  onExternalChange(callback, prefixes = ['']) {
+    window.addEventListener('storage', (e) => {
+      if (e.key === null || this.LOCAL_KEYS.has(e.key)) callback(e.key);
+    });
+    this.watchers.push({ callback, prefixes });
+    if (this.pollTimeoutId === null) this.poll();
+  },
+
+  /**
+   * 排程下一次輪詢
+   */
+  schedulePoll() {
+    this.pollTimeoutId = setTimeout(() => this.poll(), this.POLL_INTERVAL);
+  },
+
+  /**
+   * 查詢上次輪詢之後變更或刪除的 key 並通知（分頁隱藏時略過，連線失敗時下次再試）
+   */
+  async poll() {
+    this.pollTimeoutId = null;
+    if (typeof document !== 'undefined' && document.hidden) {
+      this.schedulePoll();
+      return;
+    }
+
+    const prefixes = [...new Set(this.watchers.flatMap(watcher => watcher.prefixes))];
+    try {
+      const results = await this.call(prefixes.map(prefix => ['changes', prefix, this.cursor]));
+      this.applyChanges(results);
+    } catch (error) {
+      console.warn('無法取得其他裝置的變更：', error);
+    }
+    this.schedulePoll();
+  },
+
+  /**
+   * 通知新的變更，並前進 cursor（同一批結果的 cursor 相同）
+   */
+  applyChanges(results) {
+    const cursor = results[0].cursor;
+    const changed = new Map();
+    results.forEach(({ keys }) => keys.forEach(([key, updatedAt]) => changed.set(key, updatedAt)));
+
+    // 變更時間等於上次 cursor 的 key 可能已經通知過
+    const fresh = [...changed].filter(([key, updatedAt]) => updatedAt > this.cursor || !this.cursorKeys.has(key));
+    const atCursor = new Set(cursor === this.cursor ? this.cursorKeys : []);
+    changed.forEach((updatedAt, key) => {
+      if (updatedAt === cursor) atCursor.add(key);
+    });
+    this.cursor = cursor;
+    this.cursorKeys = atCursor;
+
+    fresh.forEach(([key]) => {
+      this.watchers.forEach(({ callback, prefixes }) => {
+        if (prefixes.some(prefix => key.startsWith(prefix))) callback(key);
+      });
+    });
+  }
+};
+
+export const StorageEngine = {
+  PREFERENCE_KEY: 'cattleFarmStorageEngine', // 記錄使用者選擇的引擎（存放在 localStorage）
+  DATA_KEY_PREFIX: 'cattleFarm', // 遊戲資料 key 的共同前綴
+  engines: {
+    localStorage: LocalStorageEngine,
+    indexedDB: IndexedDBEngine,
+    remote: RemoteEngine
+  },
+  current: LocalStorageEngine,
+
+  /**
+   * 選擇並開啟儲存引擎
+   * 優先順序：網址參數 ?storage=indexedDB|remote → 上次的選擇 → localStorage
+   */
+  async select(name) {
+    const params = new URLSearchParams(window.location.search);
+    const requested = name || params.get('storage') || localStorage.getItem(this.PREFERENCE_KEY);
+    let engine = this.engines[requested] || LocalStorageEngine;
+
+    if (engine === IndexedDBEngine) {
+      try {
+        if (!IndexedDBEngine.isSupported()) {
+          throw new Error('此瀏覽器不支援 IndexedDB');
+        }
+        await IndexedDBEngine.open();
+        await this.importFromLocalStorage(IndexedDBEngine);
+      } catch (error) {
+        console.warn('無法使用 IndexedDB，改用 localStorage：', error);
+        engine = LocalStorageEngine;
+      }
+    } else if (engine === RemoteEngine) {
+      try {
+        await RemoteEngine.open();
+      } catch (error) {
+        console.warn('無法連線到後端，改用 localStorage：', error);
+        engine = LocalStorageEngine;
+      }
+    }
+
+    await engine.open();
+    this.current = engine;
+    localStorage.setItem(this.PREFERENCE_KEY, engine.name);
+    return engine;
+  },
+
+  /**
+   * 第一次切換到 IndexedDB 時，將 localStorage 中的遊戲資料複製過去
+   */
+  async importFromLocalStorage(engine) {
+    const existingKeys = await engine.keys(this.DATA_KEY_PREFIX);
+    if (existingKeys.length > 0) return;
+
+    const keys = await LocalStorageEngine.keys(this.DATA_KEY_PREFIX);
+    for (const key of keys) {
+      if (key === this.PREFERENCE_KEY) continue;
+      await engine.set(key, await LocalStorageEngine.get(key));
+    }
+  },
+
+  /**
+   * 目前的引擎是否由多個瀏覽器共用（本分頁的鎖無法涵蓋所有寫入者）
+   */
+  isShared() {
+    return !!this.current.shared;
+  },
+
+  /**
+   * 取得資料
+   */
+  get(key) {
+    return this.current.get(key);
+  },
+
+  /**
+   * 寫入資料
+   */
+  set(key, value) {
+    return this.current.set(key, value);
+  },
+
+  /**
+   * 一次寫入多筆資料
+   */
+  setMany(entries) {
+    return this.current.setMany(entries);
+  },
+
+  /**
+   * 版本號相同時才寫入，回傳是否寫入
+   */
+  setIfVersion(key, value, expectedVersion) {
+    return this.current.setIfVersion(key, value, expectedVersion);
+  },
+
+  /**
+   * 刪除資料
+   */
+  remove(key) {
+    return this.current.remove(key);
+  },
+
+  /**
+   * 列出符合前綴的所有 key
+   */
+  keys(prefix) {
+    return this.current.keys(prefix);
+  },
+
+  /**
+   * 監聽其他分頁（或裝置）的變更，prefixes 為需要通知的 key 前綴
+   */
+  onExternalChange(callback, prefixes) {
+    this.current.onExternalChange(callback, prefixes);
+  }
+};
@@ -0,0 +1,102 @@
+/**
+ * 畫面更新節拍模組
+ * 每秒呼叫一次更新函式，對齊整秒與 requestAnimationFrame
+ * 整秒依 Clock 計算，使用虛擬時鐘時隨 Clock.advance 更新
+ *
+ * 分頁隱藏時完全停止（不保留任何計時器），
+ * 重新顯示時立即補繪一次，再繼續對齊整秒更新。
+ */
+
+import { Clock } from './clock.js';
+
+export const TickEngine = {
+  INTERVAL: 1000, // 更新間隔（毫秒）
+  callback: null,
+  timeoutId: null,
+  frameId: null,
+
+  /**
+   * 監聽分頁顯示狀態
+   */
+  init() {
+    document.addEventListener('visibilitychange', () => {
+      this.handleVisibilityChange();
+    });
+  },
+
+  /**
+   * 開始定期呼叫 callback（從下一個整秒開始）
+   */
+  start(callback) {
+    this.stop();
+    this.callback = callback;
+    this.schedule();
+  },
+
+  /**
+   * 停止更新
+   */
+  stop() {
+    this.cancel();
+    this.callback = null;
+  },
+
+  /**
+   * 清除尚未執行的計時器與畫面更新
+   */
+  cancel() {
+    if (this.timeoutId !== null) {
+      Clock.clearTimeout(this.timeoutId);
+      this.timeoutId = null;
+    }
+    if (this.frameId !== null) {
+      cancelAnimationFrame(this.frameId);
+      this.frameId = null;
+    }
+  },
+
+  /**
+   * 排程到下一個整秒後的畫面更新
+   */
+  schedule() {
+    if (!this.callback || document.hidden) return;
+
+    const delay = this.INTERVAL - (Clock.now() % this.INTERVAL);
+    this.timeoutId = Clock.setTimeout(() => {
+      this.timeoutId = null;
+      this.frameId = requestAnimationFrame(() => {
+        this.frameId = null;
+        this.tick();
+      });
+    }, delay);
+  },
+
+  /**
+   * 執行一次更新並排程下一次
+   */
+  tick() {
+    if (!this.callback) return;
+    this.callback();
+    this.schedule();
+  },
+
+  /**
+   * 在分頁可見時立即更新一次（分頁隱藏時等到重新顯示再補繪）
+   */
+  renderNow() {
+    if (!this.callback || document.hidden) return;
+    this.cancel();
+    this.tick();
+  },
+
+  /**
+   * 分頁隱藏時停止，重新顯示時補繪一次並恢復更新
+   */
+  handleVisibilityChange() {
+    if (!this.callback) return;
+    this.cancel();
+    if (!document.hidden) {
+      this.tick();
+    }
+  }
+};
@@ -0,0 +1,157 @@
+/**
+ * 使用者虛擬表格模組
+ * 管理員頁面的使用者列表只為可視範圍內的使用者建立表格列
+ *
+ * 容器（#users-list）作為捲動視窗，表格上下各有一列 spacer 撐出未繪製列的高度。
+ * 每次繪製只向查詢引擎要求可視範圍的一頁資料（已排序、篩選並格式化），
+ * 捲動時重複使用既有的表格列。
+ */
+
+export const UserListView = {
+  ROW_HEIGHT: 53, // 每列高度（px，需與 admin.css 一致）
+  OVERSCAN_ROWS: 5, // 可視範圍上下額外繪製的列數
+  FALLBACK_VIEWPORT_HEIGHT: 480, // 容器尚未顯示時假設的可視高度（px）
+  fetchPage: null, // (offset, limit) → Promise<{ total, rows }>
+  total: 0,
+  rows: [], // 可重複使用的表格列
+  rowsById: new Map(), // 使用者 id → 目前顯示該使用者的表格列
+  renderId: 0, // 用來捨棄過期的查詢結果
+  renderScheduled: false,
+
+  /**
+   * 初始化虛擬表格
+   */
+  init(container) {
+    this.container = container;
+    this.container.innerHTML = `
+      <p class="no-users hidden">目前沒有一般使用者</p>
+      <table class="users-table">
+        <thead><tr><th>帳號</th><th>點數</th><th>註冊日期</th><th>上次登入</th></tr></thead>
+        <tbody>
+          <tr class="users-spacer"><td colspan="4"></td></tr>
+          <tr class="users-spacer"><td colspan="4"></td></tr>
+        </tbody>
+      </table>
+    `;
+    this.emptyEl = this.container.querySelector('.no-users');
+    this.table = this.container.querySelector('.users-table');
+    this.tbody = this.table.querySelector('tbody');
+    [this.topSpacer, this.bottomSpacer] = this.tbody.querySelectorAll('.users-spacer');
+
+    this.container.addEventListener('scroll', () => {
+      this.scheduleRender();
+    }, { passive: true });
+  },
+
+  /**
+   * 設定資料來源，捲回頂端後重新繪製
+   */
+  setSource(fetchPage, emptyText = '目前沒有一般使用者') {
+    this.fetchPage = fetchPage;
+    this.emptyEl.textContent = emptyText;
+    this.container.scrollTop = 0;
+    return this.render();
+  },
+
+  /**
+   * 以目前的資料來源重新繪製可視列
+   */
+  refresh() {
+    return this.render();
+  },
+
+  /**
+   * 在下一個畫面更新時重新繪製（合併多次捲動事件）
+   */
+  scheduleRender() {
+    if (this.renderScheduled) return;
+    this.renderScheduled = true;
+    requestAnimationFrame(() => {
+      this.renderScheduled = false;
+      this.render();
+    });
+  },
+
+  /**
+   * 計算目前可視範圍的第一列與列數
+   */
+  getVisibleRange() {
+    const viewportHeight = this.container.clientHeight || this.FALLBACK_VIEWPORT_HEIGHT;
+    const scrollTop = this.container.scrollTop;
+    const first = Math.max(0, Math.floor(scrollTop / this.ROW_HEIGHT) - this.OVERSCAN_ROWS);
+    const last = Math.ceil((scrollTop + viewportHeight) / this.ROW_HEIGHT) + this.OVERSCAN_ROWS;
+    return { first, count: last - first };
+  },
+
+  /**
+   * 查詢可視範圍的資料並繪製
+   */
+  async render() {
+    if (!this.fetchPage) return;
+
+    const renderId = ++this.renderId;
+    const { first, count } = this.getVisibleRange();
+    const page = await this.fetchPage(first, count);
+    // 查詢期間已有較新的繪製
+    if (renderId !== this.renderId) return;
+
+    this.total = page.total;
+    this.emptyEl.classList.toggle('hidden', page.total > 0);
+    this.table.classList.toggle('hidden', page.total === 0);
+    this.topSpacer.style.height = `${first * this.ROW_HEIGHT}px`;
+    this.bottomSpacer.style.height = `${Math.max(0, page.total - first - page.rows.length) * this.ROW_HEIGHT}px`;
+
+    // 補足或移除表格列，使列數等於本頁資料數量
+    while (this.rows.length < page.rows.length) {
+      const row = this.createRow();
+      this.rows.push(row);
+      this.tbody.insertBefore(row.element, this.bottomSpacer);
+    }
+    while (this.rows.length > page.rows.length) {
+      this.rows.pop().element.remove();
+    }
+
+    this.rowsById.clear();
+    page.rows.forEach((data, offset) => {
+      this.updateRow(this.rows[offset], data);
+    });
+  },
+
+  /**
+   * 建立一個表格列
+   */
+  createRow() {
+    const element = document.createElement('tr');
+    element.className = 'user-row';
+    element.innerHTML = `
+      <td class="username-cell"></td>
+      <td class="points-cell"></td>
+      <td class="created-cell"></td>
+      <td class="last-login-cell"></td>
+    `;
+    const [usernameEl, pointsEl, createdEl, lastLoginEl] = element.children;
+    return { element, usernameEl, pointsEl, createdEl, lastLoginEl };
+  },
+
+  /**
+   * 只更新單一使用者的點數欄位（使用者不在可視範圍時不需要處理）
+   */
+  updatePoints(userId, points) {
+    const row = this.rowsById.get(userId);
+    if (row) {
+      row.pointsEl.textContent = points;
+    }
+  },
+
+  /**
+   * 以查詢結果（已格式化）更新表格列
+   */
+  updateRow(row, data) {
+    this.rowsById.set(data.id, row);
+    row.element.dataset.userId = data.id;
+    row.usernameEl.textContent = data.username;
+    row.pointsEl.textContent = data.points;
+    row.createdEl.textContent = data.createdAt;
+    row.lastLoginEl.textContent = data.lastLogin;
+  }
+};
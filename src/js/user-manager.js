@@ -1,20 +1,51 @@
 /**
  * 使用者管理模組
  * 負責處理使用者資料的儲存、讀取與驗證
+ * 所有存取儲存引擎的方法都回傳 Promise
  */
 
-const UserManager = {
-  STORAGE_KEY: 'cattleFarmUsers',
+import { StorageEngine } from './storage-engine.js';
+import { ChangeBus } from './change-bus.js';
+import { RecordLock } from './record-lock.js';
+import { UserQuery } from './user-query.js';
+import { Ledger } from './ledger.js';
+
+export const UserManager = {
+  STORAGE_KEY: 'cattleFarmUsers', // 舊版：所有使用者存放在同一個陣列
+  USER_KEY_PREFIX: 'cattleFarmUser:', // 每位使用者獨立一個 key
+  DIRECTORY_KEY: 'cattleFarmUserDirectory', // 帳號目錄：{ version, entries: [[帳號, id, 角色], ...] }
   CURRENT_USER_KEY: 'cattleFarmCurrentUser',
+  USERS_LOCK: 'cattleFarmUsers', // 單一使用者的變更以共享模式持有，批次變更以獨占模式持有
+  MAX_RETRIES: 5, // 沒有 Web Locks 時，版本衝突的重試次數
+  DEFAULT_ADMIN_LOCK: 'cattleFarmDefaultAdmin',
+  directoryCache: null, // 帳號 → { id, role }（常駐記憶體）
+  usernameIndex: null, // 依帳號排序的目錄項目，供前綴搜尋（依需要建立）
+  userCache: new Map(), // id → 已解析的使用者資料（依需要載入）
+  currentUserIdCache: undefined, // 當前登入使用者 ID（undefined 代表尚未讀取）
+
+  /**
+   * 初始化系統，遷移舊版資料
+   * 預設管理員帳號在第一次登入或註冊時才建立（已登入的玩家不需要檢查）
+   */
+  async init() {
+    this.watchStorage();
+    ChangeBus.subscribe('pointsChanged', ({ changes }) => this.applyPointsChanges(changes));
+    await this.migrateLegacyUsers();
+  },
+
+  /**
+   * 如果沒有任何使用者，建立預設管理員帳號（以鎖避免多個分頁或呼叫重複建立）
+   */
+  ensureDefaultAdmin() {
+    return RecordLock.run(this.DEFAULT_ADMIN_LOCK, () => this.createDefaultAdmin());
+  },
 
   /**
-   * 初始化系統，建立預設管理員帳號
+   * 目錄為空時建立預設管理員帳號
    */
-  init() {
-    const users = this.getAllUsers();
-    
-    // 如果沒有任何使用者，建立預設管理員帳號
-    if (users.length === 0) {
+  async createDefaultAdmin() {
+    const directory = await this.getDirectory();
+    if (directory.size === 0) {
       const adminUser = {
         id: this.generateId(),
         username: 'admin',
@@ -24,10 +55,34 @@ const UserManager = {
         createdAt: new Date().toISOString(),
         lastLogin: null
       };
-      this.saveUser(adminUser);
+      await this.saveUser(adminUser);
     }
   },
 
+  /**
+   * 將舊版單一陣列的使用者資料拆分為每位使用者一個 key
+   */
+  async migrateLegacyUsers() {
+    const legacyUsers = await StorageEngine.get(this.STORAGE_KEY);
+    if (!legacyUsers) return;
+
+    const directory = await this.getDirectory();
+    const migrated = [];
+    for (const user of legacyUsers) {
+      // 已存在於新格式的帳號較新，不覆蓋
+      if (!directory.has(user.username)) {
+        await StorageEngine.set(this.getUserKey(user.id), user);
+        migrated.push(user);
+      }
+    }
+    await this.updateDirectory((latest) => {
+      migrated.forEach((user) => {
+        if (!latest.has(user.username)) latest.set(user.username, { id: user.id, role: user.role });
+      });
+    });
+    await StorageEngine.remove(this.STORAGE_KEY);
+  },
+
   /**
    * 產生唯一 ID
    */
@@ -35,52 +90,309 @@ const UserManager = {
     return Date.now().toString(36) + Math.random().toString(36).substring(2);
   },
 
+  /**
+   * 取得使用者資料的儲存 key
+   */
+  getUserKey(id) {
+    return this.USER_KEY_PREFIX + id;
+  },
+
+  /**
+   * 監聽其他分頁的儲存變更，讓對應的快取失效
+   * 能接收 pointsChanged 訊息時，使用者資料由訊息更新，不需要重新讀取；
+   * 但資料由多個瀏覽器共用時，其他裝置的變更不會有訊息，仍讓快取失效
+   */
+  watchStorage() {
+    StorageEngine.onExternalChange((key) => {
+      // key 為 null 代表其他分頁清除了所有資料
+      if (key === null) {
+        this.invalidateCache();
+      } else if (key === this.DIRECTORY_KEY) {
+        this.directoryCache = null;
+        this.usernameIndex = null;
+      } else if (key === this.CURRENT_USER_KEY) {
+        this.currentUserIdCache = undefined;
+      } else if (key.startsWith(this.USER_KEY_PREFIX) && (!ChangeBus.isActive() || StorageEngine.isShared())) {
+        this.userCache.delete(key.substring(this.USER_KEY_PREFIX.length));
+      }
+    }, [this.DIRECTORY_KEY, this.USER_KEY_PREFIX]);
+  },
+
+  /**
+   * 清除所有使用者快取，下次讀取時重新解析
+   */
+  invalidateCache() {
+    this.directoryCache = null;
+    this.usernameIndex = null;
+    this.userCache.clear();
+    this.currentUserIdCache = undefined;
+  },
+
+  /**
+   * 取得帳號目錄（帳號 → { id, role }）
+   */
+  async getDirectory() {
+    if (!this.directoryCache) {
+      // 快取 Promise，避免同時呼叫時重複讀取
+      this.directoryCache = StorageEngine.get(this.DIRECTORY_KEY).then(stored => this.decodeDirectory(stored));
+    }
+    return this.directoryCache;
+  },
+
+  /**
+   * 將儲存的目錄解碼為 Map（舊版直接儲存項目陣列，版本號視為 0）
+   */
+  decodeDirectory(stored) {
+    const entries = Array.isArray(stored) ? stored : (stored ? stored.entries : []);
+    return new Map(entries.map(([username, id, role]) => [username, { id, role }]));
+  },
+
+  /**
+   * 資料由多個瀏覽器共用時重新讀取帳號目錄（其他裝置可能剛註冊新帳號）
+   */
+  refreshSharedDirectory() {
+    if (StorageEngine.isShared()) {
+      this.directoryCache = null;
+      this.usernameIndex = null;
+    }
+  },
+
+  /**
+   * 以最新的帳號目錄執行變更並寫回
+   * 重新讀取儲存的目錄，change(directory) 修改後比對版本號寫入；
+   * 其他分頁或裝置搶先寫入時重新讀取再套用，不會覆蓋彼此新增的帳號
+   * （每次失敗都代表其他寫入者已成功，因此一定會完成）
+   */
+  async updateDirectory(change) {
+    while (true) {
+      const stored = await StorageEngine.get(this.DIRECTORY_KEY);
+      const version = stored && !Array.isArray(stored) ? stored.version || 0 : 0;
+      const directory = this.decodeDirectory(stored);
+      change(directory);
+
+      const entries = [];
+      directory.forEach(({ id, role }, username) => {
+        entries.push([username, id, role]);
+      });
+      if (await StorageEngine.setIfVersion(this.DIRECTORY_KEY, { version: version + 1, entries }, version)) {
+        this.directoryCache = Promise.resolve(directory);
+        this.usernameIndex = null;
+        return directory;
+      }
+    }
+  },
+
+  /**
+   * 依註冊順序取得使用者 ID（可選擇只取特定角色），不需要讀取使用者資料
+   */
+  async getUserIds(role = null) {
+    const ids = [];
+    (await this.getDirectory()).forEach((entry) => {
+      if (!role || entry.role === role) ids.push(entry.id);
+    });
+    return ids;
+  },
+
+  /**
+   * 依據目錄項目載入使用者（可選擇只載入特定角色）
+   */
+  async loadUsers(role = null) {
+    return this.getUsersByIds(await this.getUserIds(role));
+  },
+
+  /**
+   * 依據 ID 載入多位使用者（略過找不到的使用者）
+   */
+  async getUsersByIds(ids) {
+    const users = await Promise.all(ids.map(id => this.getUserById(id)));
+    return users.filter(user => user);
+  },
+
+  /**
+   * 取得依帳號排序的目錄項目 [{ username, id, role }]
+   */
+  async getUsernameIndex() {
+    if (!this.usernameIndex) {
+      // 快取 Promise，避免同時呼叫時重複建立
+      this.usernameIndex = this.getDirectory().then(directory => {
+        const index = [];
+        directory.forEach(({ id, role }, username) => {
+          index.push({ username, id, role });
+        });
+        return index.sort((a, b) => (a.username < b.username ? -1 : a.username > b.username ? 1 : 0));
+      });
+    }
+    return this.usernameIndex;
+  },
+
+  /**
+   * 依帳號前綴搜尋使用者（二分搜尋，成本與使用者總數的對數成正比）
+   */
+  async searchUsernames(prefix, limit = 10, role = null) {
+    const index = await this.getUsernameIndex();
+
+    // 找出第一個不小於 prefix 的位置
+    let low = 0;
+    let high = index.length;
+    while (low < high) {
+      const mid = (low + high) >> 1;
+      if (index[mid].username < prefix) {
+        low = mid + 1;
+      } else {
+        high = mid;
+      }
+    }
+
+    const results = [];
+    for (let i = low; i < index.length && results.length < limit; i++) {
+      if (!index[i].username.startsWith(prefix)) break;
+      if (!role || index[i].role === role) results.push(index[i]);
+    }
+    return results;
+  },
+
   /**
    * 取得所有使用者
    */
   getAllUsers() {
-    const usersJson = localStorage.getItem(this.STORAGE_KEY);
-    return usersJson ? JSON.parse(usersJson) : [];
+    return this.loadUsers();
   },
 
   /**
-   * 儲存使用者資料
+   * 儲存使用者資料（只寫入該使用者的 key，帳號或角色變動時才更新目錄）
+   * 每次儲存都會遞增版本號
+   * 指定 expectedVersion 時，儲存的版本號不同（已被其他分頁或裝置更新）就不寫入並回傳 false
    */
-  saveUser(userData) {
-    const users = this.getAllUsers();
-    const existingIndex = users.findIndex(u => u.id === userData.id);
-    
-    if (existingIndex >= 0) {
-      users[existingIndex] = userData;
-    } else {
-      users.push(userData);
+  async saveUser(userData, expectedVersion = null) {
+    const directory = await this.getDirectory();
+    const previous = await this.getUserById(userData.id);
+    const entry = directory.get(userData.username);
+
+    userData.version = (userData.version || 0) + 1;
+    const key = this.getUserKey(userData.id);
+    if (expectedVersion === null) {
+      await StorageEngine.set(key, userData);
+    } else if (!(await StorageEngine.setIfVersion(key, userData, expectedVersion))) {
+      return false;
+    }
+    this.userCache.set(userData.id, userData);
+
+    if (!entry || entry.id !== userData.id || entry.role !== userData.role) {
+      await this.updateDirectory((latest) => {
+        // 帳號變更時移除舊的目錄項目
+        if (previous && previous.username !== userData.username) {
+          const previousEntry = latest.get(previous.username);
+          if (previousEntry && previousEntry.id === userData.id) latest.delete(previous.username);
+        }
+        latest.set(userData.username, { id: userData.id, role: userData.role });
+      });
+    }
+    return true;
+  },
+
+  /**
+   * 從儲存引擎讀取使用者，版本比快取新時更新快取
+   */
+  async loadLatestUser(userId) {
+    const stored = await StorageEngine.get(this.getUserKey(userId));
+    const cached = this.userCache.get(userId);
+    if (stored && (!cached || (stored.version || 0) > (cached.version || 0))) {
+      this.userCache.set(userId, stored);
+      return stored;
+    }
+    return cached;
+  },
+
+  /**
+   * 以最新版本的使用者資料執行變更並寫入
+   * 有 Web Locks 時以鎖序列化各分頁的變更；沒有時（或資料由多個瀏覽器共用時）寫入時比對版本，
+   * 被其他分頁或裝置搶先寫入就重試
+   * mutate(user) 修改傳入的使用者副本並回傳 { success, message }，成功寫入後副本取代快取
+   * ledgerType 不為 null 時，點數的差額以該類型記入帳本
+   */
+  async mutateUser(userId, mutate, ledgerType = null) {
+    const key = this.getUserKey(userId);
+    return RecordLock.run(this.USERS_LOCK, () => RecordLock.run(key, async () => {
+      for (let attempt = 0; attempt < this.MAX_RETRIES; attempt++) {
+        const latest = await this.loadLatestUser(userId);
+        if (!latest) {
+          return { success: false, message: '找不到使用者' };
+        }
+
+        await Ledger.ensureOpened(userId);
+        const baseVersion = latest.version || 0;
+        const user = { ...latest };
+        const result = mutate(user);
+        if (!result.success) return result;
+
+        // 鎖無法涵蓋所有寫入者時，寫入的同時比對版本號
+        const lockCoversWriters = RecordLock.isSupported() && !StorageEngine.isShared();
+        if (!(await this.saveUser(user, lockCoversWriters ? null : baseVersion))) continue;
+        if (ledgerType && user.points !== latest.points) {
+          Ledger.append(userId, ledgerType, { points: user.points - latest.points });
+        }
+        await this.publishPointsChanges([user], this.onlyPointsChanged(latest, user));
+        return { ...result, user };
+      }
+      return { success: false, message: '資料正在被其他分頁更新，請稍後再試' };
+    }), 'shared');
+  },
+
+  /**
+   * 變更前後除了點數與版本號之外的欄位是否都相同
+   */
+  onlyPointsChanged(before, after) {
+    const keys = new Set([...Object.keys(before), ...Object.keys(after)]);
+    return [...keys].every(key => key === 'points' || key === 'version' || before[key] === after[key]);
+  },
+
+  /**
+   * 通知其他分頁點數已變更，並更新當前使用者資料
+   * pointsOnly 為 false 代表還變更了其他欄位（例如最後登入時間），其他分頁需要重新讀取
+   */
+  async publishPointsChanges(users, pointsOnly = true) {
+    ChangeBus.publish('pointsChanged', {
+      changes: users.map(user => [user.id, user.points, user.version, pointsOnly])
+    });
+
+    const currentUser = await this.getCurrentUser();
+    if (currentUser && users.some(user => user.id === currentUser.id)) {
+      await this.setCurrentUser(currentUser);
     }
-    
-    localStorage.setItem(this.STORAGE_KEY, JSON.stringify(users));
   },
 
   /**
    * 依據帳號取得使用者
    */
-  getUserByUsername(username) {
-    const users = this.getAllUsers();
-    return users.find(u => u.username === username);
+  async getUserByUsername(username) {
+    const entry = (await this.getDirectory()).get(username);
+    return entry ? this.getUserById(entry.id) : undefined;
   },
 
   /**
    * 依據 ID 取得使用者
    */
-  getUserById(id) {
-    const users = this.getAllUsers();
-    return users.find(u => u.id === id);
+  async getUserById(id) {
+    if (!this.userCache.has(id)) {
+      const user = await StorageEngine.get(this.getUserKey(id));
+      if (!user) return undefined;
+      // 讀取期間可能已有其他呼叫寫入快取，以快取為準
+      if (!this.userCache.has(id)) {
+        this.userCache.set(id, user);
+      }
+    }
+    return this.userCache.get(id);
   },
 
   /**
    * 註冊新使用者
    */
-  register(username, password) {
+  async register(username, password) {
+    this.refreshSharedDirectory();
+    await this.ensureDefaultAdmin();
+
     // 驗證帳號是否已存在
-    if (this.getUserByUsername(username)) {
+    if (await this.getUserByUsername(username)) {
       return { success: false, message: '此帳號已被註冊' };
     }
 
@@ -105,15 +417,18 @@ const UserManager = {
       lastLogin: null
     };
 
-    this.saveUser(newUser);
+    await this.saveUser(newUser);
     return { success: true, message: '註冊成功' };
   },
 
   /**
    * 使用者登入
    */
-  login(username, password) {
-    const user = this.getUserByUsername(username);
+  async login(username, password) {
+    this.refreshSharedDirectory();
+    await this.ensureDefaultAdmin();
+    const entry = (await this.getDirectory()).get(username);
+    const user = entry ? await this.loadLatestUser(entry.id) : undefined;
 
     if (!user) {
       return { success: false, message: '帳號或密碼錯誤' };
@@ -123,29 +438,40 @@ const UserManager = {
       return { success: false, message: '帳號或密碼錯誤' };
     }
 
-    // 更新最後登入時間
-    user.lastLogin = new Date().toISOString();
-    this.saveUser(user);
+    // 以最新的使用者資料更新最後登入時間，不覆蓋其他分頁或裝置同時的變更（例如指派點數）
+    const result = await this.mutateUser(user.id, (latest) => {
+      latest.lastLogin = new Date().toISOString();
+      return { success: true, message: '登入成功' };
+    });
+    if (!result.success) return result;
 
     // 儲存當前登入使用者
-    this.setCurrentUser(user);
+    await this.setCurrentUser(result.user);
 
-    return { success: true, message: '登入成功', user: user };
+    return { success: true, message: '登入成功', user: result.user };
   },
 
   /**
    * 使用者登出
    */
-  logout() {
-    localStorage.removeItem(this.CURRENT_USER_KEY);
+  async logout() {
+    this.currentUserIdCache = null;
+    await StorageEngine.remove(this.CURRENT_USER_KEY);
   },
 
   /**
    * 設定當前登入使用者
    */
-  setCurrentUser(user) {
-    // 移除敏感資訊
-    const safeUser = {
+  async setCurrentUser(user) {
+    this.currentUserIdCache = user.id;
+    await StorageEngine.set(this.CURRENT_USER_KEY, this.toSafeUser(user));
+  },
+
+  /**
+   * 移除敏感資訊，作為當前使用者資料儲存
+   */
+  toSafeUser(user) {
+    return {
       id: user.id,
       username: user.username,
       role: user.role,
@@ -153,86 +479,196 @@ const UserManager = {
       createdAt: user.createdAt,
       lastLogin: user.lastLogin
     };
-    localStorage.setItem(this.CURRENT_USER_KEY, JSON.stringify(safeUser));
   },
 
   /**
    * 取得當前登入使用者
    */
-  getCurrentUser() {
-    const userJson = localStorage.getItem(this.CURRENT_USER_KEY);
-    if (!userJson) return null;
-    
-    const currentUser = JSON.parse(userJson);
+  async getCurrentUser() {
+    if (this.currentUserIdCache === undefined) {
+      const currentUser = await StorageEngine.get(this.CURRENT_USER_KEY);
+      this.currentUserIdCache = currentUser ? currentUser.id : null;
+    }
+    if (!this.currentUserIdCache) return null;
+
     // 從資料庫取得最新資料
-    return this.getUserById(currentUser.id);
+    return (await this.getUserById(this.currentUserIdCache)) || null;
   },
 
   /**
    * 檢查是否已登入
    */
-  isLoggedIn() {
-    return this.getCurrentUser() !== null;
+  async isLoggedIn() {
+    return (await this.getCurrentUser()) !== null;
   },
 
   /**
    * 檢查當前使用者是否為管理員
    */
-  isAdmin() {
-    const user = this.getCurrentUser();
+  async isAdmin() {
+    const user = await this.getCurrentUser();
     return user && user.role === 'admin';
   },
 
   /**
-   * 更新使用者點數
+   * 將使用者點數設定為指定值
    */
   updatePoints(userId, points) {
-    const user = this.getUserById(userId);
-    if (!user) {
-      return { success: false, message: '找不到使用者' };
+    return this.mutateUser(userId, (user) => {
+      if (points < 0) {
+        return { success: false, message: '點數不能為負數' };
+      }
+      user.points = points;
+      return { success: true, message: '點數更新成功' };
+    }, 'adjust');
+  },
+
+  /**
+   * 增加（或以負數扣除）使用者點數，以最新的點數計算，不會覆蓋其他分頁的變更
+   * ledgerType 為記入帳本的類型（null 代表由呼叫端自行記帳，例如購買牧草）
+   */
+  addPoints(userId, delta, { insufficientMessage = '點數不能為負數', ledgerType = 'credit' } = {}) {
+    return this.mutateUser(userId, (user) => {
+      if (user.points + delta < 0) {
+        return { success: false, message: insufficientMessage };
+      }
+      user.points += delta;
+      return { success: true, message: '點數更新成功' };
+    }, ledgerType);
+  },
+
+  /**
+   * 批次增加多位使用者的點數，所有變更在一次寫入中完成
+   * credits: [{ userId, delta }]，同一位使用者出現多次時會合併
+   * 找不到的使用者或結果為負數的項目會被略過並列在 failed 中
+   * 執行期間以獨占模式持有使用者鎖與帳本期初快照鎖，其他分頁的單一使用者變更會等待
+   */
+  applyPointCredits(credits) {
+    return RecordLock.run(this.USERS_LOCK, () => (
+      RecordLock.run(Ledger.OPEN_LOCK, () => this.commitPointCredits(credits))
+    ));
+  },
+
+  /**
+   * 以最新版本的使用者資料計算批次點數並一次寫入
+   * 鎖無法涵蓋所有寫入者時（沒有 Web Locks 或資料由多個瀏覽器共用），使用者資料逐筆比對版本寫入，
+   * 被搶先寫入的使用者重新讀取後重試
+   */
+  async commitPointCredits(credits) {
+    const deltas = new Map();
+    credits.forEach(({ userId, delta }) => {
+      deltas.set(userId, (deltas.get(userId) || 0) + delta);
+    });
+
+    const checkVersions = !RecordLock.isSupported() || StorageEngine.isShared();
+    const updated = [];
+    const failed = [];
+    let remaining = Array.from(deltas);
+    for (let attempt = 0; remaining.length > 0; attempt++) {
+      if (attempt === this.MAX_RETRIES) {
+        remaining.forEach(([userId]) => {
+          failed.push({ userId, message: '資料正在被其他分頁更新，請稍後再試' });
+        });
+        break;
+      }
+
+      const changes = []; // [最新的使用者資料, 更新後的副本, 差額]
+      for (const [userId, delta] of remaining) {
+        const user = await this.loadLatestUser(userId);
+        if (!user) {
+          failed.push({ userId, message: '找不到使用者' });
+          continue;
+        }
+        if (user.points + delta < 0) {
+          failed.push({ userId, message: '點數不能為負數' });
+          continue;
+        }
+        // 修改副本，寫入成功後才取代快取
+        changes.push([user, { ...user, points: user.points + delta, version: (user.version || 0) + 1 }, delta]);
+      }
+
+      const saved = await this.writePointCredits(changes, checkVersions);
+      updated.push(...saved);
+      remaining = changes
+        .filter(([, updatedUser]) => !saved.includes(updatedUser))
+        .map(([user, , delta]) => [user.id, delta]);
     }
 
-    if (points < 0) {
-      return { success: false, message: '點數不能為負數' };
+    if (updated.length > 0) {
+      ChangeBus.publish('pointsChanged', {
+        changes: updated.map(user => [user.id, user.points, user.version, true])
+      });
     }
 
-    user.points = points;
-    this.saveUser(user);
+    return {
+      success: updated.length > 0,
+      message: `成功更新 ${updated.length} 位使用者的點數`,
+      updated,
+      failed
+    };
+  },
 
-    // 如果是當前使用者，更新當前使用者資料
-    const currentUser = this.getCurrentUser();
-    if (currentUser && currentUser.id === userId) {
-      this.setCurrentUser(user);
+  /**
+   * 寫入批次點數，回傳成功寫入的使用者
+   * 使用者資料、帳本期初快照與交易、當前使用者資料在同一次寫入中完成；
+   * checkVersions 為 true 時使用者資料先比對版本寫入，只有寫入成功的使用者記入帳本
+   */
+  async writePointCredits(changes, checkVersions) {
+    let saved = changes;
+    const entries = [];
+    if (checkVersions) {
+      // 遠端引擎會將同時發出的比對寫入合併成一個請求
+      const results = await Promise.all(changes.map(([user, updatedUser]) => (
+        StorageEngine.setIfVersion(this.getUserKey(user.id), updatedUser, user.version || 0)
+      )));
+      saved = changes.filter((change, index) => results[index]);
+    } else {
+      saved.forEach(([user, updatedUser]) => entries.push([this.getUserKey(user.id), updatedUser]));
+    }
+    entries.push(...await Ledger.createOpeningEntries(saved.map(([user]) => user)));
+    saved.forEach(([user, , delta]) => {
+      entries.push(Ledger.createEntry(user.id, 'credit', { points: delta }));
+    });
+
+    // 如果包含當前使用者，一併更新當前使用者資料
+    const currentUser = await this.getCurrentUser();
+    const updatedCurrentUser = currentUser && saved.find(([user]) => user.id === currentUser.id);
+    if (updatedCurrentUser) {
+      entries.push([this.CURRENT_USER_KEY, this.toSafeUser(updatedCurrentUser[1])]);
     }
 
-    return { success: true, message: '點數更新成功' };
+    if (entries.length > 0) {
+      await StorageEngine.setMany(entries);
+    }
+    Ledger.markOpened(saved.map(([user]) => user.id));
+    saved.forEach(([, updatedUser]) => this.userCache.set(updatedUser.id, updatedUser));
+    return saved.map(([, updatedUser]) => updatedUser);
   },
 
   /**
-   * 取得所有一般使用者（排除管理員）
+   * 套用其他分頁發送的點數變更（只更新已快取且版本較舊的使用者）
+   * 只有緊接在快取之後、且只變更點數的版本可以直接套用；
+   * 中間漏了版本或變更了其他欄位時，讓快取失效，下次從儲存引擎讀取
    */
-  getRegularUsers() {
-    const users = this.getAllUsers();
-    return users.filter(u => u.role === 'user');
+  applyPointsChanges(changes) {
+    changes.forEach(([userId, points, version, pointsOnly]) => {
+      const user = this.userCache.get(userId);
+      if (!user) return;
+      const cachedVersion = user.version || 0;
+      if (version <= cachedVersion) return;
+      if (pointsOnly && version === cachedVersion + 1) {
+        user.points = points;
+        user.version = version;
+      } else {
+        this.userCache.delete(userId);
+      }
+    });
   },
 
   /**
-   * 格式化日期時間
+   * 格式化日期時間（與管理員查詢引擎共用同一個格式器）
    */
   formatDateTime(isoString) {
-    if (!isoString) return '尚未登入';
-    const date = new Date(isoString);
-    return date.toLocaleString('zh-TW', {
-      year: 'numeric',
-      month: '2-digit',
-      day: '2-digit',
-      hour: '2-digit',
-      minute: '2-digit',
-      second: '2-digit',
-      hour12: false
-    });
+    return UserQuery.formatDateTime(isoString);
   }
 };
-
-// 初始化系統
-UserManager.init();
@@ -0,0 +1,182 @@
+/**
+ * 使用者選擇器模組
+ * 以帳號前綴搜尋取代列出所有使用者的下拉選單
+ *
+ * 每個選擇器由文字輸入框、存放使用者 ID 的隱藏欄位與候選清單組成，
+ * 輸入時透過 UserManager.searchUsernames 搜尋，只建立少量候選項目。
+ */
+
+import { UserManager } from './user-manager.js';
+
+export const UserPicker = {
+  MAX_RESULTS: 8, // 候選清單最多顯示的數量
+
+  /**
+   * 建立選擇器
+   * root 需包含 input[type=text]、input[type=hidden] 與 .user-picker-results
+   * describe(user) 回傳候選項目顯示的文字（可為 async）
+   */
+  create(root, describe = (user) => user.username) {
+    const picker = {
+      root,
+      describe,
+      input: root.querySelector('input[type="text"]'),
+      valueInput: root.querySelector('input[type="hidden"]'),
+      list: root.querySelector('.user-picker-results'),
+      results: [],
+      itemsById: new Map(), // 使用者 id → 候選項目元素
+      activeIndex: -1,
+      query: null // 目前顯示結果對應的搜尋字串
+    };
+
+    picker.input.addEventListener('input', () => {
+      // 修改文字後需要重新選擇
+      picker.valueInput.value = '';
+      this.search(picker);
+    });
+    picker.input.addEventListener('keydown', (e) => {
+      this.handleKeydown(picker, e);
+    });
+    picker.input.addEventListener('blur', () => {
+      this.close(picker);
+    });
+    // 使用 mousedown 以便在輸入框失去焦點前完成選擇
+    picker.list.addEventListener('mousedown', (e) => {
+      const item = e.target.closest('.user-picker-result');
+      if (item) {
+        e.preventDefault();
+        this.select(picker, parseInt(item.dataset.index));
+      }
+    });
+
+    return picker;
+  },
+
+  /**
+   * 取得目前選擇的使用者 ID（未選擇時為空字串）
+   */
+  getValue(picker) {
+    return picker.valueInput.value;
+  },
+
+  /**
+   * 清除選擇與搜尋文字
+   */
+  clear(picker) {
+    picker.input.value = '';
+    picker.valueInput.value = '';
+    this.close(picker);
+  },
+
+  /**
+   * 依輸入文字搜尋並顯示候選清單
+   */
+  async search(picker) {
+    const query = picker.input.value.trim();
+    picker.query = query;
+    if (!query) {
+      this.close(picker);
+      return;
+    }
+
+    const users = await UserManager.searchUsernames(query, this.MAX_RESULTS, 'user');
+    const labels = await Promise.all(users.map(user => picker.describe(user)));
+    // 等待期間輸入已改變時捨棄結果
+    if (picker.query !== query) return;
+
+    picker.results = users;
+    picker.activeIndex = users.length > 0 ? 0 : -1;
+    this.renderResults(picker, labels);
+  },
+
+  /**
+   * 繪製候選清單
+   */
+  renderResults(picker, labels) {
+    picker.list.innerHTML = '';
+    picker.itemsById.clear();
+    if (picker.results.length === 0) {
+      const empty = document.createElement('li');
+      empty.className = 'user-picker-empty';
+      empty.textContent = '找不到符合的使用者';
+      picker.list.appendChild(empty);
+    }
+    picker.results.forEach((user, index) => {
+      const item = document.createElement('li');
+      item.className = 'user-picker-result';
+      item.dataset.index = index;
+      item.dataset.userId = user.id;
+      item.textContent = labels[index];
+      picker.itemsById.set(user.id, item);
+      picker.list.appendChild(item);
+    });
+    this.highlight(picker);
+    picker.list.classList.add('open');
+  },
+
+  /**
+   * 標示鍵盤選取中的候選項目
+   */
+  highlight(picker) {
+    Array.from(picker.list.children).forEach((item, index) => {
+      item.classList.toggle('active', index === picker.activeIndex);
+    });
+  },
+
+  /**
+   * 更新單一使用者的候選項目文字（不在候選清單中時不需要處理）
+   */
+  updateLabel(picker, userId, label) {
+    const item = picker.itemsById.get(userId);
+    if (item) {
+      item.textContent = label;
+    }
+  },
+
+  /**
+   * 處理方向鍵、Enter 與 Esc
+   */
+  handleKeydown(picker, e) {
+    if (!picker.list.classList.contains('open')) return;
+
+    if (e.key === 'ArrowDown' || e.key === 'ArrowUp') {
+      e.preventDefault();
+      const count = picker.results.length;
+      if (count === 0) return;
+      const step = e.key === 'ArrowDown' ? 1 : -1;
+      picker.activeIndex = (picker.activeIndex + step + count) % count;
+      this.highlight(picker);
+    } else if (e.key === 'Enter') {
+      // 避免在選擇時送出表單
+      e.preventDefault();
+      if (picker.activeIndex >= 0) {
+        this.select(picker, picker.activeIndex);
+      }
+    } else if (e.key === 'Escape') {
+      this.close(picker);
+    }
+  },
+
+  /**
+   * 選擇候選項目
+   */
+  select(picker, index) {
+    const user = picker.results[index];
+    if (!user) return;
+    picker.input.value = user.username;
+    picker.valueInput.value = user.id;
+    this.close(picker);
+  },
+
+  /**
+   * 關閉候選清單
+   */
+  close(picker) {
+    picker.query = null;
+    picker.results = [];
+    picker.itemsById.clear();
+    picker.activeIndex = -1;
+    picker.list.classList.remove('open');
+    picker.list.innerHTML = '';
+  }
+};
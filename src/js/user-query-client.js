@@ -0,0 +1,124 @@
+/**
+ * 使用者查詢用戶端
+ * 將查詢送到 Web Worker 執行；瀏覽器不支援或 Worker 無法啟動時改在主執行緒執行
+ * Worker 完成的資料變更（load、update、updateMany）也套用到主執行緒的 UserQuery，
+ * Worker 中途發生錯誤時，主執行緒已有相同的資料，不需要重新載入就能繼續查詢
+ * 所有方法都回傳 Promise
+ */
+
+import { UserQuery } from './user-query.js';
+
+export const UserQueryClient = {
+  WORKER_URL: new URL('./user-query-worker.js', import.meta.url),
+  DATA_METHODS: new Set(['load', 'update', 'updateMany']), // 會變更資料的方法
+  worker: null,
+  nextRequestId: 1,
+  pending: new Map(), // 請求 id → { method, args, resolve, reject }
+
+  /**
+   * 啟動 Worker（失敗時使用主執行緒）
+   */
+  init() {
+    if (typeof Worker !== 'function') return;
+
+    try {
+      // 不支援 module worker 的瀏覽器會以一般腳本載入而失敗，由 onerror 改用主執行緒
+      this.worker = new Worker(this.WORKER_URL, { type: 'module' });
+    } catch (error) {
+      console.warn('無法啟動使用者查詢 Worker，改用主執行緒：', error);
+      return;
+    }
+
+    this.worker.onmessage = (e) => {
+      const { id, result, error } = e.data;
+      const request = this.pending.get(id);
+      if (!request) return;
+      this.pending.delete(id);
+      if (error) {
+        request.reject(new Error(error));
+      } else {
+        // 篩選與排序只在 Worker 執行，主執行緒只保存資料
+        if (this.DATA_METHODS.has(request.method)) {
+          UserQuery[request.method](...request.args);
+        }
+        request.resolve(result);
+      }
+    };
+
+    this.worker.onerror = (e) => {
+      console.warn('使用者查詢 Worker 發生錯誤，改用主執行緒：', e.message);
+      this.fallbackToMainThread();
+    };
+  },
+
+  /**
+   * 停用 Worker，依序在主執行緒重新執行尚未完成的請求
+   * （主執行緒的 UserQuery 已有 Worker 完成的資料變更）
+   */
+  fallbackToMainThread() {
+    this.worker.terminate();
+    this.worker = null;
+
+    const requests = Array.from(this.pending.values());
+    this.pending.clear();
+    requests.forEach(({ method, args, resolve, reject }) => {
+      this.call(method, args).then(resolve, reject);
+    });
+  },
+
+  /**
+   * 呼叫 UserQuery 的方法
+   */
+  call(method, args) {
+    if (!this.worker) {
+      return new Promise(resolve => resolve(UserQuery[method](...args)));
+    }
+
+    return new Promise((resolve, reject) => {
+      const id = this.nextRequestId++;
+      this.pending.set(id, { method, args, resolve, reject });
+      this.worker.postMessage({ id, method, args });
+    });
+  },
+
+  /**
+   * 只保留查詢需要的欄位（不傳送密碼）
+   */
+  toRecord(user) {
+    return {
+      id: user.id,
+      username: user.username,
+      points: user.points,
+      createdAt: user.createdAt,
+      lastLogin: user.lastLogin
+    };
+  },
+
+  /**
+   * 載入使用者資料
+   */
+  load(users) {
+    return this.call('load', [users.map(user => this.toRecord(user))]);
+  },
+
+  /**
+   * 新增或更新單一使用者
+   */
+  update(user) {
+    return this.call('update', [this.toRecord(user)]);
+  },
+
+  /**
+   * 新增或更新多位使用者
+   */
+  updateMany(users) {
+    return this.call('updateMany', [users.map(user => this.toRecord(user))]);
+  },
+
+  /**
+   * 分頁查詢（參數見 UserQuery.query）
+   */
+  query(params) {
+    return this.call('query', [params]);
+  }
+};
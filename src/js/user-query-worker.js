@@ -0,0 +1,17 @@
+/**
+ * 使用者查詢 Web Worker
+ * 在背景執行 UserQuery，避免大量使用者的篩選與排序阻塞畫面（以 module worker 載入）
+ *
+ * 訊息格式：{ id, method, args } → { id, result } 或 { id, error }
+ */
+
+import { UserQuery } from './user-query.js';
+
+self.onmessage = (e) => {
+  const { id, method, args } = e.data;
+  try {
+    self.postMessage({ id, result: UserQuery[method](...args) });
+  } catch (error) {
+    self.postMessage({ id, error: error.message });
+  }
+};
@@ -0,0 +1,136 @@
+/**
+ * 使用者查詢引擎
+ * 對管理員頁面的使用者資料做篩選、排序、統計與分頁，回傳已格式化的列
+ *
+ * 同一份程式同時在 Web Worker（user-query-worker.js）與主執行緒（不支援 Worker 時）執行，
+ * 因此不依賴 DOM 或其他模組。
+ * 相同條件的篩選與排序結果會被快取，換頁時只需切出對應的區段。
+ */
+
+export const UserQuery = {
+  users: [], // [{ id, username, points, createdAt, lastLogin }]
+  indexById: new Map(), // id → users 中的索引
+  resultCache: null, // { key, matches, totalPoints }
+  dateTimeFormat: null,
+
+  /**
+   * 載入使用者資料（取代既有資料）
+   */
+  load(users) {
+    this.users = users;
+    this.indexById = new Map(users.map((user, index) => [user.id, index]));
+    this.resultCache = null;
+    return users.length;
+  },
+
+  /**
+   * 新增或更新單一使用者
+   */
+  update(user) {
+    this.updateMany([user]);
+  },
+
+  /**
+   * 新增或更新多位使用者
+   */
+  updateMany(users) {
+    users.forEach(user => {
+      const index = this.indexById.get(user.id);
+      if (index === undefined) {
+        this.indexById.set(user.id, this.users.length);
+        this.users.push(user);
+      } else {
+        this.users[index] = user;
+      }
+    });
+    this.resultCache = null;
+  },
+
+  /**
+   * 分頁查詢
+   * params: { username, minPoints, maxPoints, sortBy, order, offset, limit }
+   * 回傳 { total, totalPoints, rows }，rows 的日期欄位已格式化
+   */
+  query(params = {}) {
+    const { offset = 0, limit = 50 } = params;
+    const { matches, totalPoints } = this.getMatches(params);
+
+    const rows = matches.slice(offset, offset + limit).map(user => ({
+      id: user.id,
+      username: user.username,
+      points: user.points,
+      createdAt: this.formatDateTime(user.createdAt),
+      lastLogin: this.formatDateTime(user.lastLogin)
+    }));
+
+    return { total: matches.length, totalPoints, rows };
+  },
+
+  /**
+   * 取得符合條件且已排序的使用者（相同條件時使用快取）
+   */
+  getMatches(params) {
+    const {
+      username = '',
+      minPoints = null,
+      maxPoints = null,
+      sortBy = 'createdAt',
+      order = 'asc'
+    } = params;
+    const key = JSON.stringify([username, minPoints, maxPoints, sortBy, order]);
+    if (this.resultCache && this.resultCache.key === key) {
+      return this.resultCache;
+    }
+
+    const keyword = username.toLowerCase();
+    let totalPoints = 0;
+    const matches = this.users.filter(user => {
+      if (keyword && !user.username.toLowerCase().includes(keyword)) return false;
+      if (minPoints !== null && user.points < minPoints) return false;
+      if (maxPoints !== null && user.points > maxPoints) return false;
+      totalPoints += user.points;
+      return true;
+    });
+
+    const direction = order === 'desc' ? -1 : 1;
+    const sortValue = this.getSortValue(sortBy);
+    matches.sort((a, b) => {
+      const diff = sortValue(a) - sortValue(b);
+      if (diff !== 0) return diff * direction;
+      // 相同時依帳號排序，確保分頁結果穩定
+      return a.username < b.username ? -1 : a.username > b.username ? 1 : 0;
+    });
+
+    this.resultCache = { key, matches, totalPoints };
+    return this.resultCache;
+  },
+
+  /**
+   * 取得排序欄位的數值（日期轉為時間戳記，沒有登入記錄視為最早）
+   */
+  getSortValue(sortBy) {
+    if (sortBy === 'points') {
+      return user => user.points;
+    }
+    return user => (user[sortBy] ? Date.parse(user[sortBy]) : 0);
+  },
+
+  /**
+   * 格式化日期時間（重複使用同一個 Intl.DateTimeFormat）
+   */
+  formatDateTime(isoString) {
+    if (!isoString) return '尚未登入';
+    if (!this.dateTimeFormat) {
+      this.dateTimeFormat = new Intl.DateTimeFormat('zh-TW', {
+        year: 'numeric',
+        month: '2-digit',
+        day: '2-digit',
+        hour: '2-digit',
+        minute: '2-digit',
+        second: '2-digit',
+        hour12: false
+      });
+    }
+    return this.dateTimeFormat.format(new Date(isoString));
+  }
+};
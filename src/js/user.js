@@ -2,8 +2,15 @@
  * 一般使用者介面處理模組
  */
 
-const UserPage = {
-  timerInterval: null, // 儲存計時器間隔 ID
+import { ChangeBus } from './change-bus.js';
+import { UserManager } from './user-manager.js';
+import { GameManager } from './game.js';
+import { Auth } from './auth.js';
+import { HerdView } from './herd-view.js';
+import { TickEngine } from './tick-engine.js';
+
+export const UserPage = {
+  renderedText: new Map(), // 元素 → 最後繪製的文字
 
   /**
    * 初始化使用者頁面
@@ -12,6 +19,18 @@ const UserPage = {
     this.userPage = document.getElementById('user-page');
     this.gameView = document.getElementById('game-view');
     this.statusView = document.getElementById('status-view');
+    TickEngine.init();
+
+    // 只查詢一次需要更新的元素
+    this.elements = {
+      username: document.getElementById('user-username'),
+      points: document.getElementById('user-points'),
+      account: document.getElementById('user-account'),
+      created: document.getElementById('user-created'),
+      lastLogin: document.getElementById('user-last-login'),
+      gamePoints: document.getElementById('game-points'),
+      gameGrass: document.getElementById('game-grass')
+    };
 
     // 綁定登出按鈕
     document.getElementById('user-logout').addEventListener('click', () => {
@@ -33,8 +52,18 @@ const UserPage = {
       this.handleBuyGrass();
     });
 
-    // 綁定乳牛點擊事件
+    // 綁定全部餵飽按鈕
+    document.getElementById('feed-all-btn').addEventListener('click', () => {
+      this.handleFeedAll();
+    });
+
+    // 其他分頁變更點數或牛群時立即重新繪製（資料已由訊息更新到快取）
+    ChangeBus.subscribe('pointsChanged', () => TickEngine.renderNow());
+    ChangeBus.subscribe('herdChanged', () => TickEngine.renderNow());
+
+    // 綁定乳牛點擊事件（乳牛節點由 HerdView 動態建立，事件委派在容器上）
     const cattleContainer = document.getElementById('cattle-container');
+    HerdView.init(cattleContainer);
     cattleContainer.addEventListener('click', (e) => {
       const cattleItem = e.target.closest('.cattle-item');
       if (cattleItem) {
@@ -47,8 +76,8 @@ const UserPage = {
   /**
    * 顯示使用者頁面
    */
-  show() {
-    const user = UserManager.getCurrentUser();
+  async show() {
+    const user = await UserManager.getCurrentUser();
     if (!user) {
       this.redirectToAuth();
       return;
@@ -58,19 +87,22 @@ const UserPage = {
     this.userPage.classList.add('active');
 
     // 初始化遊戲數據
-    GameManager.initGameData(user.id);
+    await GameManager.initGameData(user.id);
 
     // 更新使用者資訊
     this.updateUserInfo(user);
 
     // 更新遊戲資訊
-    this.updateGameInfo(user.id);
+    await this.updateGameInfo(user.id);
 
     // 顯示遊戲視圖
     this.showGameView();
 
     // 開始更新計時器
     this.startTimerUpdates(user.id);
+
+    // 乳牛到期時重新繪製（分頁隱藏時等到重新顯示再補繪）
+    await GameManager.watchExpirations(user.id, () => TickEngine.renderNow());
   },
 
   /**
@@ -80,6 +112,7 @@ const UserPage = {
     this.userPage.classList.remove('active');
     // 停止計時器更新
     this.stopTimerUpdates();
+    GameManager.stopWatchingExpirations();
   },
 
   /**
@@ -93,38 +126,48 @@ const UserPage = {
   /**
    * 顯示狀態視圖
    */
-  showStatusView() {
+  async showStatusView() {
     this.gameView.classList.add('hidden');
     this.statusView.classList.remove('hidden');
     
     // 更新狀態頁面的資料
-    const user = UserManager.getCurrentUser();
+    const user = await UserManager.getCurrentUser();
     if (user) {
       this.updateUserInfo(user);
     }
   },
 
+  /**
+   * 設定元素文字，與上次繪製的值相同時不變動 DOM
+   */
+  setText(element, value) {
+    const text = String(value);
+    if (this.renderedText.get(element) === text) return;
+    this.renderedText.set(element, text);
+    element.textContent = text;
+  },
+
   /**
    * 更新使用者資訊
    */
   updateUserInfo(user) {
     // 更新使用者名稱
-    document.getElementById('user-username').textContent = user.username;
+    this.setText(this.elements.username, user.username);
 
     // 更新點數
-    document.getElementById('user-points').textContent = user.points;
+    this.setText(this.elements.points, user.points);
 
     // 更新帳號資訊
-    document.getElementById('user-account').textContent = user.username;
-    document.getElementById('user-created').textContent = UserManager.formatDateTime(user.createdAt);
-    document.getElementById('user-last-login').textContent = UserManager.formatDateTime(user.lastLogin);
+    this.setText(this.elements.account, user.username);
+    this.setText(this.elements.created, UserManager.formatDateTime(user.createdAt));
+    this.setText(this.elements.lastLogin, UserManager.formatDateTime(user.lastLogin));
   },
 
   /**
    * 處理登出
    */
-  handleLogout() {
-    UserManager.logout();
+  async handleLogout() {
+    await UserManager.logout();
     this.hide();
     
     // 確保隱藏管理員頁面
@@ -146,63 +189,41 @@ const UserPage = {
   /**
    * 更新遊戲資訊
    */
-  updateGameInfo(userId) {
-    const user = UserManager.getUserById(userId);
-    const gameData = GameManager.updateCattleTimers(userId);
-
-    // 更新資源顯示
-    document.getElementById('game-points').textContent = user.points;
-    document.getElementById('game-grass').textContent = gameData ? gameData.grass : 0;
-
-    // 更新乳牛狀態和計時器
-    if (gameData && gameData.cattle) {
-      gameData.cattle.forEach(cattle => {
-        const hungerElement = document.getElementById(`cattle-${cattle.id}-hunger`);
-        if (hungerElement) {
-          hungerElement.textContent = cattle.hunger;
-        }
-
-        const timerElement = document.getElementById(`cattle-${cattle.id}-timer`);
-        if (timerElement) {
-          const remainingTime = GameManager.getCattleRemainingTime(cattle);
-          if (remainingTime !== null && cattle.hunger > 0) {
-            timerElement.textContent = remainingTime;
-          } else {
-            timerElement.textContent = '--';
-          }
-        }
-      });
+  async updateGameInfo(userId) {
+    const user = await UserManager.getUserById(userId);
+    const gameData = await GameManager.getGameData(userId);
+
+    // 更新資源顯示（數值未變時不變動 DOM）
+    this.setText(this.elements.gamePoints, user.points);
+    this.setText(this.elements.gameGrass, gameData ? gameData.grass : 0);
+
+    // 更新乳牛狀態和計時器（只更新數值有變化的乳牛節點）
+    if (gameData) {
+      HerdView.setHerd(gameData.herd);
     }
   },
 
   /**
-   * 開始更新計時器
+   * 開始更新計時器（每秒對齊整秒更新，分頁隱藏時暫停）
    */
   startTimerUpdates(userId) {
-    // 清除現有的計時器
-    this.stopTimerUpdates();
-    
-    // 每秒更新一次
-    this.timerInterval = setInterval(() => {
+    TickEngine.start(() => {
       this.updateGameInfo(userId);
-    }, 1000);
+    });
   },
 
   /**
    * 停止更新計時器
    */
   stopTimerUpdates() {
-    if (this.timerInterval) {
-      clearInterval(this.timerInterval);
-      this.timerInterval = null;
-    }
+    TickEngine.stop();
   },
 
   /**
    * 處理購買牧草
    */
-  handleBuyGrass() {
-    const user = UserManager.getCurrentUser();
+  async handleBuyGrass() {
+    const user = await UserManager.getCurrentUser();
     if (!user) return;
 
     const amountInput = document.getElementById('grass-amount');
@@ -213,13 +234,13 @@ const UserPage = {
       return;
     }
 
-    const result = GameManager.buyGrass(user.id, amount);
+    const result = await GameManager.buyGrass(user.id, amount);
     
     if (result.success) {
       this.showGameMessage(result.message, 'success');
-      this.updateGameInfo(user.id);
+      await this.updateGameInfo(user.id);
       // 同時更新狀態頁面的點數
-      document.getElementById('user-points').textContent = result.points;
+      this.setText(this.elements.points, result.points);
       amountInput.value = '1'; // 重置輸入
     } else {
       this.showGameMessage(result.message, 'error');
@@ -229,15 +250,37 @@ const UserPage = {
   /**
    * 處理餵養乳牛
    */
-  handleFeedCattle(cattleId) {
-    const user = UserManager.getCurrentUser();
+  async handleFeedCattle(cattleId) {
+    const user = await UserManager.getCurrentUser();
+    if (!user) return;
+
+    // 依選擇的次數一次餵完，只寫入與重新繪製一次
+    const feedCount = document.getElementById('feed-count').value;
+    const result = feedCount === 'full'
+      ? await GameManager.feedToFull(user.id, cattleId)
+      : await GameManager.feedCattle(user.id, cattleId, parseInt(feedCount));
+
+    await this.showFeedResult(user.id, result);
+  },
+
+  /**
+   * 處理全部餵飽
+   */
+  async handleFeedAll() {
+    const user = await UserManager.getCurrentUser();
     if (!user) return;
 
-    const result = GameManager.feedCattle(user.id, cattleId);
+    const result = await GameManager.feedAll(user.id);
+    await this.showFeedResult(user.id, result);
+  },
 
+  /**
+   * 顯示餵食結果，成功時重新繪製遊戲資訊
+   */
+  async showFeedResult(userId, result) {
     if (result.success) {
       this.showGameMessage(result.message, 'success');
-      this.updateGameInfo(user.id);
+      await this.updateGameInfo(userId);
     } else {
       this.showGameMessage(result.message, 'error');
     }
@@ -0,0 +1,125 @@
+/**
+ * 延遲寫入佇列模組
+ * 資料變更先套用在記憶體中，再合併成批次寫入儲存引擎
+ *
+ * 同一個 key 在下次寫入前的多次變更只會序列化一次。
+ * 寫入時機：下一個 requestAnimationFrame 之後的閒置時間（隱藏的分頁不會觸發 requestAnimationFrame，改用 setTimeout），
+ * 以及頁面隱藏或關閉（pagehide / visibilitychange）時立即寫入。
+ * 本分頁持有 key 的 RecordLock 時，尚未寫入期間保留鎖，寫入完成後才釋放。
+ * 寫入失敗時資料放回佇列（同一個 key 已有較新的資料則以新資料為準），稍後重試。
+ */
+
+import { StorageEngine } from './storage-engine.js';
+import { RecordLock } from './record-lock.js';
+
+export const WriteQueue = {
+  IDLE_TIMEOUT: 1000, // 閒置回呼最長等待時間（毫秒）
+  RETRY_DELAY: 1000, // 寫入失敗後重試的等待時間（毫秒）
+  pending: new Map(), // key → { value, encode, retained }（保留物件參考，寫入時才編碼與序列化）
+  scheduled: false,
+
+  /**
+   * 註冊頁面隱藏與關閉時的寫入
+   */
+  init() {
+    window.addEventListener('pagehide', () => {
+      this.flush();
+    });
+    document.addEventListener('visibilitychange', () => {
+      if (document.visibilityState === 'hidden') {
+        this.flush();
+      }
+    });
+  },
+
+  /**
+   * 加入待寫入資料，並排程批次寫入
+   * encode 為選用的編碼函式，在實際寫入時才呼叫
+   */
+  enqueue(key, value, encode = null) {
+    const previous = this.pending.get(key);
+    const retained = (previous && previous.retained) || RecordLock.retain(key);
+    this.pending.set(key, { value, encode, retained });
+    this.schedule();
+  },
+
+  /**
+   * 檢查 key 是否還有尚未寫入的資料
+   */
+  has(key) {
+    return this.pending.has(key);
+  },
+
+  /**
+   * 取出 key 符合條件、尚未寫入的資料，回傳 [key, { value, encode, retained }]
+   * 取出的資料由呼叫端自行寫入，並釋放保留的鎖
+   */
+  take(predicate) {
+    const taken = Array.from(this.pending).filter(([key]) => predicate(key));
+    taken.forEach(([key]) => this.pending.delete(key));
+    return taken;
+  },
+
+  /**
+   * 排程批次寫入：等到下一個畫面更新後的閒置時間
+   */
+  schedule() {
+    if (this.scheduled) return;
+    this.scheduled = true;
+
+    if (document.hidden) {
+      setTimeout(() => this.flush(), 0);
+      return;
+    }
+    requestAnimationFrame(() => {
+      if (typeof requestIdleCallback === 'function') {
+        requestIdleCallback(() => this.flush(), { timeout: this.IDLE_TIMEOUT });
+      } else {
+        setTimeout(() => this.flush(), 0);
+      }
+    });
+  },
+
+  /**
+   * 立即寫入所有待寫入資料
+   */
+  flush() {
+    this.scheduled = false;
+    if (this.pending.size === 0) return Promise.resolve();
+
+    const entries = Array.from(this.pending);
+    this.pending.clear();
+
+    // 同步發出單一批次寫入，確保在 pagehide 事件中也能開始執行；編碼失敗也視為寫入失敗，不遺失資料與鎖
+    let write;
+    try {
+      write = StorageEngine.setMany(entries.map(([key, { value, encode }]) => (
+        [key, encode ? encode(value) : value]
+      )));
+    } catch (error) {
+      write = Promise.reject(error);
+    }
+    return write.then(() => {
+      entries.forEach(([key, { retained }]) => {
+        if (retained) RecordLock.release(key);
+      });
+    }, error => {
+      console.error('批次寫入失敗，稍後重試:', error);
+      this.requeue(entries);
+    });
+  },
+
+  /**
+   * 寫入失敗的資料放回佇列並重新排程；寫入期間已有較新資料的 key 不放回，釋放舊資料保留的鎖
+   */
+  requeue(entries) {
+    entries.forEach(([key, entry]) => {
+      if (!this.pending.has(key)) {
+        this.pending.set(key, entry);
+      } else if (entry.retained) {
+        RecordLock.release(key);
+      }
+    });
+    setTimeout(() => this.schedule(), this.RETRY_DELAY);
+  }
+};
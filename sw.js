@@ -0,0 +1,64 @@
+/**
+ * Service Worker：預先快取 App Shell，讓再次造訪與離線時不需要網路
+ *
+ * - 安裝時依 precache-manifest.js（由 scripts/build_precache.py 產生）下載所有檔案，
+ *   存入以清單版本命名的快取。
+ * - 請求 App Shell 的檔案時一律從快取回應（cache-first），導覽到 App 頁面（/ 或 index.html）時回應快取的 index.html；
+ *   其他導覽（例如直接開啟 /api/ 網址）交給網路。
+ * - 任何檔案內容改變時清單版本隨之改變，瀏覽器在背景安裝新版本；
+ *   舊版本的分頁全部關閉後新版本才啟用並刪除舊快取，同一個分頁不會混用新舊檔案。
+ */
+
+importScripts('precache-manifest.js');
+
+const CACHE_PREFIX = 'cattle-farm-shell-';
+const CACHE_NAME = CACHE_PREFIX + self.PRECACHE_VERSION;
+const SHELL_URL = new URL('./', self.registration.scope).href;
+const APP_PAGE_URLS = new Set([SHELL_URL, new URL('index.html', self.registration.scope).href]);
+const PRECACHED_URLS = new Set(
+  self.PRECACHE_MANIFEST.map(({ url }) => new URL(url, self.registration.scope).href)
+);
+
+self.addEventListener('install', (event) => {
+  event.waitUntil(
+    caches.open(CACHE_NAME).then(cache => cache.addAll(
+      // 略過 HTTP 快取，確保存入的是與清單版本一致的內容
+      self.PRECACHE_MANIFEST.map(({ url }) => new Request(url, { cache: 'reload' }))
+    ))
+  );
+});
+
+self.addEventListener('activate', (event) => {
+  event.waitUntil(
+    caches.keys().then(names => Promise.all(
+      names
+        .filter(name => name.startsWith(CACHE_PREFIX) && name !== CACHE_NAME)
+        .map(name => caches.delete(name))
+    ))
+  );
+});
+
+self.addEventListener('fetch', (event) => {
+  const { request } = event;
+  if (request.method !== 'GET') return;
+
+  const url = new URL(request.url);
+  url.search = '';
+  url.hash = '';
+  let cacheKey = null;
+  if (request.mode === 'navigate') {
+    if (APP_PAGE_URLS.has(url.href)) {
+      cacheKey = SHELL_URL;
+    }
+  } else if (PRECACHED_URLS.has(url.href)) {
+    cacheKey = url.href;
+  }
+  // 不在 App Shell 中的請求交給瀏覽器處理
+  if (!cacheKey) return;
+
+  event.respondWith(
+    caches.open(CACHE_NAME)
+      .then(cache => cache.match(cacheKey))
+      .then(response => response || fetch(request))
+  );
+});
@@ -3,26 +3,31 @@ Pytest 配置和共用 fixtures
 """
 
 import pytest
+import shutil
 import subprocess
+import tempfile
 import time
 import signal
 import os
 from playwright.sync_api import Page
-from test_helpers import clear_local_storage, wait_for_page_load
+from test_helpers import clear_local_storage, wait_for_page_load, VirtualClock
 
 
 # HTTP 伺服器進程
 http_server_process = None
+# 伺服器的 SQLite 資料庫目錄（每次執行測試都從空的資料庫開始）
+database_dir = None
 
 
 def pytest_configure(config):
     """Pytest 啟動時的配置"""
-    global http_server_process
+    global http_server_process, database_dir
     
-    # 啟動 Python HTTP 伺服器（指定工作目錄為專案根目錄）
+    # 啟動本機後端（靜態檔案與 JSON API，指定工作目錄為專案根目錄）
     print("\n🚀 啟動 HTTP 伺服器 (port 8000)...")
+    database_dir = tempfile.mkdtemp(prefix="cattle-farm-")
     http_server_process = subprocess.Popen(
-        ["python", "-m", "http.server", "8000"],
+        ["python", "-m", "server", "8000", "--db", os.path.join(database_dir, "test.sqlite3")],
         stdout=subprocess.DEVNULL,
         stderr=subprocess.DEVNULL,
         cwd=str(config.rootpath),  # 明確指定工作目錄
@@ -36,7 +41,7 @@ def pytest_configure(config):
 
 def pytest_unconfigure(config):
     """Pytest 結束時的清理"""
-    global http_server_process
+    global http_server_process, database_dir
     
     if http_server_process:
         print("\n🛑 關閉 HTTP 伺服器...")
@@ -50,6 +55,9 @@ def pytest_unconfigure(config):
         http_server_process.wait()
         print("✅ HTTP 伺服器已關閉\n")
 
+    if database_dir:
+        shutil.rmtree(database_dir, ignore_errors=True)
+
 
 @pytest.fixture(scope="function")
 def page_setup(page: Page):
@@ -70,3 +78,14 @@ def page_setup(page: Page):
     
     # 測試後清理（如果需要）
     pass
+
+
+@pytest.fixture(scope="function")
+def virtual_clock(page_setup: Page):
+    """將頁面切換為虛擬時鐘，測試以 advance 讓時間前進，不需要等待真實時間
+
+    在其他 fixture 完成登入與重新載入之後才安裝（重新載入頁面會回到系統時間）
+    """
+    clock = VirtualClock(page_setup).install()
+    yield clock
+    clock.uninstall()
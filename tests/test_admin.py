@@ -9,6 +9,7 @@ from test_helpers import (
     logout,
     expect_auth_page,
     expect_admin_page,
+    pick_user,
 )
 
 
@@ -43,5 +44,176 @@ class TestAdmin:
         # 應該返回登入頁面
         expect_auth_page(self.page)
         expect(self.page.locator("#login-form.active")).to_be_visible()
-    
 
+
+@pytest.mark.admin
+class TestAdminWithManyUsers:
+    """測試大量使用者時的管理員頁面"""
+
+    @pytest.fixture(autouse=True)
+    def setup_many_users(self, page_setup: Page):
+        """每個測試前直接建立 2000 個使用者，再以管理員身份登入"""
+        self.page = page_setup
+        self.page.evaluate("""
+            async () => {
+                await App.ready;
+                const directory = await StorageEngine.get(UserManager.DIRECTORY_KEY);
+                for (let i = 0; i < 2000; i++) {
+                    const user = {
+                        id: `bulk${i}`,
+                        username: `bulk${String(i).padStart(4, '0')}`,
+                        password: 'password123',
+                        role: 'user',
+                        points: i,
+                        createdAt: new Date().toISOString(),
+                        lastLogin: null
+                    };
+                    await StorageEngine.set(UserManager.getUserKey(user.id), user);
+                    directory.entries.push([user.username, user.id, user.role]);
+                }
+                directory.version += 1;
+                await StorageEngine.set(UserManager.DIRECTORY_KEY, directory);
+                UserManager.invalidateCache();
+            }
+        """)
+        login(self.page, "admin", "admin")
+        expect_admin_page(self.page)
+        yield
+
+    def test_only_visible_rows_are_rendered(self):
+        """使用者列表只應該為可視範圍建立表格列"""
+        rows = self.page.locator("#users-list .user-row")
+        expect(rows.first).to_contain_text("bulk0000")
+        assert 0 < rows.count() < 100, f"應該只繪製可視範圍的列，實際為 {rows.count()} 列"
+
+        self.page.evaluate("""
+            () => {
+                const list = document.getElementById('users-list');
+                list.scrollTop = list.scrollHeight;
+            }
+        """)
+        expect(self.page.locator('#users-list .user-row[data-user-id="bulk1999"]')).to_contain_text("bulk1999")
+
+    def test_users_are_loaded_in_chunks(self):
+        """使用者列表應該分批讀取使用者資料，最後仍列出所有使用者"""
+        result = self.page.evaluate("""
+            async () => {
+                const { AdminPage } = await import('/src/js/admin.js');
+                const sizes = [];
+                const original = UserManager.getUsersByIds;
+                UserManager.getUsersByIds = function (ids) {
+                    sizes.push(ids.length);
+                    return original.call(this, ids);
+                };
+                await AdminPage.loadUsersList();
+                UserManager.getUsersByIds = original;
+                return { sizes, chunk: AdminPage.USERS_LOAD_CHUNK };
+            }
+        """)
+        assert sum(result["sizes"]) == 2000
+        assert max(result["sizes"]) <= result["chunk"] < 2000
+        expect(self.page.locator("#users-summary")).to_contain_text("共 2000 位使用者")
+
+    def test_picker_searches_by_prefix(self):
+        """輸入帳號前綴應該只列出少量符合的使用者"""
+        self.page.fill("#target-user-search", "bulk19")
+        results = self.page.locator("#target-user-picker .user-picker-result")
+        expect(results.first).to_contain_text("bulk1900")
+        assert results.count() <= 8
+        for text in results.all_inner_texts():
+            assert text.startswith("bulk19")
+
+    def test_assign_points_with_picker(self):
+        """透過選擇器選擇使用者後應該能指派點數"""
+        pick_user(self.page, "target-user-picker", "bulk0005")
+        expect(self.page.locator("#target-user-search")).to_have_value("bulk0005")
+        self.page.fill("#points-amount", "10")
+        self.page.click('#assignPointsForm button[type="submit"]')
+        expect(self.page.locator("#admin-message.success")).to_contain_text("bulk0005")
+        expect(self.page.locator('#users-list .user-row[data-user-id="bulk5"] .points-cell')).to_have_text("15")
+
+    def test_queries_run_in_worker(self):
+        """使用者查詢應該在 Web Worker 中執行"""
+        assert self.page.evaluate("""
+            async () => {
+                const { UserQueryClient } = await import('/src/js/user-query-client.js');
+                return UserQueryClient.worker !== null;
+            }
+        """)
+
+    def test_worker_error_keeps_loaded_users(self):
+        """Worker 發生錯誤改用主執行緒後，查詢仍應該包含已載入的使用者"""
+        expect(self.page.locator("#users-summary")).to_contain_text("共 2000 位使用者")
+        result = self.page.evaluate("""
+            async () => {
+                const { UserQueryClient } = await import('/src/js/user-query-client.js');
+                UserQueryClient.worker.onerror({ message: 'test' });
+                const page = await UserQueryClient.query({ username: 'bulk19', offset: 0, limit: 5 });
+                return { usesWorker: UserQueryClient.worker !== null, total: page.total };
+            }
+        """)
+        assert result == {"usesWorker": False, "total": 100}
+
+    def test_filter_and_sort_users(self):
+        """應該能依點數範圍篩選並依點數排序"""
+        self.page.fill("#users-min-points", "1990")
+        self.page.select_option("#users-sort", "points:desc")
+        expect(self.page.locator("#users-summary")).to_contain_text("共 10 位使用者")
+        rows = self.page.locator("#users-list .user-row")
+        expect(rows).to_have_count(10)
+        expect(rows.first.locator(".username-cell")).to_have_text("bulk1999")
+        expect(rows.last.locator(".username-cell")).to_have_text("bulk1990")
+
+    def test_filter_without_matches_shows_message(self):
+        """沒有符合的使用者時應該顯示提示"""
+        self.page.fill("#users-filter", "nobody")
+        expect(self.page.locator("#users-list .no-users")).to_have_text("沒有符合條件的使用者")
+
+    def test_bulk_points_import(self):
+        """貼上 CSV 應該一次為多位使用者指派點數"""
+        self.page.fill("#bulk-points-input", "帳號,點數\nbulk0001,10\nbulk0002,20\nnobody,5")
+        self.page.click('#bulkPointsForm button[type="submit"]')
+        message = self.page.locator("#admin-message.success")
+        expect(message).to_contain_text("成功為 2 位使用者指派點數")
+        expect(message).to_contain_text("1 筆失敗")
+        expect(self.page.locator('#users-list .user-row[data-user-id="bulk1"] .points-cell')).to_have_text("11")
+        expect(self.page.locator('#users-list .user-row[data-user-id="bulk2"] .points-cell')).to_have_text("22")
+
+    def test_repeated_assignment_patches_only_changed_row(self):
+        """連續指派點數只應該更新該使用者的點數欄位與統計"""
+        pick_user(self.page, "target-user-picker", "bulk0003")
+        self.page.fill("#points-amount", "10")
+        self.page.click('#assignPointsForm button[type="submit"]')
+        points = self.page.locator('#users-list .user-row[data-user-id="bulk3"] .points-cell')
+        expect(points).to_have_text("13")
+
+        self.page.evaluate("""
+            () => {
+                window.__adminMutations = new Set();
+                window.__adminObserver = new MutationObserver(records => {
+                    records.forEach(record => {
+                        const target = record.target.nodeType === Node.TEXT_NODE
+                            ? record.target.parentElement
+                            : record.target;
+                        window.__adminMutations.add(target.closest('.user-row, #users-summary')?.dataset.userId || target.id);
+                    });
+                });
+                window.__adminObserver.observe(document.querySelector('.users-section'), {
+                    subtree: true, childList: true, characterData: true
+                });
+            }
+        """)
+
+        # 選擇保留，可直接再次指派
+        expect(self.page.locator("#target-user-search")).to_have_value("bulk0003")
+        self.page.fill("#points-amount", "5")
+        self.page.click('#assignPointsForm button[type="submit"]')
+        expect(points).to_have_text("18")
+
+        changed = self.page.evaluate("""
+            () => {
+                window.__adminObserver.disconnect();
+                return Array.from(window.__adminMutations).sort();
+            }
+        """)
+        assert changed == ["bulk3", "users-summary"]
@@ -103,17 +103,49 @@ def logout(page: Page) -> None:
     expect_auth_page(page)
 
 
+def pick_user(page: Page, picker_id: str, username: str) -> None:
+    """在管理員頁面的使用者選擇器中搜尋並選擇使用者"""
+    picker = page.locator(f"#{picker_id}")
+    picker.locator('input[type="text"]').fill(username)
+    result = picker.locator(".user-picker-result", has_text=username).first
+    result.wait_for(state="visible", timeout=5000)
+    result.click()
+
+
 def get_stored_users(page: Page) -> list:
-    """取得 LocalStorage 中的使用者資料"""
+    """取得 LocalStorage 中的使用者資料（依帳號目錄逐筆讀取）"""
     users_json = page.evaluate("""
         () => {
-            const usersJson = localStorage.getItem('cattleFarmUsers');
-            return usersJson ? JSON.parse(usersJson) : [];
+            const directoryJson = localStorage.getItem('cattleFarmUserDirectory');
+            const directory = directoryJson ? JSON.parse(directoryJson).entries : [];
+            return directory
+                .map(([username, id]) => localStorage.getItem(`cattleFarmUser:${id}`))
+                .filter(userJson => userJson)
+                .map(userJson => JSON.parse(userJson));
         }
     """)
     return users_json
 
 
+def set_current_user_points(page: Page, points: int) -> None:
+    """直接修改 LocalStorage 中當前使用者的點數（需重新載入頁面才會顯示）"""
+    page.evaluate("""
+        (points) => {
+            const currentUser = JSON.parse(localStorage.getItem('cattleFarmCurrentUser'));
+            if (!currentUser) return;
+
+            const key = `cattleFarmUser:${currentUser.id}`;
+            const user = JSON.parse(localStorage.getItem(key));
+            if (user) {
+                user.points = points;
+                localStorage.setItem(key, JSON.stringify(user));
+                currentUser.points = points;
+                localStorage.setItem('cattleFarmCurrentUser', JSON.stringify(currentUser));
+            }
+        }
+    """, points)
+
+
 def get_current_user(page: Page) -> dict:
     """取得當前登入使用者"""
     current_user = page.evaluate("""
@@ -144,3 +176,30 @@ def generate_random_username() -> str:
     timestamp = int(time.time() * 1000)
     random_num = random.randint(0, 999)
     return f"testuser_{timestamp}_{random_num}"
+
+
+class VirtualClock:
+    """控制頁面中的虛擬時鐘（window.Clock）；重新載入頁面後需重新安裝"""
+
+    def __init__(self, page: Page):
+        self.page = page
+
+    def install(self, start_time: int = None) -> "VirtualClock":
+        """切換為虛擬時鐘（預設從目前時間開始）"""
+        self.page.evaluate(
+            "(startTime) => startTime === null ? Clock.useVirtual() : Clock.useVirtual(startTime)",
+            start_time,
+        )
+        return self
+
+    def uninstall(self) -> None:
+        """切換回系統時間"""
+        self.page.evaluate("() => { if (Clock.isVirtual()) Clock.useReal(); }")
+
+    def now(self) -> int:
+        """目前的虛擬時間（毫秒）"""
+        return self.page.evaluate("() => Clock.now()")
+
+    def advance(self, ms: int) -> int:
+        """前進 ms 毫秒，執行途中到期的計時器，回傳新的時間"""
+        return self.page.evaluate("(ms) => Clock.advance(ms)", ms)
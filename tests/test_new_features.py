@@ -6,9 +6,14 @@ import pytest
 from playwright.sync_api import Page, expect
 from test_helpers import (
     login,
+    logout,
     register,
     generate_random_username,
     expect_user_page,
+    expect_admin_page,
+    set_current_user_points,
+    pick_user,
+    VirtualClock,
 )
 
 
@@ -140,21 +145,7 @@ class TestMultipleCattle:
         self.page.wait_for_timeout(2000)
         
         # 給予使用者一些點數
-        self.page.evaluate("""
-            () => {
-                const users = JSON.parse(localStorage.getItem('cattleFarmUsers'));
-                const currentUser = JSON.parse(localStorage.getItem('cattleFarmCurrentUser'));
-                if (users && currentUser) {
-                    const user = users.find(u => u.id === currentUser.id);
-                    if (user) {
-                        user.points = 200;
-                        localStorage.setItem('cattleFarmUsers', JSON.stringify(users));
-                        currentUser.points = 200;
-                        localStorage.setItem('cattleFarmCurrentUser', JSON.stringify(currentUser));
-                    }
-                }
-            }
-        """)
+        set_current_user_points(self.page, 200)
         
         # 重新載入頁面以更新顯示
         self.page.reload()
@@ -214,6 +205,85 @@ class TestMultipleCattle:
             expect(hunger).to_contain_text("10")
 
 
+@pytest.mark.user
+@pytest.mark.game
+class TestBatchFeeding:
+    """測試一次餵多口、餵到飽與全部餵飽"""
+
+    @pytest.fixture(autouse=True)
+    def setup_user_with_grass(self, page_setup: Page):
+        """每個測試前註冊使用者，給予點數並購買 25 個牧草"""
+        self.page = page_setup
+        self.test_username = generate_random_username()
+        self.test_password = "password123"
+
+        register(self.page, self.test_username, self.test_password)
+        self.page.wait_for_timeout(2000)
+
+        login(self.page, self.test_username, self.test_password)
+        expect_user_page(self.page)
+        set_current_user_points(self.page, 200)
+        self.page.reload()
+        expect_user_page(self.page)
+
+        self.page.fill("#grass-amount", "25")
+        self.page.click("#buy-grass-btn")
+        expect(self.page.locator("#game-grass")).to_have_text("25")
+        yield
+
+    def test_click_feeds_selected_count(self):
+        """選擇一次餵 5 次時，點擊一次乳牛就增加 50 飽食度"""
+        self.page.select_option("#feed-count", "5")
+        self.page.click("#cattle-1")
+
+        expect(self.page.locator("#cattle-1-hunger")).to_have_text("50")
+        expect(self.page.locator("#game-grass")).to_have_text("20")
+        expect(self.page.locator("#game-message.success")).to_contain_text("5 次")
+
+    def test_click_feeds_to_full(self):
+        """選擇餵到飽時，點擊一次乳牛就吃飽並開始計時"""
+        self.page.select_option("#feed-count", "full")
+        self.page.click("#cattle-1")
+
+        expect(self.page.locator("#cattle-1-hunger")).to_have_text("100")
+        expect(self.page.locator("#game-grass")).to_have_text("15")
+        expect(self.page.locator("#cattle-1-timer")).not_to_have_text("--")
+
+    def test_feed_all_until_grass_runs_out(self):
+        """全部餵飽依序餵養乳牛，牧草用完時停止"""
+        self.page.click("#feed-all-btn")
+
+        expect(self.page.locator("#cattle-1-hunger")).to_have_text("100")
+        expect(self.page.locator("#cattle-2-hunger")).to_have_text("100")
+        expect(self.page.locator("#cattle-3-hunger")).to_have_text("50")
+        expect(self.page.locator("#game-grass")).to_have_text("0")
+        expect(self.page.locator("#game-message.success")).to_contain_text("3 頭乳牛")
+
+    def test_batch_is_saved_as_one_change(self):
+        """批次餵食只遞增一次版本號，並記錄為一筆帳本交易"""
+        result = self.page.evaluate("""
+            async () => {
+                const user = await UserManager.getCurrentUser();
+                const before = (await GameManager.getGameData(user.id)).version;
+                const fed = await GameManager.feedCattle(user.id, 2, 4);
+                const full = await GameManager.feedToFull(user.id, 2);
+                const after = (await GameManager.getGameData(user.id)).version;
+                await WriteQueue.flush();
+                const history = await Ledger.getHistory(user.id);
+                return {
+                    feeds: [fed.feeds, full.feeds],
+                    versions: after - before,
+                    entries: history.entries
+                        .filter(entry => entry.type === 'feed')
+                        .map(entry => [entry.grass, entry.cattleId])
+                };
+            }
+        """)
+        assert result["feeds"] == [4, 6]
+        assert result["versions"] == 2
+        assert result["entries"] == [[-4, 2], [-6, 2]]
+
+
 @pytest.mark.user
 @pytest.mark.game
 class TestCattleCountdownTimer:
@@ -238,21 +308,7 @@ class TestCattleCountdownTimer:
         self.page.wait_for_timeout(2000)
         
         # 給予使用者一些點數
-        self.page.evaluate("""
-            () => {
-                const users = JSON.parse(localStorage.getItem('cattleFarmUsers'));
-                const currentUser = JSON.parse(localStorage.getItem('cattleFarmCurrentUser'));
-                if (users && currentUser) {
-                    const user = users.find(u => u.id === currentUser.id);
-                    if (user) {
-                        user.points = 200;
-                        localStorage.setItem('cattleFarmUsers', JSON.stringify(users));
-                        currentUser.points = 200;
-                        localStorage.setItem('cattleFarmCurrentUser', JSON.stringify(currentUser));
-                    }
-                }
-            }
-        """)
+        set_current_user_points(self.page, 200)
         
         # 重新載入頁面以更新顯示
         self.page.reload()
@@ -286,77 +342,251 @@ class TestCattleCountdownTimer:
         timer_value = int(timer_text)
         assert 55 <= timer_value <= 60, f"計時器應該在 55-60 秒之間，實際為 {timer_value}"
     
-    def test_timer_counts_down(self):
-        """計時器應該倒數計時"""
-        # 購買牧草並餵養乳牛到飽
-        self.page.fill("#grass-amount", "50")
+    def fill_cattle_1(self) -> None:
+        """購買牧草並將 1 號乳牛餵到飽"""
+        self.page.fill("#grass-amount", "20")
+        self.page.click("#buy-grass-btn")
+        expect(self.page.locator("#game-grass")).to_have_text("20")
+
+        self.page.select_option("#feed-count", "full")
+        self.page.click("#cattle-1")
+        expect(self.page.locator("#cattle-1-hunger")).to_have_text("100")
+
+    def test_timer_counts_down(self, virtual_clock: VirtualClock):
+        """計時器應該倒數計時（以虛擬時鐘前進 3 秒）"""
+        self.fill_cattle_1()
+        timer = self.page.locator("#cattle-1-timer")
+        expect(timer).to_have_text("60")
+
+        virtual_clock.advance(3000)
+        expect(timer).to_have_text("57")
+
+    def test_hunger_resets_after_timer_expires(self, virtual_clock: VirtualClock):
+        """計時器結束後飽食度應該清零"""
+        self.fill_cattle_1()
+        hunger = self.page.locator("#cattle-1-hunger")
+        timer = self.page.locator("#cattle-1-timer")
+
+        virtual_clock.advance(59_000)
+        expect(timer).to_have_text("1")
+        expect(hunger).to_have_text("100")
+
+        # 到期時由 ExpiryScheduler 通知畫面更新
+        virtual_clock.advance(1_000)
+        expect(hunger).to_have_text("0")
+        expect(timer).to_have_text("--")
+
+    def test_expiry_spanning_hours(self, virtual_clock: VirtualClock):
+        """數小時後到期的狀態不需要等待真實時間，到期後可以再次餵養"""
+        self.fill_cattle_1()
+        self.page.select_option("#feed-count", "1")
+        self.page.click("#cattle-2")
+        expect(self.page.locator("#cattle-2-hunger")).to_have_text("10")
+
+        virtual_clock.advance(3 * 60 * 60 * 1000)
+        expect(self.page.locator("#cattle-1-hunger")).to_have_text("0")
+        expect(self.page.locator("#cattle-1-timer")).to_have_text("--")
+        # 沒有吃飽的乳牛不會到期
+        expect(self.page.locator("#cattle-2-hunger")).to_have_text("10")
+
+        self.page.click("#cattle-1")
+        expect(self.page.locator("#cattle-1-hunger")).to_have_text("10")
+        expect(self.page.locator("#game-grass")).to_have_text("8")
+
+    def test_idle_ticks_do_not_touch_dom(self):
+        """數值沒有變化時，每秒更新不應該變動任何 DOM 節點"""
+        mutations = self.page.evaluate("""
+            async () => {
+                const records = [];
+                const observer = new MutationObserver(list => records.push(...list));
+                observer.observe(document.getElementById('user-page'), {
+                    subtree: true, childList: true, characterData: true, attributes: true
+                });
+                await new Promise(resolve => setTimeout(resolve, 2500));
+                observer.disconnect();
+                return records.length;
+            }
+        """)
+        assert mutations == 0, f"穩定狀態不應該變動 DOM，實際有 {mutations} 筆變動"
+
+    def test_countdown_only_updates_timer_text(self):
+        """倒數期間每秒只應該更新計時中乳牛的剩餘時間"""
+        self.page.fill("#grass-amount", "10")
         self.page.click("#buy-grass-btn")
         self.page.wait_for_timeout(1000)
-        
+
         for i in range(10):
             self.page.click("#cattle-1")
             self.page.wait_for_timeout(300)
-        
-        # 等待計時器初始化
-        self.page.wait_for_timeout(1000)
-        
-        # 記錄初始時間
-        timer = self.page.locator("#cattle-1-timer")
-        initial_time = int(timer.inner_text())
-        
-        # 等待 3 秒
-        self.page.wait_for_timeout(3000)
-        
-        # 記錄新時間
-        new_time = int(timer.inner_text())
-        
-        # 驗證時間有減少
-        assert new_time < initial_time, f"計時器應該倒數，但從 {initial_time} 變成 {new_time}"
-        assert initial_time - new_time >= 2, "計時器應該至少減少 2 秒"
-    
-    def test_hunger_resets_after_timer_expires(self):
-        """計時器結束後飽食度應該清零"""
-        # 購買牧草並餵養乳牛到飽
-        self.page.fill("#grass-amount", "50")
+        expect(self.page.locator("#cattle-1-hunger")).to_contain_text("100")
+        # 等待餵食訊息清除，避免影響觀察結果
+        self.page.wait_for_timeout(3500)
+
+        targets = self.page.evaluate("""
+            async () => {
+                const targets = new Set();
+                const observer = new MutationObserver(list => {
+                    list.forEach(record => {
+                        const target = record.target.nodeType === Node.TEXT_NODE
+                            ? record.target.parentElement
+                            : record.target;
+                        targets.add(target.id);
+                    });
+                });
+                observer.observe(document.getElementById('user-page'), {
+                    subtree: true, childList: true, characterData: true, attributes: true
+                });
+                await new Promise(resolve => setTimeout(resolve, 2500));
+                observer.disconnect();
+                return Array.from(targets);
+            }
+        """)
+        assert targets == ["cattle-1-timer"]
+
+    def test_ticks_pause_while_tab_is_hidden(self):
+        """分頁隱藏時應該停止更新，重新顯示時立即補繪"""
+        self.page.fill("#grass-amount", "10")
         self.page.click("#buy-grass-btn")
         self.page.wait_for_timeout(1000)
-        
+
         for i in range(10):
             self.page.click("#cattle-1")
             self.page.wait_for_timeout(300)
-        
-        # 驗證飽食度為 100
-        hunger = self.page.locator("#cattle-1-hunger")
-        expect(hunger).to_contain_text("100")
-        
-        # 使用 JavaScript 加速計時器（將結束時間設為現在）
-        self.page.evaluate("""
-            () => {
-                const gameData = JSON.parse(localStorage.getItem('cattleFarmGameData'));
-                const currentUser = JSON.parse(localStorage.getItem('cattleFarmCurrentUser'));
-                if (gameData && currentUser) {
-                    const userGameData = gameData[currentUser.id];
-                    if (userGameData && userGameData.cattle) {
-                        userGameData.cattle[0].timerEndTime = Date.now() - 1000; // 設為過去的時間
-                        localStorage.setItem('cattleFarmGameData', JSON.stringify(gameData));
-                    }
-                }
+        expect(self.page.locator("#cattle-1-hunger")).to_contain_text("100")
+
+        result = self.page.evaluate("""
+            async () => {
+                const { TickEngine } = await import('/src/js/tick-engine.js');
+                const timer = document.getElementById('cattle-1-timer');
+                const setHidden = (hidden) => {
+                    Object.defineProperty(document, 'hidden', { configurable: true, get: () => hidden });
+                    document.dispatchEvent(new Event('visibilitychange'));
+                };
+
+                setHidden(true);
+                const pending = TickEngine.timeoutId !== null || TickEngine.frameId !== null;
+                const before = timer.textContent;
+                await new Promise(resolve => setTimeout(resolve, 2500));
+                const whileHidden = timer.textContent;
+
+                setHidden(false);
+                const afterShow = timer.textContent;
+                delete document.hidden;
+                return { pending, before, whileHidden, afterShow };
             }
         """)
-        
-        # 等待計時器更新（每秒更新一次）
-        self.page.wait_for_timeout(2000)
-        
-        # 驗證飽食度已清零
-        expect(hunger).to_contain_text("0")
-        
-        # 驗證計時器顯示 --
-        timer = self.page.locator("#cattle-1-timer")
-        expect(timer).to_contain_text("--")
-    
+        assert result["pending"] is False
+        assert result["whileHidden"] == result["before"]
+        assert int(result["afterShow"]) < int(result["before"])
+
     def test_game_hint_mentions_timer(self):
         """遊戲提示應該提到計時器功能"""
         hint = self.page.locator(".game-hint")
         expect(hint).to_be_visible()
         hint_text = hint.inner_text()
         assert "一分鐘" in hint_text or "60" in hint_text or "清空" in hint_text, "遊戲提示應該提到飽食度清空功能"
+
+
+@pytest.mark.user
+@pytest.mark.game
+class TestLargeHerd:
+    """測試可設定數量的牛群與虛擬清單"""
+
+    @pytest.fixture(autouse=True)
+    def setup_user_with_large_herd(self, page_setup: Page):
+        """每個測試前註冊使用者，並由管理員設定 5000 頭乳牛"""
+        self.page = page_setup
+        self.test_username = generate_random_username()
+        self.test_password = "password123"
+
+        # 註冊使用者
+        register(self.page, self.test_username, self.test_password)
+        self.page.wait_for_timeout(2000)
+
+        # 管理員設定乳牛數量
+        login(self.page, "admin", "admin")
+        expect_admin_page(self.page)
+        pick_user(self.page, "herd-user-picker", self.test_username)
+        self.page.fill("#herd-size", "5000")
+        self.page.click('#herdSizeForm button[type="submit"]')
+        expect(self.page.locator("#admin-message.success")).to_contain_text("5000")
+        logout(self.page)
+
+        # 使用者登入
+        login(self.page, self.test_username, self.test_password)
+        expect_user_page(self.page)
+        yield
+
+    def test_only_visible_cattle_are_rendered(self):
+        """5000 頭乳牛只應該為可視範圍建立 DOM 節點"""
+        expect(self.page.locator("#cattle-1")).to_be_visible()
+        rendered = self.page.locator("#cattle-container .cattle-item").count()
+        assert 0 < rendered < 100, f"應該只繪製可視範圍的乳牛，實際為 {rendered} 個節點"
+
+    def test_scrolling_renders_last_cattle(self):
+        """捲動到底部應該顯示最後一頭乳牛"""
+        self.page.evaluate("""
+            () => {
+                const container = document.getElementById('cattle-container');
+                container.scrollTop = container.scrollHeight;
+            }
+        """)
+        cattle = self.page.locator("#cattle-5000")
+        expect(cattle).to_be_visible()
+        expect(cattle.locator(".cattle-name")).to_contain_text("乳牛 #5000")
+        expect(self.page.locator("#cattle-1")).to_have_count(0)
+
+
+@pytest.mark.game
+class TestExpiryScheduler:
+    """測試乳牛到期排程"""
+
+    def test_fires_only_expired_items_in_deadline_order(self, page_setup: Page):
+        """排程應該依到期時間觸發，且略過已取消或重新排程的項目"""
+        result = page_setup.evaluate("""
+            async () => {
+                const fired = [];
+                ExpiryScheduler.clear();
+                ExpiryScheduler.setHandler(payloads => fired.push(...payloads));
+
+                const now = Date.now();
+                ExpiryScheduler.schedule('c', now + 60, 'c');
+                ExpiryScheduler.schedule('a', now + 20, 'a');
+                ExpiryScheduler.schedule('b', now + 40, 'b');
+                ExpiryScheduler.schedule('d', now + 30, 'd');
+                ExpiryScheduler.cancel('d');
+                ExpiryScheduler.schedule('b', now + 60000, 'b');  // 重新排程到很久以後
+
+                await new Promise(resolve => setTimeout(resolve, 300));
+                const pending = ExpiryScheduler.deadlines.size;
+                ExpiryScheduler.clear();
+                ExpiryScheduler.setHandler(null);
+                return { fired, pending };
+            }
+        """)
+        assert result["fired"] == ["a", "c"]
+        assert result["pending"] == 1
+
+    def test_rescheduling_does_not_grow_heap(self, page_setup: Page):
+        """反覆重新排程時，失效的項目不應該持續累積在堆積中"""
+        result = page_setup.evaluate("""
+            async () => {
+                const fired = [];
+                ExpiryScheduler.clear();
+                ExpiryScheduler.setHandler(payloads => fired.push(...payloads));
+
+                const now = Date.now();
+                ExpiryScheduler.schedule('a', now + 50, 'a');
+                for (let i = 0; i < 1000; i++) {
+                    ExpiryScheduler.schedule('b', now + 60000 + i, 'b');
+                }
+                const heapSize = ExpiryScheduler.heap.length;
+
+                await new Promise(resolve => setTimeout(resolve, 300));
+                ExpiryScheduler.clear();
+                ExpiryScheduler.setHandler(null);
+                return { fired, heapSize };
+            }
+        """)
+        assert result["heapSize"] <= 4
+        assert result["fired"] == ["a"]
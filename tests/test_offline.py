@@ -0,0 +1,105 @@
+"""
+離線支援測試（Service Worker 預先快取 App Shell）
+"""
+
+import re
+import sys
+from pathlib import Path
+
+import pytest
+from playwright.sync_api import Page
+from test_helpers import expect_auth_page, expect_admin_page, login
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+import build_precache  # noqa: E402
+
+
+@pytest.mark.offline
+class TestPrecacheManifest:
+    """預先快取清單測試集（不需要瀏覽器）"""
+
+    def test_manifest_is_up_to_date(self):
+        """提交的清單應該與目前的檔案內容一致"""
+        entries = build_precache.collect_entries()
+        assert build_precache.MANIFEST_PATH.read_text(encoding="utf-8") == build_precache.render_manifest(entries), (
+            "precache-manifest.js 已過期，請執行 python scripts/build_precache.py"
+        )
+
+    def test_manifest_covers_index_html_assets(self):
+        """index.html 引用的 CSS 與 JavaScript 都應該在清單中"""
+        html = (build_precache.ROOT / "index.html").read_text(encoding="utf-8")
+        assets = set(re.findall(r'(?:href|src)="(src/[^"]+)"', html))
+        urls = {entry["url"] for entry in build_precache.collect_entries()}
+        assert assets
+        assert assets <= urls
+        assert "./" in urls
+
+    def test_startup_modules_are_preloaded(self):
+        """app.js 靜態匯入的模組都應該在 index.html 以 modulepreload 並行下載"""
+        html = (build_precache.ROOT / "index.html").read_text(encoding="utf-8")
+        preloaded = set(re.findall(r'<link rel="modulepreload" href="src/js/([^"]+)">', html))
+        app = (build_precache.ROOT / "src" / "js" / "app.js").read_text(encoding="utf-8")
+        imported = set(re.findall(r"^import .* from '\./([^']+)';$", app, re.MULTILINE))
+        assert imported
+        assert imported == preloaded
+
+    def test_revision_follows_file_content(self, tmp_path: Path):
+        """檔案內容改變時，該檔案與整份清單的版本都應該改變"""
+        (tmp_path / "src" / "js").mkdir(parents=True)
+        (tmp_path / "src" / "css").mkdir()
+        (tmp_path / "index.html").write_text("<html></html>")
+        script = tmp_path / "src" / "js" / "app.js"
+        script.write_text("const App = {};")
+
+        before = build_precache.collect_entries(tmp_path)
+        script.write_text("const App = { ready: null };")
+        after = build_precache.collect_entries(tmp_path)
+
+        assert [entry["url"] for entry in before] == ["./", "src/js/app.js"]
+        assert before[0] == after[0]
+        assert before[1]["revision"] != after[1]["revision"]
+        assert build_precache.manifest_version(before) != build_precache.manifest_version(after)
+
+
+@pytest.mark.offline
+class TestOfflineApp:
+    """離線使用測試集"""
+
+    @pytest.fixture(autouse=True)
+    def setup_service_worker(self, page_setup: Page):
+        """等待 Service Worker 完成預先快取並控制頁面"""
+        self.page = page_setup
+        self.page.evaluate("() => navigator.serviceWorker.ready")
+        self.page.reload()
+        self.page.wait_for_function("() => navigator.serviceWorker.controller !== null")
+
+    def test_app_works_offline(self):
+        """離線時重新載入應該能顯示頁面並登入"""
+        self.page.context.set_offline(True)
+        try:
+            self.page.reload()
+            expect_auth_page(self.page)
+            login(self.page, "admin", "admin")
+            expect_admin_page(self.page)
+        finally:
+            self.page.context.set_offline(False)
+
+    def test_api_navigation_is_not_served_the_app_shell(self):
+        """直接開啟 API 網址時應該由後端回應，而不是快取的 App 頁面"""
+        response = self.page.goto("/api/health")
+        assert not response.from_service_worker
+        assert response.json() == {"status": "ok"}
+
+    def test_repeat_visit_uses_cache(self):
+        """再次造訪時 App Shell 應該全部由 Service Worker 快取回應"""
+        network_requests = []
+
+        def record_network_request(request):
+            response = request.response()
+            if response and not response.from_service_worker:
+                network_requests.append(request.url)
+
+        self.page.on("requestfinished", record_network_request)
+        self.page.reload()
+        expect_auth_page(self.page)
+        assert network_requests == []
@@ -0,0 +1,433 @@
+"""
+本機後端測試：asyncio HTTP 伺服器、SQLite 儲存與瀏覽器端的 remote 儲存引擎
+"""
+
+import asyncio
+import http.client
+import json
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+from playwright.sync_api import Page, expect
+from test_helpers import (
+    login,
+    register,
+    generate_random_username,
+    expect_user_page,
+    wait_for_page_load,
+)
+
+from server import Database, Server
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+class Client:
+    """保持連線（keep-alive）的 HTTP 用戶端"""
+
+    def __init__(self, address: tuple):
+        self.connection = http.client.HTTPConnection(*address, timeout=10)
+
+    def request(self, method: str, path: str, body=None) -> tuple:
+        """送出請求，回傳 (狀態碼, 標頭, 內容)"""
+        payload = json.dumps(body) if body is not None else None
+        self.connection.request(method, path, body=payload, headers={"Content-Type": "application/json"})
+        response = self.connection.getresponse()
+        return response.status, dict(response.getheaders()), response.read()
+
+    def storage(self, ops: list) -> list:
+        """執行批次儲存操作"""
+        status, _, body = self.request("POST", "/api/storage", {"ops": ops})
+        assert status == 200, body
+        return json.loads(body)["results"]
+
+    def close(self) -> None:
+        self.connection.close()
+
+
+@pytest.fixture
+def backend(tmp_path):
+    """在背景執行緒啟動伺服器（隨機連接埠、暫存資料庫）
+
+    事件迴圈在背景執行緒中建立、執行與關閉，
+    主執行緒上已有 pytest-playwright 的事件迴圈在執行，不能在主執行緒執行另一個迴圈
+    """
+    database = Database(tmp_path / "test.sqlite3")
+    started = threading.Event()
+    state = {}
+
+    def serve() -> None:
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        try:
+            database.open()
+            listener = loop.run_until_complete(Server(ROOT, database).start("127.0.0.1", 0))
+            state.update(loop=loop, address=listener.sockets[0].getsockname()[:2])
+        except Exception as error:
+            state["error"] = error
+            started.set()
+            loop.close()
+            return
+        started.set()
+        try:
+            loop.run_forever()
+        finally:
+            listener.close()
+            loop.run_until_complete(listener.wait_closed())
+            loop.close()
+            database.close()
+
+    thread = threading.Thread(target=serve, daemon=True)
+    thread.start()
+    started.wait()
+    if "error" in state:
+        raise state["error"]
+
+    yield state["address"], database
+
+    state["loop"].call_soon_threadsafe(state["loop"].stop)
+    thread.join()
+
+
+@pytest.mark.server
+class TestServer:
+    """測試 HTTP 伺服器與 JSON API（不需要瀏覽器）"""
+
+    @pytest.fixture(autouse=True)
+    def setup_client(self, backend):
+        self.address, self.database = backend
+        self.client = Client(self.address)
+        yield
+        self.client.close()
+
+    def test_serves_app_shell(self):
+        """提供 App Shell 的靜態檔案，JavaScript 需要正確的 MIME 類型才能以模組載入"""
+        status, headers, body = self.client.request("GET", "/")
+        assert status == 200
+        assert headers["Content-Type"].startswith("text/html")
+        assert body == (ROOT / "index.html").read_bytes()
+
+        status, headers, _ = self.client.request("GET", "/src/js/app.js?v=1")
+        assert status == 200
+        assert headers["Content-Type"].startswith("text/javascript")
+
+    def test_does_not_serve_private_files(self):
+        """專案目錄外、隱藏檔與資料庫檔案都不提供"""
+        for path in ("/../pyproject.toml", "/%2e%2e/etc/passwd", "/.git/HEAD", "/.gitignore",
+                     f"/{self.database.path.name}"):
+            status, _, _ = self.client.request("GET", path)
+            assert status == 404, path
+
+    def test_storage_batch(self):
+        """批次操作依序執行，回傳每個操作的結果"""
+        results = self.client.storage([
+            ["set", "cattleFarmUser:a", {"id": "a", "points": 1, "version": 1}],
+            ["set", "cattleFarmUser:b", {"id": "b", "points": 2, "version": 1}],
+            ["set", "cattleFarmGameData:a", {"userId": "a", "grass": 3}],
+            ["get", "cattleFarmUser:a"],
+            ["keys", "cattleFarmUser:"],
+            ["remove", "cattleFarmUser:b"],
+            ["get", "cattleFarmUser:b"],
+        ])
+        assert results == [
+            None, None, None,
+            {"id": "a", "points": 1, "version": 1},
+            ["cattleFarmUser:a", "cattleFarmUser:b"],
+            None, None,
+        ]
+
+    def test_set_if_version_rejects_stale_writes(self):
+        """版本號不同時不寫入"""
+        self.client.storage([["set", "cattleFarmUser:a", {"id": "a", "points": 1, "version": 3}]])
+        results = self.client.storage([
+            ["setIfVersion", "cattleFarmUser:a", {"id": "a", "points": 9, "version": 3}, 2],
+            ["setIfVersion", "cattleFarmUser:a", {"id": "a", "points": 5, "version": 4}, 3],
+            ["get", "cattleFarmUser:a"],
+        ])
+        assert results == [False, True, {"id": "a", "points": 5, "version": 4}]
+
+    def test_set_if_version_on_non_object_value(self):
+        """儲存的資料不是物件時視為版本 0（與瀏覽器端引擎相同），不會中斷連線"""
+        self.client.storage([["set", "cattleFarmUserDirectory", [["player", "a", "user"]]]])
+        results = self.client.storage([
+            ["setIfVersion", "cattleFarmUserDirectory", {"version": 1, "entries": []}, 1],
+            ["setIfVersion", "cattleFarmUserDirectory", {"version": 1, "entries": []}, 0],
+        ])
+        assert results == [False, True]
+
+    def test_long_request_line_gets_a_response(self):
+        """過長的請求行回應 414，不會直接中斷連線"""
+        client = Client(self.address)
+        try:
+            status, _, _ = client.request("GET", "/" + "a" * 100_000)
+            assert status == 414
+        finally:
+            client.close()
+
+    def test_negative_content_length_gets_a_response(self):
+        """負數的 Content-Length 回應 400，不會直接中斷連線"""
+        client = Client(self.address)
+        try:
+            client.connection.putrequest("POST", "/api/storage")
+            client.connection.putheader("Content-Length", "-5")
+            client.connection.endheaders()
+            response = client.connection.getresponse()
+            assert response.status == 400
+            assert "Content-Length" in json.loads(response.read())["error"]
+        finally:
+            client.close()
+
+    def test_changes_since_cursor(self):
+        """changes 回傳上次 cursor 之後變更的 key（第一次只回傳 cursor）"""
+        self.client.storage([["set", "cattleFarmUser:a", {"id": "a"}]])
+        [first] = self.client.storage([["changes", "cattleFarmUser:", None]])
+        assert first["keys"] == []
+
+        self.client.storage([
+            ["set", "cattleFarmUser:b", {"id": "b"}],
+            ["set", "cattleFarmGameData:b", {"userId": "b"}],
+        ])
+        [second] = self.client.storage([["changes", "cattleFarmUser:", first["cursor"]]])
+        changed = [key for key, _ in second["keys"]]
+        assert "cattleFarmUser:b" in changed
+        assert "cattleFarmGameData:b" not in changed
+        assert second["cursor"] >= first["cursor"]
+
+    def test_changes_include_deleted_keys(self):
+        """刪除的 key 也會出現在 changes 中，其他裝置才能讓快取失效"""
+        self.client.storage([["set", "cattleFarmUser:a", {"id": "a"}]])
+        [first] = self.client.storage([["changes", "cattleFarmUser:", None]])
+
+        self.client.storage([["remove", "cattleFarmUser:a"]])
+        [second] = self.client.storage([["changes", "cattleFarmUser:", first["cursor"]]])
+        assert [key for key, _ in second["keys"]] == ["cattleFarmUser:a"]
+        assert second["cursor"] >= first["cursor"]
+
+        # 再次寫入後只回報一次
+        self.client.storage([["set", "cattleFarmUser:a", {"id": "a"}]])
+        [third] = self.client.storage([["changes", "cattleFarmUser:", second["cursor"]]])
+        assert [key for key, _ in third["keys"]] == ["cattleFarmUser:a"]
+
+    def test_invalid_batch_is_rejected_without_writing(self):
+        """格式錯誤的批次整批拒絕，不會寫入前面的操作"""
+        status, _, body = self.client.request("POST", "/api/storage", {
+            "ops": [["set", "cattleFarmUser:a", {"id": "a"}], ["drop", "cattleFarmUser:a"]]
+        })
+        assert status == 400
+        assert "drop" in json.loads(body)["error"]
+        assert self.client.storage([["get", "cattleFarmUser:a"]]) == [None]
+
+    def test_user_and_game_api(self):
+        """使用者 API 不回傳密碼；遊戲數據以儲存格式回傳"""
+        self.client.storage([
+            ["set", "cattleFarmUser:a", {"id": "a", "username": "player", "password": "secret", "points": 7}],
+            ["set", "cattleFarmUserDirectory", [["player", "a", "user"]]],
+            ["set", "cattleFarmGameData:a", {"userId": "a", "grass": 3}],
+        ])
+
+        status, _, body = self.client.request("GET", "/api/users")
+        assert status == 200
+        assert json.loads(body) == [{"id": "a", "username": "player", "points": 7}]
+
+        status, _, body = self.client.request("GET", "/api/users/a")
+        assert json.loads(body) == {"id": "a", "username": "player", "points": 7}
+
+        status, _, body = self.client.request("GET", "/api/users/a/game")
+        assert json.loads(body) == {"userId": "a", "grass": 3}
+
+        status, _, _ = self.client.request("GET", "/api/users/missing")
+        assert status == 404
+
+    def test_uses_wal_mode(self):
+        """資料庫使用 WAL 模式"""
+        connection = sqlite3.connect(self.database.path)
+        assert connection.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        connection.close()
+
+    def test_concurrent_clients(self):
+        """多個用戶端同時讀寫，所有寫入都保存，以版本號比對的更新不會遺失"""
+        self.client.storage([["set", "cattleFarmUser:shared", {"id": "shared", "points": 0, "version": 0}]])
+
+        def run_client(index: int) -> None:
+            client = Client(self.address)
+            try:
+                for step in range(20):
+                    client.storage([["set", f"cattleFarmGameData:{index}:{step}", {"step": step}]])
+                    # 以 compare-and-retry 增加共用的點數
+                    while True:
+                        [user] = client.storage([["get", "cattleFarmUser:shared"]])
+                        updated = {**user, "points": user["points"] + 1, "version": user["version"] + 1}
+                        [saved] = client.storage([["setIfVersion", "cattleFarmUser:shared", updated, user["version"]]])
+                        if saved:
+                            break
+            finally:
+                client.close()
+
+        clients = 32
+        with ThreadPoolExecutor(max_workers=clients) as executor:
+            list(executor.map(run_client, range(clients)))
+
+        [keys, user] = self.client.storage([["keys", "cattleFarmGameData:"], ["get", "cattleFarmUser:shared"]])
+        assert len(keys) == clients * 20
+        assert user["points"] == clients * 20
+
+
+@pytest.mark.server
+class TestRemoteStorage:
+    """測試瀏覽器端以 remote 儲存引擎讀寫後端"""
+
+    @pytest.fixture(autouse=True)
+    def setup_remote(self, page_setup: Page):
+        """切換到 remote 儲存引擎"""
+        self.page = page_setup
+        self.page.goto("/?storage=remote")
+        wait_for_page_load(self.page)
+        yield
+        # 還原為預設的儲存引擎，避免影響其他測試
+        self.page.evaluate("localStorage.removeItem('cattleFarmStorageEngine')")
+
+    def test_game_state_is_stored_on_server(self):
+        """註冊、登入與購買牧草的結果存放在後端，可由 API 查詢"""
+        username = generate_random_username()
+        register(self.page, username, "password123")
+        self.page.wait_for_timeout(2000)
+        login(self.page, username, "password123")
+        expect_user_page(self.page)
+
+        user_id = self.page.evaluate("""
+            async () => {
+                const user = await UserManager.getCurrentUser();
+                await UserManager.addPoints(user.id, 20);
+                await GameManager.buyGrass(user.id, 5);
+                await WriteQueue.flush();
+                return user.id;
+            }
+        """)
+        assert self.page.evaluate("StorageEngine.current.name") == "remote"
+
+        user = self.page.request.get(f"/api/users/{user_id}").json()
+        assert user["username"] == username
+        assert user["points"] == 15
+        assert "password" not in user
+        assert self.page.request.get(f"/api/users/{user_id}/game").json()["grass"] == 5
+
+        # 登入狀態仍只存在這個瀏覽器
+        assert self.page.evaluate("localStorage.getItem('cattleFarmCurrentUser')") is not None
+
+    def test_changes_from_other_devices_are_kept(self):
+        """其他裝置新增的帳號與指派的點數不會被本裝置的快取覆蓋，畫面也會顯示其他裝置的變更"""
+        username = generate_random_username()
+        register(self.page, username, "password123")
+        self.page.wait_for_timeout(2000)
+        user_id = self.page.evaluate(f"UserManager.getUserByUsername('{username}').then(user => user.id)")
+
+        def storage(ops: list) -> list:
+            response = self.page.request.post("/api/storage", data={"ops": ops})
+            assert response.ok, response.text()
+            return response.json()["results"]
+
+        # 另一個裝置註冊帳號（比對目錄版本號寫入）
+        other_id = f"device{username}"
+        [directory] = storage([["get", "cattleFarmUserDirectory"]])
+        storage([
+            ["set", f"cattleFarmUser:{other_id}", {
+                "id": other_id, "username": f"x{username}", "password": "password123", "role": "user",
+                "points": 0, "createdAt": "2024-01-01T00:00:00.000Z", "lastLogin": None, "version": 1,
+            }],
+            ["setIfVersion", "cattleFarmUserDirectory", {
+                "version": directory["version"] + 1,
+                "entries": directory["entries"] + [[f"x{username}", other_id, "user"]],
+            }, directory["version"]],
+        ])
+
+        def credit(points: int) -> None:
+            [user] = storage([["get", f"cattleFarmUser:{user_id}"]])
+            updated = {**user, "points": user["points"] + points, "version": user["version"] + 1}
+            assert storage([["setIfVersion", f"cattleFarmUser:{user_id}", updated, user["version"]]]) == [True]
+
+        # 本裝置快取了舊的目錄與使用者資料，再註冊一個帳號並登入
+        credit(50)
+        register(self.page, f"y{username}", "password123")
+        self.page.wait_for_timeout(2000)
+        login(self.page, username, "password123")
+        expect_user_page(self.page)
+
+        [directory] = storage([["get", "cattleFarmUserDirectory"]])
+        usernames = [entry[0] for entry in directory["entries"]]
+        assert {username, f"x{username}", f"y{username}"} <= set(usernames)
+        assert self.page.request.get(f"/api/users/{user_id}").json()["points"] == 50
+
+        # 其他裝置指派的點數由輪詢更新到畫面
+        credit(10)
+        expect(self.page.locator("#game-points")).to_have_text("60", timeout=10_000)
+
+    def test_game_changes_from_other_devices_are_kept(self):
+        """本裝置快取了舊的遊戲數據時，變更應該以其他裝置寫入的最新資料計算"""
+        username = generate_random_username()
+        register(self.page, username, "password123")
+        self.page.wait_for_timeout(2000)
+        login(self.page, username, "password123")
+        expect_user_page(self.page)
+        user_id = self.page.evaluate("""
+            async () => {
+                const user = await UserManager.getCurrentUser();
+                await UserManager.updatePoints(user.id, 10);
+                await GameManager.getGameData(user.id);
+                await WriteQueue.flush();
+                return user.id;
+            }
+        """)
+
+        # 另一個裝置購買了牧草（本裝置還沒有輪詢到）
+        key = f"cattleFarmGameData:{user_id}"
+        [game_data] = self.page.request.post("/api/storage", data={"ops": [["get", key]]}).json()["results"]
+        updated = {**game_data, "grass": game_data["grass"] + 5, "version": game_data["version"] + 1}
+        response = self.page.request.post("/api/storage", data={
+            "ops": [["setIfVersion", key, updated, game_data["version"]]]
+        })
+        assert response.json()["results"] == [True]
+
+        result = self.page.evaluate(f"GameManager.buyGrass('{user_id}', 2)")
+        assert result["grass"] == updated["grass"] + 2
+        [stored] = self.page.request.post("/api/storage", data={"ops": [["get", key]]}).json()["results"]
+        assert stored["grass"] == updated["grass"] + 2
+        assert stored["version"] > updated["version"]
+
+    def test_small_requests_use_keepalive(self):
+        """內容夠小的請求以 keepalive 送出，頁面關閉時仍會送達；超過上限的請求不使用 keepalive"""
+        result = self.page.evaluate("""
+            async () => {
+                const flags = [];
+                const originalFetch = window.fetch;
+                window.fetch = (url, options = {}) => {
+                    if (String(options.body).includes('cattleFarmTest:')) flags.push(options.keepalive);
+                    return originalFetch(url, options);
+                };
+                await StorageEngine.set('cattleFarmTest:small', { value: 1 });
+                await StorageEngine.set('cattleFarmTest:large', { value: 'x'.repeat(100000) });
+                window.fetch = originalFetch;
+                return flags;
+            }
+        """)
+        assert result == [True, False]
+
+    def test_concurrent_calls_are_batched(self):
+        """同一時間的多個儲存呼叫合併成一個請求"""
+        requests = []
+        self.page.on("request", lambda request: requests.append(request)
+                     if request.url.endswith("/api/storage") else None)
+
+        values = self.page.evaluate("""
+            async () => {
+                await Promise.all(Array.from({ length: 30 }, (_, i) =>
+                    StorageEngine.set(`cattleFarmTest:${i}`, { i })));
+                return Promise.all(Array.from({ length: 30 }, (_, i) =>
+                    StorageEngine.get(`cattleFarmTest:${i}`)));
+            }
+        """)
+        assert values == [{"i": i} for i in range(30)]
+        batch_sizes = [len(json.loads(request.post_data)["ops"]) for request in requests]
+        assert [size for size in batch_sizes if size >= 30] == [30, 30]
@@ -0,0 +1,294 @@
+"""
+遊戲規則模擬測試：NumPy 模型的規則、儲存空間模型，以及與 JavaScript 實作的交叉驗證
+"""
+
+import argparse
+import base64
+import json
+
+import numpy as np
+import pytest
+from playwright.sync_api import Page
+from test_helpers import (
+    login,
+    register,
+    generate_random_username,
+    expect_user_page,
+)
+
+from simulation import ClickRate, Config, Farm, replay, simulate
+from simulation import rules, storage
+from simulation.simulate import START_MS
+
+# 餵食失敗時 GameManager 回傳的訊息
+FEED_MESSAGES = {
+    rules.FEED_NO_GRASS: "牧草不足，請先購買牧草",
+    rules.FEED_NOT_FOUND: "找不到這頭乳牛",
+    rules.FEED_FULL: "這頭乳牛已經吃飽了！",
+}
+
+
+def json_length(value) -> int:
+    """與 JSON.stringify 相同格式的字元數"""
+    return len(json.dumps(value, separators=(",", ":"), ensure_ascii=False))
+
+
+def trace_config(**overrides) -> Config:
+    """產生會用完點數、吃飽並等到計時器到期的小規模模擬"""
+    options = dict(
+        players=20,
+        duration_s=120,
+        click_rate=ClickRate("constant", 2),
+        initial_points=40,
+        trace_players=3,
+        seed=7,
+    )
+    options.update(overrides)
+    return Config(**options)
+
+
+@pytest.mark.simulation
+class TestFarmRules:
+    """測試 NumPy 模型的遊戲規則（不需要瀏覽器）"""
+
+    def test_buy_grass_costs_one_point_per_grass(self):
+        """購買牧草以 1 點數換 1 牧草，點數不足或數量不大於 0 時不變動"""
+        farm = Farm(3, initial_points=10)
+        success = farm.buy_grass([0, 1, 2], [4, 11, 0], START_MS)
+        assert success.tolist() == [True, False, False]
+        assert farm.points.tolist() == [6, 10, 10]
+        assert farm.grass.tolist() == [4, 0, 0]
+        assert farm.user_version.tolist() == [1, 0, 0]
+        assert farm.game_version.tolist() == [1, 0, 0]
+
+    def test_feed_adds_hunger_and_starts_timer_at_cap(self):
+        """每次餵食增加 10 飽食度，達到 100 時設定 60 秒計時器"""
+        farm = Farm(1, initial_points=20)
+        farm.buy_grass([0], 20, START_MS)
+        for _ in range(10):
+            assert farm.feed([0], [2], START_MS).tolist() == [rules.FEED_OK]
+
+        assert farm.hunger[0].tolist() == [0, 100, 0]
+        assert farm.timer_end[0, 1] == START_MS + rules.TIMER_MS
+        assert farm.grass[0] == 10
+        assert farm.feed([0], [2], START_MS).tolist() == [rules.FEED_FULL]
+
+    def test_expired_cattle_can_be_fed_again(self):
+        """計時器到期後飽食度視為 0，再次餵食時清除計時器"""
+        farm = Farm(1, initial_points=20)
+        farm.buy_grass([0], 20, START_MS)
+        for _ in range(10):
+            farm.feed([0], [1], START_MS)
+
+        expired_at = START_MS + rules.TIMER_MS
+        assert farm.effective_hunger([0], expired_at - 1).tolist() == [[100, 0, 0]]
+        assert farm.effective_hunger([0], expired_at).tolist() == [[0, 0, 0]]
+        assert farm.feed([0], [1], expired_at).tolist() == [rules.FEED_OK]
+        assert farm.hunger[0].tolist() == [10, 0, 0]
+        assert farm.timer_end[0].tolist() == [0, 0, 0]
+
+    def test_feed_checks_follow_game_manager_order(self):
+        """檢查順序與 GameManager 相同：牧草、乳牛是否存在、是否吃飽"""
+        farm = Farm(3, initial_points=10)
+        farm.buy_grass([1, 2], 5, START_MS)
+        status = farm.feed([0, 1, 2], [9, 9, 1], START_MS)
+        assert status.tolist() == [rules.FEED_NO_GRASS, rules.FEED_NOT_FOUND, rules.FEED_OK]
+        assert farm.grass.tolist() == [0, 5, 4]
+
+
+@pytest.mark.simulation
+class TestSimulation:
+    """測試批次模擬與報告（不需要瀏覽器）"""
+
+    def test_batched_simulation_matches_sequential_replay(self):
+        """向量化批次模擬的結果應該與逐一重播相同"""
+        config = trace_config(target="random")
+        report = simulate(config)
+
+        for player, events in report.traces.items():
+            farm, results = replay(events, config.herd_size, config.initial_points)
+            assert results == [event.result for event in events]
+            state = report.final_states[player]
+            assert farm.points[0] == state["points"]
+            assert farm.grass[0] == state["grass"]
+            assert farm.hunger[0].tolist() == state["hunger"]
+            assert farm.timer_end[0].tolist() == state["timerEndTime"]
+            assert farm.game_version[0] == state["gameVersion"]
+
+    def test_report_counts_writes_and_expiries(self):
+        """遊戲數據每位玩家每秒最多寫入一次；所有乳牛吃飽後 60 秒到期"""
+        config = trace_config(players=1_000, batch_size=300, target="hungry",
+                              click_rate=ClickRate("constant", 5), initial_points=1_000, trace_players=0)
+        report = simulate(config)
+
+        assert report.writes["game"].max() <= config.players
+        assert report.writes["ledgerEntry"].sum() == report.feeds + report.purchases
+        assert report.writes["user"].sum() == report.purchases
+        # 三頭乳牛在 60 秒內吃飽，到期集中在 60 秒之後
+        assert report.expiries[:rules.TIMER_MS // 1000].sum() == 0
+        assert report.expiries.sum() > 0
+        assert report.storage["game"].keys == config.players
+        assert report.storage["ledgerSnapshot"].keys == config.players
+
+    def test_click_rate_distributions_have_configured_mean(self):
+        """各種點擊速率分布的平均值應該接近設定值"""
+        rng = np.random.default_rng(0)
+        for spec in ("constant:2", "exponential:2", "lognormal:2:0.8", "pareto:2:3"):
+            rates = ClickRate.parse(spec).sample(rng, 200_000)
+            assert rates.mean() == pytest.approx(2, rel=0.05), spec
+
+    @pytest.mark.parametrize("spec", [
+        "bogus:1", "constant", "constant:x", "constant:0", "exponential:-1", "exponential:1:2",
+        "lognormal:1:0", "pareto:2:1", "pareto:2:0.5", "lognormal:nan:1",
+    ])
+    def test_invalid_click_rate_is_rejected(self, spec):
+        """不支援的分布或不合理的參數應該由 argparse 回報錯誤"""
+        with pytest.raises(argparse.ArgumentTypeError):
+            ClickRate.parse(spec)
+
+
+@pytest.mark.simulation
+class TestStorageModel:
+    """測試儲存空間模型與實際 JSON 格式一致（不需要瀏覽器）"""
+
+    user_id = "lq8x3k2abc4defgh5ij"
+    iso_date = "2023-11-14T22:13:20.000Z"
+
+    def test_game_record_size(self):
+        """遊戲數據的大小與 encodeGameData 的 JSON 相同"""
+        herd_size = 5
+        record = {
+            "userId": self.user_id,
+            "version": 123,
+            "grass": 7,
+            "herd": {
+                "size": herd_size,
+                "hunger": base64.b64encode(bytes(herd_size)).decode(),
+                "timerEndTime": base64.b64encode(bytes(8 * herd_size)).decode(),
+            },
+        }
+        assert storage.game_record_chars(123, 7, herd_size, len(self.user_id)) == json_length(record)
+
+    def test_user_records_size(self):
+        """使用者資料與當前使用者資料的大小"""
+        user = {
+            "id": self.user_id, "username": "player01", "password": "password123", "role": "user",
+            "points": -1, "createdAt": self.iso_date, "lastLogin": self.iso_date, "version": 42,
+        }
+        assert storage.user_record_chars(-1, 42, 8, password_length=11) == json_length(user)
+        safe_user = {key: user[key] for key in ("id", "username", "role", "points", "createdAt", "lastLogin")}
+        assert storage.current_user_chars(-1, 8) == json_length(safe_user)
+
+    def test_ledger_sizes(self):
+        """帳本交易與快照的大小"""
+        feed = {"type": "feed", "points": 0, "grass": -1, "at": self.iso_date, "cattleId": 12}
+        assert storage.ledger_entry_chars("feed", 0, -1, 12) == json_length(feed)
+
+        snapshot = {
+            "points": 980, "grass": 3,
+            "totals": {
+                "purchase": {"count": 2, "points": -20, "grass": 20},
+                "feed": {"count": 17, "points": 0, "grass": -17},
+            },
+            "folded": ["x" * storage.ENTRY_ID_LENGTH] * 19,
+            "compactedAt": self.iso_date,
+        }
+        totals = {"purchase": (2, -20, 20), "feed": (17, 0, -17), "credit": (0, 0, 0)}
+        assert storage.snapshot_chars(980, 3, totals, 19) == json_length(snapshot)
+
+
+@pytest.mark.simulation
+class TestSimulationMatchesGame:
+    """以模擬記錄的操作驅動 GameManager，比對兩者的結果"""
+
+    @pytest.fixture(autouse=True)
+    def setup_user(self, page_setup: Page):
+        """每個測試前註冊並登入一個測試使用者"""
+        self.page = page_setup
+        self.test_username = generate_random_username()
+        self.test_password = "password123"
+
+        register(self.page, self.test_username, self.test_password)
+        self.page.wait_for_timeout(2000)
+
+        login(self.page, self.test_username, self.test_password)
+        expect_user_page(self.page)
+        yield
+
+    def run_trace(self, events, initial_points: int) -> dict:
+        """在頁面中依序重播操作（以虛擬時鐘前進到每個操作的時間）"""
+        return self.page.evaluate("""
+            async ({ events, initialPoints }) => {
+                const user = await UserManager.getCurrentUser();
+                await UserManager.updatePoints(user.id, initialPoints);
+                const before = await GameManager.initGameData(user.id);
+                const gameVersion = before.version;
+                const userVersion = (await UserManager.getUserById(user.id)).version;
+                await WriteQueue.flush();
+
+                const results = [];
+                Clock.useVirtual(events[0][0]);
+                try {
+                    for (const [at, action, argument] of events) {
+                        Clock.advance(at - Clock.now());
+                        const result = action === 'buy'
+                            ? await GameManager.buyGrass(user.id, argument)
+                            : await GameManager.feedCattle(user.id, argument);
+                        results.push([result.success, result.message]);
+                    }
+                } finally {
+                    Clock.useReal();
+                }
+                await WriteQueue.flush();
+
+                const stored = await StorageEngine.get(GameManager.getGameDataKey(user.id));
+                const gameData = GameManager.decodeGameData(stored);
+                const latestUser = await UserManager.getUserById(user.id);
+                return {
+                    results,
+                    points: latestUser.points,
+                    grass: gameData.grass,
+                    hunger: Array.from(gameData.herd.hunger),
+                    timerEndTime: Array.from(gameData.herd.timerEndTime),
+                    gameVersions: gameData.version - gameVersion,
+                    userVersions: latestUser.version - userVersion,
+                    gameVersion: gameData.version,
+                    userVersion: latestUser.version,
+                    idLength: user.id.length,
+                    gameChars: JSON.stringify(GameManager.encodeGameData(gameData)).length,
+                    userChars: JSON.stringify(latestUser).length
+                };
+            }
+        """, {"events": [list(event[:3]) for event in events], "initialPoints": initial_points})
+
+    @pytest.mark.parametrize("target", ["random", "hungry"])
+    def test_sampled_traces_match_javascript(self, target):
+        """模擬中抽樣玩家的操作在 JavaScript 中重播，結果與模型相同"""
+        config = trace_config(players=5, trace_players=1, target=target)
+        report = simulate(config)
+        events = report.traces[0]
+        state = report.final_states[0]
+
+        result = self.run_trace(events, config.initial_points)
+
+        assert len(result["results"]) == len(events)
+        for event, (success, message) in zip(events, result["results"]):
+            if event.action == "buy":
+                assert success == bool(event.result), event
+            elif event.result == rules.FEED_OK:
+                assert success, event
+            else:
+                assert (success, message) == (False, FEED_MESSAGES[event.result]), event
+        assert result["points"] == state["points"]
+        assert result["grass"] == state["grass"]
+        assert result["hunger"] == state["hunger"]
+        assert result["timerEndTime"] == state["timerEndTime"]
+        assert result["gameVersions"] == state["gameVersion"]
+        assert result["userVersions"] == state["userVersion"]
+
+        # 儲存空間模型與實際的 JSON 長度相同
+        assert result["gameChars"] == storage.game_record_chars(
+            result["gameVersion"], result["grass"], config.herd_size, result["idLength"])
+        assert result["userChars"] == storage.user_record_chars(
+            result["points"], result["userVersion"], len(self.test_username),
+            password_length=len(self.test_password), id_length=result["idLength"])
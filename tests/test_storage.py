@@ -0,0 +1,844 @@
+"""
+資料儲存層測試：快取、索引與跨分頁同步
+"""
+
+import pytest
+from playwright.sync_api import Page, expect
+from test_helpers import (
+    login,
+    register,
+    generate_random_username,
+    expect_user_page,
+)
+
+
+@pytest.mark.storage
+class TestUserCache:
+    """測試使用者資料快取"""
+
+    @pytest.fixture(autouse=True)
+    def setup_user(self, page_setup: Page):
+        """每個測試前註冊並登入一個測試使用者"""
+        self.page = page_setup
+        self.test_username = generate_random_username()
+        self.test_password = "password123"
+
+        register(self.page, self.test_username, self.test_password)
+        self.page.wait_for_timeout(2000)
+
+        login(self.page, self.test_username, self.test_password)
+        expect_user_page(self.page)
+        yield
+
+    def test_cache_reflects_local_writes(self):
+        """本分頁寫入的點數應該立即反映在快取中"""
+        points = self.page.evaluate("""
+            async () => {
+                const user = await UserManager.getCurrentUser();
+                await UserManager.updatePoints(user.id, 42);
+                return (await UserManager.getCurrentUser()).points;
+            }
+        """)
+        assert points == 42
+
+    def test_cache_invalidates_on_cross_tab_change(self):
+        """其他分頁修改使用者資料後，本分頁應該讀到最新資料"""
+        other_page = self.page.context.new_page()
+        other_page.goto("/")
+        other_page.wait_for_load_state("networkidle")
+
+        other_page.evaluate("""
+            async () => {
+                await App.ready;
+                const user = await UserManager.getCurrentUser();
+                await UserManager.updatePoints(user.id, 77);
+            }
+        """)
+        self.page.wait_for_timeout(500)
+
+        points = self.page.evaluate("async () => (await UserManager.getCurrentUser()).points")
+        assert points == 77
+        other_page.close()
+
+
+@pytest.mark.storage
+class TestUserIndexes:
+    """測試使用者 id 與帳號索引"""
+
+    def test_indexes_stay_consistent_after_bulk_signup(self, page_setup: Page):
+        """大量註冊後，依帳號與 id 查詢應該取得同一筆資料"""
+        result = page_setup.evaluate("""
+            async () => {
+                await App.ready;
+                for (let i = 0; i < 200; i++) {
+                    await UserManager.register(`bulk_user_${i}`, 'password123');
+                }
+                const duplicate = await UserManager.register('bulk_user_10', 'password123');
+                const byName = await UserManager.getUserByUsername('bulk_user_150');
+                const byId = await UserManager.getUserById(byName.id);
+                return {
+                    duplicate: duplicate.success,
+                    sameRecord: byName === byId,
+                    total: (await UserManager.getAllUsers()).length
+                };
+            }
+        """)
+        assert result["duplicate"] is False
+        assert result["sameRecord"] is True
+        assert result["total"] == 201
+
+
+@pytest.mark.storage
+@pytest.mark.game
+class TestGameDataSharding:
+    """測試遊戲數據依使用者分開儲存"""
+
+    def test_legacy_game_data_is_migrated(self, page_setup: Page):
+        """舊版單一 key 的遊戲數據應該在載入時拆分為每位使用者一個 key"""
+        page = page_setup
+        page.evaluate("""
+            () => {
+                const legacy = {
+                    u1: { userId: 'u1', grass: 7, cattle: [] },
+                    u2: { userId: 'u2', grass: 3, cattle: [] }
+                };
+                localStorage.setItem('cattleFarmGameData', JSON.stringify(legacy));
+            }
+        """)
+        page.reload()
+        page.wait_for_load_state("networkidle")
+
+        result = page.evaluate("""
+            async () => {
+                await App.ready;
+                return {
+                    legacy: localStorage.getItem('cattleFarmGameData'),
+                    u1: (await GameManager.getGameData('u1')).grass,
+                    u2: JSON.parse(localStorage.getItem('cattleFarmGameData:u2')).grass
+                };
+            }
+        """)
+        assert result["legacy"] is None
+        assert result["u1"] == 7
+        assert result["u2"] == 3
+
+    def test_saving_one_user_does_not_touch_others(self, page_setup: Page):
+        """儲存一位使用者的遊戲數據不應該改寫其他使用者的 key"""
+        page = page_setup
+        result = page.evaluate("""
+            async () => {
+                await App.ready;
+                await GameManager.initGameData('u1');
+                await GameManager.initGameData('u2');
+                await WriteQueue.flush();
+                const before = localStorage.getItem('cattleFarmGameData:u2');
+                const gameData = await GameManager.getGameData('u1');
+                gameData.grass = 5;
+                GameManager.saveGameData(gameData);
+                await WriteQueue.flush();
+                return {
+                    u1: JSON.parse(localStorage.getItem('cattleFarmGameData:u1')).grass,
+                    untouched: localStorage.getItem('cattleFarmGameData:u2') === before
+                };
+            }
+        """)
+        assert result["u1"] == 5
+        assert result["untouched"] is True
+
+
+@pytest.mark.storage
+class TestUserSharding:
+    """測試使用者資料依帳號分開儲存"""
+
+    def test_legacy_users_are_migrated_on_init(self, page_setup: Page):
+        """舊版使用者陣列應該在初始化時拆分為每位使用者一個 key"""
+        page = page_setup
+        page.evaluate("""
+            () => {
+                localStorage.clear();
+                const legacy = [
+                    { id: 'a1', username: 'admin', password: 'admin', role: 'admin', points: 0 },
+                    { id: 'u1', username: 'legacy_user', password: 'password123', role: 'user', points: 12 }
+                ];
+                localStorage.setItem('cattleFarmUsers', JSON.stringify(legacy));
+            }
+        """)
+        page.reload()
+        page.wait_for_load_state("networkidle")
+
+        result = page.evaluate("""
+            async () => {
+                await App.ready;
+                return {
+                    legacy: localStorage.getItem('cattleFarmUsers'),
+                    directory: JSON.parse(localStorage.getItem('cattleFarmUserDirectory')),
+                    record: JSON.parse(localStorage.getItem('cattleFarmUser:u1'))
+                };
+            }
+        """)
+        assert result["legacy"] is None
+        assert result["directory"]["entries"] == [["admin", "a1", "admin"], ["legacy_user", "u1", "user"]]
+        assert result["record"]["points"] == 12
+
+        login(page, "legacy_user", "password123")
+        expect_user_page(page)
+
+    def test_points_update_writes_only_one_record(self, page_setup: Page):
+        """更新點數時不應該改寫帳號目錄或其他使用者的資料"""
+        result = page_setup.evaluate("""
+            async () => {
+                await App.ready;
+                await UserManager.register('shard_a', 'password123');
+                await UserManager.register('shard_b', 'password123');
+                const other = await UserManager.getUserByUsername('shard_b');
+                const directoryBefore = localStorage.getItem('cattleFarmUserDirectory');
+                const otherBefore = localStorage.getItem(`cattleFarmUser:${other.id}`);
+
+                const user = await UserManager.getUserByUsername('shard_a');
+                await UserManager.updatePoints(user.id, 30);
+
+                return {
+                    points: JSON.parse(localStorage.getItem(`cattleFarmUser:${user.id}`)).points,
+                    directoryUntouched: localStorage.getItem('cattleFarmUserDirectory') === directoryBefore,
+                    otherUntouched: localStorage.getItem(`cattleFarmUser:${other.id}`) === otherBefore
+                };
+            }
+        """)
+        assert result["points"] == 30
+        assert result["directoryUntouched"] is True
+        assert result["otherUntouched"] is True
+
+
+    def test_batch_credits_use_one_commit(self, page_setup: Page):
+        """批次增加點數應該只呼叫一次儲存引擎寫入（包含新使用者的帳本期初快照）"""
+        result = page_setup.evaluate("""
+            async () => {
+                await App.ready;
+                const credits = [];
+                for (let i = 0; i < 50; i++) {
+                    await UserManager.register(`batch_${i}`, 'password123');
+                    const user = await UserManager.getUserByUsername(`batch_${i}`);
+                    credits.push({ userId: user.id, delta: i });
+                }
+                credits.push({ userId: credits[1].userId, delta: 5 });
+                credits.push({ userId: 'missing', delta: 1 });
+
+                let commits = 0;
+                const originalSetMany = StorageEngine.setMany;
+                const originalSet = StorageEngine.set;
+                StorageEngine.setMany = function (entries) {
+                    commits++;
+                    return originalSetMany.call(this, entries);
+                };
+                StorageEngine.set = function (key, value) {
+                    commits++;
+                    return originalSet.call(this, key, value);
+                };
+                const result = await UserManager.applyPointCredits(credits);
+                StorageEngine.setMany = originalSetMany;
+                StorageEngine.set = originalSet;
+
+                return {
+                    commits,
+                    updated: result.updated.length,
+                    failed: result.failed.map(f => f.userId),
+                    points: JSON.parse(localStorage.getItem(`cattleFarmUser:${credits[1].userId}`)).points,
+                    balance: (await Ledger.getBalance(credits[1].userId)).points
+                };
+            }
+        """)
+        assert result["commits"] == 1
+        assert result["updated"] == 50
+        assert result["failed"] == ["missing"]
+        assert result["points"] == 6
+        assert result["balance"] == 6
+
+    def test_failed_batch_credits_leave_cache_untouched(self, page_setup: Page):
+        """批次寫入失敗時，快取中的使用者點數不應該改變"""
+        result = page_setup.evaluate("""
+            async () => {
+                await App.ready;
+                await UserManager.register('batch_fail', 'password123');
+                const user = await UserManager.getUserByUsername('batch_fail');
+
+                const originalSetMany = StorageEngine.setMany;
+                StorageEngine.setMany = async () => { throw new Error('寫入失敗'); };
+                let failed = false;
+                try {
+                    await UserManager.applyPointCredits([{ userId: user.id, delta: 10 }]);
+                } catch (error) {
+                    failed = true;
+                }
+                StorageEngine.setMany = originalSetMany;
+
+                return { failed, points: (await UserManager.getUserById(user.id)).points };
+            }
+        """)
+        assert result == {"failed": True, "points": 0}
+
+
+@pytest.mark.storage
+class TestIndexedDBEngine:
+    """測試 IndexedDB 儲存引擎"""
+
+    def test_register_and_login_with_indexeddb(self, page_setup: Page):
+        """選擇 IndexedDB 引擎後應該能正常註冊與登入，且使用者資料不寫入 localStorage"""
+        page = page_setup
+        page.goto("/?storage=indexedDB")
+        page.wait_for_load_state("networkidle")
+
+        username = generate_random_username()
+        register(page, username, "password123")
+        login(page, username, "password123")
+        expect_user_page(page)
+
+        result = page.evaluate("""
+            async (username) => {
+                await App.ready;
+                const user = await UserManager.getUserByUsername(username);
+                return {
+                    engine: StorageEngine.current.name,
+                    stored: await IndexedDBEngine.get(`cattleFarmUser:${user.id}`) !== null,
+                    inLocalStorage: localStorage.getItem(`cattleFarmUser:${user.id}`) !== null
+                };
+            }
+        """, username)
+        assert result["engine"] == "indexedDB"
+        assert result["stored"] is True
+        assert result["inLocalStorage"] is False
+
+    def test_registrations_in_other_tabs_are_kept(self, page_setup: Page):
+        """其他分頁註冊的帳號應該讓本分頁的目錄快取失效，本分頁再註冊也不會覆蓋"""
+        page = page_setup
+        page.goto("/?storage=indexedDB")
+        page.wait_for_load_state("networkidle")
+        other = page.context.new_page()
+        other.goto("/")
+        other.wait_for_load_state("networkidle")
+
+        first, second = generate_random_username(), generate_random_username() + "b"
+        page.evaluate("""
+            async (username) => {
+                await App.ready;
+                await UserManager.getDirectory();
+                await UserManager.register(username, 'password123');
+            }
+        """, first)
+        other.evaluate("""
+            async (username) => {
+                await App.ready;
+                await UserManager.getDirectory();
+                await UserManager.register(username, 'password123');
+            }
+        """, second)
+
+        page.wait_for_function("() => UserManager.directoryCache === null")
+        result = page.evaluate("""
+            async ([first, second]) => {
+                const login = await UserManager.login(second, 'password123');
+                const directory = await UserManager.getDirectory();
+                return {
+                    engine: StorageEngine.current.name,
+                    login: login.success,
+                    registered: directory.has(first) && directory.has(second)
+                };
+            }
+        """, [first, second])
+        other.close()
+        assert result == {"engine": "indexedDB", "login": True, "registered": True}
+
+
+@pytest.mark.storage
+@pytest.mark.game
+class TestWriteBehindQueue:
+    """測試遊戲數據的延遲合併寫入"""
+
+    @pytest.fixture(autouse=True)
+    def setup_user(self, page_setup: Page):
+        """每個測試前註冊並登入一個測試使用者"""
+        self.page = page_setup
+        self.test_username = generate_random_username()
+        self.test_password = "password123"
+
+        register(self.page, self.test_username, self.test_password)
+        self.page.wait_for_timeout(2000)
+
+        login(self.page, self.test_username, self.test_password)
+        expect_user_page(self.page)
+        yield
+
+    def test_rapid_feeds_are_coalesced_into_one_write(self):
+        """連續餵食十次只應該寫入儲存引擎一次"""
+        result = self.page.evaluate("""
+            async () => {
+                const user = await UserManager.getCurrentUser();
+                const gameData = await GameManager.getGameData(user.id);
+                gameData.grass = 10;
+                await WriteQueue.flush();
+
+                let writes = 0;
+                const originalSetItem = Storage.prototype.setItem;
+                Storage.prototype.setItem = function (key, value) {
+                    if (key.startsWith('cattleFarmGameData:')) writes++;
+                    return originalSetItem.call(this, key, value);
+                };
+
+                for (let i = 0; i < 10; i++) {
+                    await GameManager.feedCattle(user.id, 1);
+                }
+                const writesBeforeFlush = writes;
+                await WriteQueue.flush();
+                Storage.prototype.setItem = originalSetItem;
+
+                const stored = JSON.parse(localStorage.getItem(`cattleFarmGameData:${user.id}`));
+                return { writesBeforeFlush, writes, hunger: Herd.decode(stored.herd).hunger[0] };
+            }
+        """)
+        assert result["writesBeforeFlush"] == 0
+        assert result["writes"] == 1
+        assert result["hunger"] == 100
+
+    def test_pending_writes_are_flushed_on_pagehide(self):
+        """頁面重新載入前應該寫入尚未寫入的遊戲數據"""
+        self.page.evaluate("""
+            async () => {
+                const user = await UserManager.getCurrentUser();
+                const gameData = await GameManager.getGameData(user.id);
+                gameData.grass = 3;
+                GameManager.saveGameData(gameData);
+            }
+        """)
+        self.page.reload()
+        expect_user_page(self.page)
+        expect(self.page.locator("#game-grass")).to_contain_text("3")
+
+    def test_failed_write_is_retried(self):
+        """批次寫入失敗時資料應該放回佇列，稍後重試寫入"""
+        result = self.page.evaluate("""
+            async () => {
+                const user = await UserManager.getCurrentUser();
+                const gameData = await GameManager.getGameData(user.id);
+                await WriteQueue.flush();
+
+                const originalSetMany = StorageEngine.setMany;
+                StorageEngine.setMany = async () => { throw new Error('寫入失敗'); };
+                gameData.grass = 4;
+                GameManager.saveGameData(gameData);
+                await WriteQueue.flush();
+                StorageEngine.setMany = originalSetMany;
+                const requeued = WriteQueue.has(`cattleFarmGameData:${user.id}`);
+
+                await new Promise(resolve => setTimeout(resolve, WriteQueue.RETRY_DELAY + 500));
+                await WriteQueue.flush();
+                const stored = JSON.parse(localStorage.getItem(`cattleFarmGameData:${user.id}`));
+                return { requeued, grass: stored.grass };
+            }
+        """)
+        assert result == {"requeued": True, "grass": 4}
+
+
+@pytest.mark.storage
+@pytest.mark.game
+class TestLazyExpiry:
+    """測試乳牛到期時只在讀取時推導飽食度"""
+
+    @pytest.fixture(autouse=True)
+    def setup_user(self, page_setup: Page):
+        """每個測試前註冊並登入一個測試使用者"""
+        self.page = page_setup
+        self.test_username = generate_random_username()
+        self.test_password = "password123"
+
+        register(self.page, self.test_username, self.test_password)
+        self.page.wait_for_timeout(2000)
+
+        login(self.page, self.test_username, self.test_password)
+        expect_user_page(self.page)
+        yield
+
+    def test_expiry_does_not_write_storage(self):
+        """乳牛到期不應該寫入儲存引擎，下次餵食時才整理寫回"""
+        result = self.page.evaluate("""
+            async () => {
+                const user = await UserManager.getCurrentUser();
+                const gameData = await GameManager.getGameData(user.id);
+                gameData.grass = 20;
+                for (let i = 0; i < 10; i++) {
+                    await GameManager.feedCattle(user.id, 1);
+                }
+                await WriteQueue.flush();
+
+                let writes = 0;
+                const originalSetItem = Storage.prototype.setItem;
+                Storage.prototype.setItem = function (key, value) {
+                    writes++;
+                    return originalSetItem.call(this, key, value);
+                };
+
+                // 讓計時器到期並觸發排程
+                const cattle = Herd.get(gameData.herd, 1);
+                const deadline = Date.now() - 1000;
+                cattle.timerEndTime = deadline;
+                GameManager.scheduleCattleExpiry(user.id, 1, deadline);
+                await new Promise(resolve => setTimeout(resolve, 1500));
+                await WriteQueue.flush();
+                const writesAfterExpiry = writes;
+                const expiredHunger = Herd.get(gameData.herd, 1).hunger;
+
+                await GameManager.feedCattle(user.id, 1);
+                await WriteQueue.flush();
+                Storage.prototype.setItem = originalSetItem;
+
+                const stored = JSON.parse(localStorage.getItem(`cattleFarmGameData:${user.id}`));
+                const herd = Herd.decode(stored.herd);
+                return {
+                    writesAfterExpiry,
+                    expiredHunger,
+                    storedHunger: herd.hunger[0],
+                    storedTimer: herd.timerEndTime[0]
+                };
+            }
+        """)
+        assert result["writesAfterExpiry"] == 0
+        assert result["expiredHunger"] == 0
+        assert result["storedHunger"] == 10
+        assert result["storedTimer"] == 0
+
+
+@pytest.mark.storage
+@pytest.mark.game
+class TestHerdEncoding:
+    """測試欄式牛群資料格式"""
+
+    def test_encode_decode_round_trip(self, page_setup: Page):
+        """大型牛群編碼後再解碼應該得到相同的飽食度與計時器"""
+        result = page_setup.evaluate("""
+            () => {
+                const herd = Herd.create(2000);
+                for (let i = 0; i < herd.size; i++) {
+                    herd.hunger[i] = i % 11 * 10;
+                    herd.timerEndTime[i] = i % 2 ? 1700000000000 + i : 0;
+                }
+                const encoded = JSON.stringify(Herd.encode(herd));
+                const decoded = Herd.decode(JSON.parse(encoded));
+                const cattle = Herd.get(decoded, 4);
+                return {
+                    bytes: encoded.length,
+                    sameHunger: decoded.hunger.every((value, i) => value === herd.hunger[i]),
+                    sameTimers: decoded.timerEndTime.every((value, i) => value === herd.timerEndTime[i]),
+                    name: cattle.name,
+                    timerEndTime: cattle.timerEndTime
+                };
+            }
+        """)
+        assert result["sameHunger"] is True
+        assert result["sameTimers"] is True
+        assert result["bytes"] < 2000 * 16
+        assert result["name"] == "乳牛 #4"
+        assert result["timerEndTime"] == 1700000000003
+
+    def test_legacy_cattle_list_is_still_readable(self, page_setup: Page):
+        """舊版以物件陣列儲存的乳牛應該能正常顯示"""
+        page = page_setup
+        username = generate_random_username()
+        register(page, username, "password123")
+        login(page, username, "password123")
+        expect_user_page(page)
+
+        page.evaluate("""
+            () => {
+                const currentUser = JSON.parse(localStorage.getItem('cattleFarmCurrentUser'));
+                const legacy = {
+                    userId: currentUser.id,
+                    grass: 2,
+                    cattle: [
+                        { id: 1, name: '乳牛 #1', hunger: 40, maxHunger: 100, timerEndTime: null },
+                        { id: 2, name: '乳牛 #2', hunger: 0, maxHunger: 100, timerEndTime: null },
+                        { id: 3, name: '乳牛 #3', hunger: 0, maxHunger: 100, timerEndTime: null }
+                    ]
+                };
+                localStorage.setItem(`cattleFarmGameData:${currentUser.id}`, JSON.stringify(legacy));
+            }
+        """)
+        page.reload()
+        expect_user_page(page)
+        expect(page.locator("#cattle-1-hunger")).to_contain_text("40")
+        expect(page.locator("#game-grass")).to_contain_text("2")
+
+
+@pytest.mark.storage
+class TestCrossTabSync:
+    """測試以 BroadcastChannel 同步其他分頁的變更"""
+
+    @pytest.fixture(autouse=True)
+    def setup_two_tabs(self, page_setup: Page):
+        """註冊並登入使用者，再開啟第二個分頁"""
+        self.page = page_setup
+        self.test_username = generate_random_username()
+        self.test_password = "password123"
+
+        register(self.page, self.test_username, self.test_password)
+        self.page.wait_for_timeout(2000)
+        login(self.page, self.test_username, self.test_password)
+        expect_user_page(self.page)
+
+        self.other = self.page.context.new_page()
+        self.other.goto("/")
+        expect_user_page(self.other)
+        yield
+        self.other.close()
+
+    def test_only_first_tab_is_leader(self):
+        """只有一個分頁負責排程乳牛到期"""
+        self.page.wait_for_function("() => ChangeBus.isLeader")
+        assert self.other.evaluate("async () => { await App.ready; return ChangeBus.isLeader; }") is False
+
+    def test_changes_apply_without_reading_storage(self):
+        """其他分頁的點數與牧草變更應該直接套用，不需要讀取儲存引擎"""
+        self.page.evaluate("""
+            () => {
+                window.__storageReads = 0;
+                const originalGetItem = Storage.prototype.getItem;
+                Storage.prototype.getItem = function (key) {
+                    if (key.startsWith('cattleFarmUser:') || key.startsWith('cattleFarmGameData:')) {
+                        window.__storageReads++;
+                    }
+                    return originalGetItem.call(this, key);
+                };
+            }
+        """)
+
+        self.other.evaluate("""
+            async () => {
+                await App.ready;
+                const user = await UserManager.getCurrentUser();
+                await UserManager.updatePoints(user.id, 50);
+                await GameManager.buyGrass(user.id, 20);
+            }
+        """)
+
+        expect(self.page.locator("#game-points")).to_have_text("30")
+        expect(self.page.locator("#game-grass")).to_have_text("20")
+        assert self.page.evaluate("() => window.__storageReads") == 0
+
+    def test_concurrent_purchases_do_not_lose_updates(self):
+        """兩個分頁同時購買牧草，點數與牧草的變更都不應該遺失"""
+        self.page.evaluate("""
+            async () => {
+                const user = await UserManager.getCurrentUser();
+                await UserManager.updatePoints(user.id, 100);
+            }
+        """)
+
+        buy_script = """
+            async () => {
+                await App.ready;
+                const user = await UserManager.getCurrentUser();
+                window.__purchases = Promise.all(
+                    Array.from({ length: 10 }, () => GameManager.buyGrass(user.id, 1))
+                );
+            }
+        """
+        self.other.evaluate(buy_script)
+        self.page.evaluate(buy_script)
+        for tab in (self.page, self.other):
+            results = tab.evaluate("""
+                async () => {
+                    const results = await window.__purchases;
+                    await WriteQueue.flush();
+                    return results.map(result => result.success);
+                }
+            """)
+            assert all(results)
+
+        stored = self.page.evaluate("""
+            async () => {
+                const user = await UserManager.getCurrentUser();
+                const storedUser = await StorageEngine.get(UserManager.getUserKey(user.id));
+                const storedGame = await StorageEngine.get(GameManager.getGameDataKey(user.id));
+                return { points: storedUser.points, grass: storedGame.grass };
+            }
+        """)
+        assert stored == {"points": 80, "grass": 20}
+
+    def test_login_in_other_tab_is_not_overwritten(self):
+        """其他分頁登入後，本分頁指派點數不應該覆蓋最後登入時間"""
+        result = self.other.evaluate(f"""
+            async () => {{
+                await App.ready;
+                const result = await UserManager.login('{self.test_username}', '{self.test_password}');
+                return {{ id: result.user.id, version: result.user.version, lastLogin: result.user.lastLogin }};
+            }}
+        """)
+
+        # 等待本分頁收到登入的變更通知
+        self.page.wait_for_function(
+            """([userId, version]) => {
+                const cached = UserManager.userCache.get(userId);
+                return !cached || cached.version >= version;
+            }""",
+            arg=[result["id"], result["version"]],
+        )
+
+        stored = self.page.evaluate(f"""
+            async () => {{
+                await UserManager.addPoints('{result["id"]}', 10);
+                return StorageEngine.get(UserManager.getUserKey('{result["id"]}'));
+            }}
+        """)
+        assert stored["lastLogin"] == result["lastLogin"]
+        assert stored["version"] == result["version"] + 1
+
+    def test_expiry_is_broadcast_by_leader(self):
+        """非主分頁的乳牛到期應該由主分頁通知"""
+        self.page.wait_for_function("() => ChangeBus.isLeader")
+        result = self.other.evaluate("""
+            async () => {
+                await App.ready;
+                const user = await UserManager.getCurrentUser();
+                const expired = new Promise(resolve => {
+                    GameManager.watchExpirations(user.id, resolve);
+                });
+                const gameData = await GameManager.getGameData(user.id);
+                gameData.grass = 10;
+                for (let i = 0; i < 10; i++) {
+                    await GameManager.feedCattle(user.id, 2);
+                }
+                // 將到期時間提前，並以 herdChanged 通知主分頁
+                Herd.get(gameData.herd, 2).timerEndTime = Date.now() + 500;
+                GameManager.saveGameData(gameData, [2]);
+                return {
+                    cattleIds: await expired,
+                    scheduledHere: ExpiryScheduler.deadlines.size
+                };
+            }
+        """)
+        assert result["cattleIds"] == [2]
+        assert result["scheduledHere"] == 0
+
+    def test_leader_stops_tracking_closed_tabs(self):
+        """分頁停止遊玩或關閉後不再續約，主分頁應該停止追蹤；同一位使用者仍有分頁在遊玩時繼續追蹤"""
+        self.page.wait_for_function("() => ChangeBus.isLeader")
+        user_id = self.page.evaluate("async () => (await UserManager.getCurrentUser()).id")
+
+        # 另一個分頁停止遊玩，但主分頁仍在遊玩同一位使用者
+        self.other.evaluate("async () => { await App.ready; GameManager.stopWatchingExpirations(); }")
+        self.page.wait_for_timeout(200)
+        assert self.page.evaluate(f"GameManager.expiryUsers.has('{user_id}')") is True
+
+        # 另一個分頁追蹤其他使用者後直接關閉（不會停止追蹤，也不再續約）
+        self.other.evaluate("GameManager.watchExpirations('closed-tab-user', () => {})")
+        self.page.wait_for_function("() => GameManager.expiryUsers.has('closed-tab-user')")
+        self.other.close()
+        self.other = self.page.context.new_page()
+
+        tracked = self.page.evaluate("""
+            async () => {
+                GameManager.WATCH_TTL = 0;
+                await new Promise(resolve => setTimeout(resolve, 10));
+                GameManager.dropStaleWatches();
+                return Array.from(GameManager.expiryUsers.keys());
+            }
+        """)
+        assert "closed-tab-user" not in tracked
+
+
+@pytest.mark.storage
+@pytest.mark.game
+class TestLedger:
+    """測試點數與牧草的交易帳本"""
+
+    @pytest.fixture(autouse=True)
+    def setup_user(self, page_setup: Page):
+        """每個測試前註冊並登入一個測試使用者"""
+        self.page = page_setup
+        self.test_username = generate_random_username()
+        self.test_password = "password123"
+
+        register(self.page, self.test_username, self.test_password)
+        self.page.wait_for_timeout(2000)
+
+        login(self.page, self.test_username, self.test_password)
+        expect_user_page(self.page)
+        yield
+
+    def test_balance_is_rebuilt_from_transactions(self):
+        """指派點數、購買牧草與餵食都應該記帳，重建的餘額與目前資料一致"""
+        result = self.page.evaluate("""
+            async () => {
+                const user = await UserManager.getCurrentUser();
+                await UserManager.addPoints(user.id, 30);
+                await GameManager.buyGrass(user.id, 12);
+                for (let i = 0; i < 3; i++) {
+                    await GameManager.feedCattle(user.id, 1);
+                }
+                await WriteQueue.flush();
+
+                const gameData = await GameManager.getGameData(user.id);
+                const history = await Ledger.getHistory(user.id);
+                return {
+                    balance: await Ledger.getBalance(user.id),
+                    points: (await UserManager.getCurrentUser()).points,
+                    grass: gameData.grass,
+                    types: history.entries.map(entry => entry.type)
+                };
+            }
+        """)
+        assert result["balance"] == {"points": 18, "grass": 9}
+        assert result["points"] == 18
+        assert result["grass"] == 9
+        assert result["types"] == ["credit", "purchase", "feed", "feed", "feed"]
+
+    def test_appends_write_only_the_new_transaction(self):
+        """附加交易只應該寫入新的一筆，大小不隨交易數增加"""
+        sizes = self.page.evaluate("""
+            async () => {
+                const user = await UserManager.getCurrentUser();
+                await UserManager.addPoints(user.id, 50);
+                await GameManager.buyGrass(user.id, 50);
+                await WriteQueue.flush();
+
+                const sizes = [];
+                const originalSetItem = Storage.prototype.setItem;
+                Storage.prototype.setItem = function (key, value) {
+                    if (key.startsWith('cattleFarmLedger')) sizes.push(value.length);
+                    return originalSetItem.call(this, key, value);
+                };
+                for (let i = 0; i < 40; i++) {
+                    await GameManager.feedCattle(user.id, (i % 3) + 1);
+                    await WriteQueue.flush();
+                }
+                Storage.prototype.setItem = originalSetItem;
+                return sizes;
+            }
+        """)
+        assert len(sizes) == 40
+        assert max(sizes) - min(sizes) <= 2
+
+    def test_transactions_are_compacted_into_snapshot(self):
+        """累積的交易應該壓縮成快照，壓縮前後餘額相同"""
+        result = self.page.evaluate("""
+            async () => {
+                const user = await UserManager.getCurrentUser();
+                Ledger.SNAPSHOT_INTERVAL = 5;
+                await UserManager.addPoints(user.id, 20);
+                for (let i = 0; i < 6; i++) {
+                    await GameManager.buyGrass(user.id, 2);
+                }
+                await WriteQueue.flush();
+                const before = await Ledger.getBalance(user.id);
+                await Ledger.compact(user.id);
+
+                const history = await Ledger.getHistory(user.id);
+                return {
+                    before,
+                    after: await Ledger.getBalance(user.id),
+                    remaining: (await StorageEngine.keys(Ledger.getEntryKey(user.id, ''))).length,
+                    purchases: history.totals.purchase.count
+                };
+            }
+        """)
+        assert result["before"] == {"points": 8, "grass": 12}
+        assert result["after"] == result["before"]
+        assert result["remaining"] == 0
+        assert result["purchases"] == 6
@@ -12,6 +12,7 @@ from test_helpers import (
     register,
     generate_random_username,
     wait_for_page_load,
+    set_current_user_points,
 )
 
 
@@ -35,6 +36,21 @@ class TestUser:
         expect_user_page(self.page)
         yield
     
+    def test_player_does_not_load_admin_module(self):
+        """一般使用者重新載入時只載入使用者頁面的模組，不下載管理員頁面"""
+        self.page.reload()
+        expect_user_page(self.page)
+
+        scripts = self.page.evaluate("""
+            () => performance.getEntriesByType('resource')
+                .map(entry => new URL(entry.name).pathname)
+                .filter(path => path.endsWith('.js'))
+        """)
+        assert "/src/js/user.js" in scripts
+        assert "/src/js/admin.js" not in scripts
+        assert "/src/js/user-list-view.js" not in scripts
+        assert self.page.evaluate("() => typeof AdminPage") == "undefined"
+
     def test_user_page_displays_correctly(self):
         """使用者頁面應該顯示正確的標題和使用者名稱"""
         # 使用更具體的選擇器
@@ -155,21 +171,7 @@ class TestUserGame:
         self.page.wait_for_timeout(2000)
         
         # 給予使用者一些點數（透過 LocalStorage 直接修改）
-        self.page.evaluate("""
-            () => {
-                const users = JSON.parse(localStorage.getItem('cattleFarmUsers'));
-                const currentUser = JSON.parse(localStorage.getItem('cattleFarmCurrentUser'));
-                if (users && currentUser) {
-                    const user = users.find(u => u.id === currentUser.id);
-                    if (user) {
-                        user.points = 100;
-                        localStorage.setItem('cattleFarmUsers', JSON.stringify(users));
-                        currentUser.points = 100;
-                        localStorage.setItem('cattleFarmCurrentUser', JSON.stringify(currentUser));
-                    }
-                }
-            }
-        """)
+        set_current_user_points(self.page, 100)
         
         # 重新載入頁面以更新顯示
         self.page.reload()